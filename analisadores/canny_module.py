@@ -1,22 +1,35 @@
+import logging
 import cv2
 import numpy as np
 import base64
 from gerenciador import AnalisadorBase
 from models.analysis import AnalysisResult
+from services.decoding import decode_image, MODE_COLOR, MODE_GRAY
+from services.tiling import core_view
+from services.intermediates import compute
 
-def carregar_imagem_segura(caminho, conteudo):
+logger = logging.getLogger(__name__)
+
+# Vizinhança usada no modo em blocos. Sobel + supressão de não-máximos precisam de 2 pixels;
+# a histerese liga bordas a qualquer distância, então a margem extra reduz (sem zerar) diferenças
+# junto às fronteiras dos blocos. A soma dos pixels de borda dos núcleos é exata.
+HALO_CANNY = 16
+
+def carregar_imagem_segura(caminho, conteudo, modo=MODE_COLOR):
     """
-    Carrega a imagem garantindo formato BGR (Padrão OpenCV).
+    Carrega a imagem em BGR (Padrão OpenCV) ou direto em tons de cinza (modo="gray").
+    Usado quando o motor não entrega a imagem já decodificada.
     """
-    img = None
-    if conteudo:
-        # Lê direto da memória (mais rápido para uploads)
-        nparr = np.frombuffer(conteudo, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    else:
-        # Lê do disco
-        img = cv2.imread(caminho, cv2.IMREAD_COLOR)
-    return img
+    # Lê direto da memória quando há bytes (mais rápido para uploads), senão do disco
+    return decode_image(caminho, conteudo, modo)
+
+def contar_bordas_bloco(bloco, nucleo, limiar_min, limiar_max, blur=False):
+    """Aplica Canny no bloco (com halo) e conta pixels de borda apenas no núcleo."""
+    if blur:
+        bloco = cv2.GaussianBlur(bloco, (5, 5), 1.4)
+    bordas = cv2.Canny(bloco, limiar_min, limiar_max)
+    regiao = core_view(bordas, nucleo)
+    return {"pixels_borda": int(np.count_nonzero(regiao)), "total_pixels": int(regiao.size)}
 
 def img_para_base64(imagem):
     """Converte imagem numpy para string base64."""
@@ -36,23 +49,38 @@ class AnalisadorCannyPadrao(AnalisadorBase):
     def ordem(self) -> int:
         return 50
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("bordas", "canny")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 2
+
+    @property
+    def insumos(self) -> tuple:
+        return ("canny@50,150",)
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  insumos: dict = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        # Converte para escala de cinza
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Aplica detector de bordas Canny com thresholds padrão
-        bordas = cv2.Canny(img_gray, 50, 150)
+        # Aplica detector de bordas Canny com thresholds padrão (produto compartilhado pelo motor)
+        bordas = (insumos or compute(self.insumos, img_gray))["canny@50,150"]
         
         # Calcula métricas
         pixels_borda = np.sum(bordas == 255)
         percentual_bordas = (pixels_borda / bordas.size) * 100
         total_pixels = bordas.size
         
-        print(f"[Canny Padrão] {percentual_bordas:.2f}% pixels detectados como borda")
+        logger.debug("[Canny Padrão] %.2f%% pixels detectados como borda", percentual_bordas)
         
         # Gera imagens em base64
         imagens = {
@@ -72,6 +100,35 @@ class AnalisadorCannyPadrao(AnalisadorBase):
             extra={"imagens_processadas": imagens}
         )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        return HALO_CANNY
+
+    @property
+    def blocos_exatos(self) -> bool:
+        return False
+
+    def processar_bloco(self, bloco, nucleo):
+        return contar_bordas_bloco(bloco, nucleo, 50, 150)
+
+    def finalizar_blocos(self, acumulado, forma):
+        pixels_borda = acumulado["pixels_borda"]
+        percentual_bordas = (pixels_borda / acumulado["total_pixels"]) * 100
+        return AnalysisResult(
+            detalhe=f"Bordas detectadas: {percentual_bordas:.2f}% da imagem",
+            metrics={
+                "threshold_min": 50,
+                "threshold_max": 150,
+                "pixels_borda": int(pixels_borda),
+                "percentual": round(percentual_bordas, 2),
+                "total_pixels": int(acumulado["total_pixels"])
+            }
+        )
+
 # ==========================================
 # 2. DETECÇÃO DE BORDAS CANNY SENSÍVEL
 # ==========================================
@@ -84,20 +141,31 @@ class AnalisadorCannySensivel(AnalisadorBase):
     def ordem(self) -> int:
         return 51
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("bordas", "canny")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 2
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
         # Thresholds mais baixos = detecta mais bordas (mais sensível)
         bordas = cv2.Canny(img_gray, 30, 100)
         
         pixels_borda = np.sum(bordas == 255)
         percentual_bordas = (pixels_borda / bordas.size) * 100
         
-        print(f"[Canny Sensível] {percentual_bordas:.2f}% pixels detectados como borda")
+        logger.debug("[Canny Sensível] %.2f%% pixels detectados como borda", percentual_bordas)
         
         # Gera imagens em base64
         imagens = {
@@ -116,6 +184,34 @@ class AnalisadorCannySensivel(AnalisadorBase):
             extra={"imagens_processadas": imagens}
         )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        return HALO_CANNY
+
+    @property
+    def blocos_exatos(self) -> bool:
+        return False
+
+    def processar_bloco(self, bloco, nucleo):
+        return contar_bordas_bloco(bloco, nucleo, 30, 100)
+
+    def finalizar_blocos(self, acumulado, forma):
+        pixels_borda = acumulado["pixels_borda"]
+        percentual_bordas = (pixels_borda / acumulado["total_pixels"]) * 100
+        return AnalysisResult(
+            detalhe=f"Detecção sensível. Bordas: {percentual_bordas:.2f}%",
+            metrics={
+                "threshold_min": 30,
+                "threshold_max": 100,
+                "pixels_borda": int(pixels_borda),
+                "percentual": round(percentual_bordas, 2)
+            }
+        )
+
 # ==========================================
 # 3. DETECÇÃO DE BORDAS CANNY RIGOROSO
 # ==========================================
@@ -128,20 +224,31 @@ class AnalisadorCannyRigoroso(AnalisadorBase):
     def ordem(self) -> int:
         return 52
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("bordas", "canny")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 2
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
         # Thresholds mais altos = detecta menos bordas (mais rigoroso)
         bordas = cv2.Canny(img_gray, 100, 200)
         
         pixels_borda = np.sum(bordas == 255)
         percentual_bordas = (pixels_borda / bordas.size) * 100
         
-        print(f"[Canny Rigoroso] {percentual_bordas:.2f}% pixels detectados como borda")
+        logger.debug("[Canny Rigoroso] %.2f%% pixels detectados como borda", percentual_bordas)
         
         # Gera imagens em base64
         imagens = {
@@ -160,6 +267,34 @@ class AnalisadorCannyRigoroso(AnalisadorBase):
             extra={"imagens_processadas": imagens}
         )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        return HALO_CANNY
+
+    @property
+    def blocos_exatos(self) -> bool:
+        return False
+
+    def processar_bloco(self, bloco, nucleo):
+        return contar_bordas_bloco(bloco, nucleo, 100, 200)
+
+    def finalizar_blocos(self, acumulado, forma):
+        pixels_borda = acumulado["pixels_borda"]
+        percentual_bordas = (pixels_borda / acumulado["total_pixels"]) * 100
+        return AnalysisResult(
+            detalhe=f"Detecção rigorosa. Bordas: {percentual_bordas:.2f}%",
+            metrics={
+                "threshold_min": 100,
+                "threshold_max": 200,
+                "pixels_borda": int(pixels_borda),
+                "percentual": round(percentual_bordas, 2)
+            }
+        )
+
 # ==========================================
 # 4. DETECÇÃO DE BORDAS COM PRÉ-PROCESSAMENTO
 # ==========================================
@@ -172,23 +307,40 @@ class AnalisadorCannyComBlur(AnalisadorBase):
     def ordem(self) -> int:
         return 53
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("bordas", "canny")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 2
+
+    @property
+    def insumos(self) -> tuple:
+        return ("blur@5,1.4", "canny@50,150:blur@5,1.4")
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  insumos: dict = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Aplica Gaussian Blur para reduzir ruído antes do Canny
-        img_blur = cv2.GaussianBlur(img_gray, (5, 5), 1.4)
+        produtos = insumos or compute(self.insumos, img_gray)
+        # Gaussian Blur para reduzir ruído antes do Canny
+        img_blur = produtos["blur@5,1.4"]
         
-        # Aplica Canny na imagem suavizada
-        bordas = cv2.Canny(img_blur, 50, 150)
+        # Canny na imagem suavizada
+        bordas = produtos["canny@50,150:blur@5,1.4"]
         
         pixels_borda = np.sum(bordas == 255)
         percentual_bordas = (pixels_borda / bordas.size) * 100
         
-        print(f"[Canny + Blur] {percentual_bordas:.2f}% pixels detectados como borda")
+        logger.debug("[Canny + Blur] %.2f%% pixels detectados como borda", percentual_bordas)
         
         # Gera imagens em base64
         imagens = {
@@ -207,4 +359,33 @@ class AnalisadorCannyComBlur(AnalisadorBase):
                 "percentual": round(percentual_bordas, 2)
             },
             extra={"imagens_processadas": imagens}
-        )
\ No newline at end of file
+        )
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        return HALO_CANNY
+
+    @property
+    def blocos_exatos(self) -> bool:
+        return False
+
+    def processar_bloco(self, bloco, nucleo):
+        return contar_bordas_bloco(bloco, nucleo, 50, 150, blur=True)
+
+    def finalizar_blocos(self, acumulado, forma):
+        pixels_borda = acumulado["pixels_borda"]
+        percentual_bordas = (pixels_borda / acumulado["total_pixels"]) * 100
+        return AnalysisResult(
+            detalhe=f"Blur aplicado para reduzir ruído. Bordas: {percentual_bordas:.2f}%",
+            metrics={
+                "threshold_min": 50,
+                "threshold_max": 150,
+                "blur_kernel": 5,
+                "pixels_borda": int(pixels_borda),
+                "percentual": round(percentual_bordas, 2)
+            }
+        )
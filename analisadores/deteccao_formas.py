@@ -3,6 +3,8 @@ import numpy as np
 import base64
 from gerenciador import AnalisadorBase
 from models.analysis import AnalysisResult
+from services.decoding import decode_image, MODE_COLOR
+from services.intermediates import compute
 
 
 def img_para_base64(imagem):
@@ -33,26 +35,37 @@ class AnalisadorDeteccaoFormas(AnalisadorBase):
     def ordem(self) -> int:
         return 30  # Executar após equalização, como parte da análise
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+    @property
+    def tags(self) -> tuple:
+        return ("formas", "bordas")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_COLOR
+
+    @property
+    def insumos(self) -> tuple:
+        # Canny sobre a imagem binária (limiar 127) da versão em cinza
+        return ("canny@50,150:binary@127",)
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  insumos: dict = None) -> AnalysisResult:
         """
         Processa detecção de formas na imagem.
         
         Args:
             caminho_imagem: Caminho para o arquivo de imagem
             conteudo: Bytes da imagem (quando disponível, ex: upload)
+            imagem: Imagem BGR já decodificada pelo motor (opcional)
+            insumos: Produtos intermediários calculados pelo motor (opcional)
         
         Returns:
             AnalysisResult com métricas de formas detectadas
         """
         try:
-            # Carregar imagem
-            if conteudo is not None:
-                # Carregar de bytes
-                nparr = np.frombuffer(conteudo, np.uint8)
-                imagem = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            else:
-                # Carregar do arquivo
-                imagem = cv2.imread(caminho_imagem, cv2.IMREAD_COLOR)
+            # Carregar imagem (de bytes ou do arquivo) quando o motor não a entregou
+            if imagem is None:
+                imagem = decode_image(caminho_imagem, conteudo, MODE_COLOR)
             
             if imagem is None:
                 return AnalysisResult(
@@ -60,14 +73,8 @@ class AnalisadorDeteccaoFormas(AnalisadorBase):
                     metrics={"status": "erro"}
                 )
             
-            # Converter para escala de cinza
-            cinza = cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY)
-            
-            # Aplicar limiarização (thresholding)
-            _, binaria = cv2.threshold(cinza, 127, 255, cv2.THRESH_BINARY)
-            
-            # Detecção de bordas (Canny)
-            bordas = cv2.Canny(binaria, 50, 150)
+            # Cinza -> limiarização (127) -> Canny; o motor compartilha a limiarização com outros analisadores
+            bordas = (insumos or compute(self.insumos, imagem))["canny@50,150:binary@127"]
             
             # Busca de contornos
             contornos, _ = cv2.findContours(bordas, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
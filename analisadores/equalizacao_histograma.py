@@ -3,6 +3,7 @@ import numpy as np
 import base64
 from gerenciador import AnalisadorBase
 from models.analysis import AnalysisResult
+from services.decoding import decode_image, MODE_GRAY
 
 
 def img_para_base64(imagem):
@@ -32,36 +33,40 @@ class AnalisadorEqualizacaoHistograma(AnalisadorBase):
     def ordem(self) -> int:
         return 20  # Executar após pré-processamento, antes de análises complexas
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+    @property
+    def tags(self) -> tuple:
+        return ("contraste", "histograma")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 4
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
         """
         Processa equalização de histograma na imagem.
         
         Args:
             caminho_imagem: Caminho para o arquivo de imagem
             conteudo: Bytes da imagem (quando disponível, ex: upload)
+            imagem: Imagem já decodificada em tons de cinza pelo motor (opcional)
         
         Returns:
             AnalysisResult com métricas de contraste e detalhes da equalização
         """
         try:
-            # Carregar imagem
-            if conteudo is not None:
-                # Carregar de bytes
-                nparr = np.frombuffer(conteudo, np.uint8)
-                imagem = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            else:
-                # Carregar do arquivo
-                imagem = cv2.imread(caminho_imagem, cv2.IMREAD_COLOR)
+            # Carregar imagem direto em escala de cinza (de bytes ou do arquivo)
+            cinza = imagem if imagem is not None else decode_image(caminho_imagem, conteudo, MODE_GRAY)
             
-            if imagem is None:
+            if cinza is None:
                 return AnalysisResult(
                     detalhe="Erro: Não foi possível carregar a imagem.",
                     metrics={"status": "erro"}
                 )
             
-            # Converter para escala de cinza
-            cinza = cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY)
-            
             # Calcular contraste da imagem original (desvio padrão do histograma)
             contraste_original = float(np.std(cinza))
             
@@ -1,117 +1,299 @@
+import logging
 import cv2
 import numpy as np
 from gerenciador import AnalisadorBase
 from models.analysis import AnalysisResult
+from services.decoding import decode_image, MODE_COLOR, MODE_GRAY, MODE_GRAY16
+from services.glcm import glcm_weights
 
-def carregar_imagem_segura(caminho, conteudo):
+logger = logging.getLogger(__name__)
+
+def carregar_imagem_segura(caminho, conteudo, modo=MODE_COLOR):
     """
-    Carrega a imagem garantindo formato BGR (Padrão OpenCV).
+    Carrega a imagem em BGR (Padrão OpenCV) ou direto em tons de cinza (modo="gray").
+    Usado quando o motor não entrega a imagem já decodificada.
     """
-    img = None
-    if conteudo:
-        nparr = np.frombuffer(conteudo, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    else:
-        img = cv2.imread(caminho, cv2.IMREAD_COLOR)
-    return img
-
-def calcular_glcm(imagem_cinza, distancia=1, angulo=0, niveis=64):
+    # Lê direto da memória quando há bytes (mais rápido para uploads), senão do disco
+    return decode_image(caminho, conteudo, modo)
+
+def quantizar(imagem_cinza, niveis=64):
     """
-    Calcula a matriz de co-ocorrência de níveis de cinza (GLCM)
-    Versão corrigida com tratamento seguro de índices.
+    Quantiza a imagem para `niveis` tons de cinza (sem modificar a original).
+    Imagens de 16 bits usam a faixa 0..65535 (resultado uint16 quando niveis > 256).
+    Não cria tons que a imagem não tem: com mais níveis que a profundidade permite (ex.: 4096
+    numa imagem de 8 bits), devolve a imagem como está; veja `niveis_efetivos`.
+    Outros tipos (float de TIFF, inteiros com sinal) não têm faixa fixa: são reescalados da
+    faixa real da imagem (mínimo..máximo) para 0..niveis-1.
     """
-    # Faz uma cópia para não modificar a original
-    img_quantized = imagem_cinza.copy().astype(np.float32)
-    
-    # Quantiza a imagem para reduzir o número de níveis de cinza
+    if imagem_cinza.dtype == np.uint16:
+        if niveis >= 65536:
+            return imagem_cinza
+        quantizada = imagem_cinza.astype(np.uint32) * niveis >> 16
+        return quantizada.astype(np.uint8 if niveis <= 256 else np.uint16)
+    if imagem_cinza.dtype != np.uint8:
+        niveis = min(niveis, 65536)
+        img = np.nan_to_num(imagem_cinza.astype(np.float64))
+        minimo, maximo = (float(img.min()), float(img.max())) if img.size else (0.0, 0.0)
+        escala = niveis / (maximo - minimo) if maximo > minimo else 0.0
+        quantizada = np.minimum((img - minimo) * escala, niveis - 1)
+        return quantizada.astype(np.uint8 if niveis <= 256 else np.uint16)
     if niveis < 256:
         fator = 256 / niveis
-        img_quantized = (img_quantized / fator).astype(np.uint8)
-    else:
-        img_quantized = imagem_cinza.astype(np.uint8)
-    
-    # Inicializa a matriz GLCM
-    glcm = np.zeros((niveis, niveis), dtype=np.float64)
-    
-    # Calcula offsets baseados na distância e ângulo
-    offset_x = int(round(distancia * np.cos(angulo)))
-    offset_y = int(round(distancia * np.sin(angulo)))
-    
-    altura, largura = img_quantized.shape
+        return (imagem_cinza.astype(np.float32) / fator).astype(np.uint8)
+    return imagem_cinza.copy()
+
+def deslocamento(distancia, angulo):
+    """Offsets (x, y) do pixel vizinho para a distância e o ângulo dados."""
+    return int(round(distancia * np.cos(angulo))), int(round(distancia * np.sin(angulo)))
+
+def niveis_efetivos(imagem_cinza, niveis):
+    """Número de níveis que `quantizar` de fato produz: no máximo 256 em 8 bits e 65536 nos demais tipos."""
+    if imagem_cinza.dtype in (np.uint8, np.uint16):
+        return min(niveis, 1 << (8 * imagem_cinza.dtype.itemsize))
+    return min(niveis, 65536)
+
+def contar_glcm(img_quantizada, distancia=1, angulo=0, niveis=64, nucleo=None, mascara=None):
+    """
+    Conta os pares de co-ocorrência (matriz não normalizada, int64).
+
+    Só entram pares cujo pixel de referência está em `nucleo` (y0, y1, x0, x1) e cujo
+    vizinho está dentro da imagem. Sem `nucleo`, usa a imagem toda. No modo em blocos isso
+    torna as contagens dos blocos (com halo >= distância) somáveis de forma exata.
+    Com `mascara` (mesmo tamanho da imagem), só contam pares com os dois pixels dentro dela.
+    """
+    offset_x, offset_y = deslocamento(distancia, angulo)
+    altura, largura = img_quantizada.shape
+    y0, y1, x0, x1 = nucleo if nucleo is not None else (0, altura, 0, largura)
     
     # Define limites seguros para evitar índices fora dos bounds
-    start_i = max(0, -offset_y)
-    end_i = min(altura, altura - offset_y)
-    start_j = max(0, -offset_x)
-    end_j = min(largura, largura - offset_x)
-    
-    # Preenche a matriz GLCM com verificação de limites
-    for i in range(start_i, end_i):
-        for j in range(start_j, end_j):
-            pixel_atual = img_quantized[i, j]
-            pixel_vizinho = img_quantized[i + offset_y, j + offset_x]
-            
-            # Garante que os pixels estão dentro dos níveis
-            if 0 <= pixel_atual < niveis and 0 <= pixel_vizinho < niveis:
-                glcm[pixel_atual, pixel_vizinho] += 1
-    
-    # Normaliza a matriz
-    if glcm.sum() > 0:
-        glcm = glcm / glcm.sum()
+    start_i = max(y0, -offset_y)
+    end_i = min(y1, altura - offset_y)
+    start_j = max(x0, -offset_x)
+    end_j = min(x1, largura - offset_x)
+    if end_i <= start_i or end_j <= start_j:
+        return np.zeros((niveis, niveis), dtype=np.int64)
     
+    # Cada par (atual, vizinho) vira um código atual*niveis + vizinho; bincount conta todos de uma vez
+    atual = img_quantizada[start_i:end_i, start_j:end_j].astype(np.intp)
+    vizinho = img_quantizada[start_i + offset_y:end_i + offset_y, start_j + offset_x:end_j + offset_x]
+    codigos = atual * niveis + vizinho
+    if mascara is not None:
+        dentro = (mascara[start_i:end_i, start_j:end_j] > 0) & \
+                 (mascara[start_i + offset_y:end_i + offset_y, start_j + offset_x:end_j + offset_x] > 0)
+        codigos = codigos[dentro]
+    return np.bincount(codigos.ravel(), minlength=niveis * niveis).reshape(niveis, niveis)
+
+def normalizar_glcm(contagens):
+    glcm = contagens.astype(np.float64)
+    total = glcm.sum()
+    if total > 0:
+        glcm = glcm / total
     return glcm
 
+def calcular_glcm(imagem_cinza, distancia=1, angulo=0, niveis=64, mascara=None):
+    """
+    Calcula a matriz de co-ocorrência de níveis de cinza (GLCM) normalizada.
+    Contagem vetorizada (mesmo resultado do laço pixel a pixel anterior).
+    """
+    return normalizar_glcm(contar_glcm(quantizar(imagem_cinza, niveis), distancia, angulo, niveis,
+                                       mascara=mascara))
+
+def _entropia(p, eixo=-1):
+    """Entropia (bits) ao longo de `eixo`, ignorando as probabilidades nulas."""
+    return -np.sum(p * np.log2(p, out=np.zeros_like(p), where=p > 0), axis=eixo)
+
+def extrair_caracteristicas_lote(glcms):
+    """
+    Características de Haralick de uma pilha de GLCMs (..., niveis, niveis) de uma vez.
+
+    A pilha pode ter quaisquer dimensões à frente (ângulos x distâncias x imagens); cada
+    matriz é normalizada. Devolve um dicionário de arrays com a forma dessas dimensões:
+    as seis características clássicas mais média da soma, entropia da diferença e as
+    medidas de informação de correlação (IMC1/IMC2). Matrizes vazias dão zeros.
+    """
+    glcms = np.asarray(glcms, dtype=np.float64)
+    forma, niveis = glcms.shape[:-2], glcms.shape[-1]
+    pesos = glcm_weights(niveis)
+    p = glcms.reshape(-1, niveis * niveis)
+    total = p.sum(axis=1, keepdims=True)
+    p = p / np.where(total > 0, total, 1)
+    matrizes = p.reshape(-1, niveis, niveis)
+
+    # Contraste, dissimilaridade e homogeneidade numa única contração
+    contraste, dissimilaridade, homogeneidade = (p @ pesos.weights).T
+    energia = np.einsum("nk,nk->n", p, p)
+    entropia = _entropia(p)
+
+    # Correlação a partir das marginais (centradas, como na fórmula por matriz)
+    px, py = matrizes.sum(axis=2), matrizes.sum(axis=1)
+    di = pesos.indices - (px @ pesos.indices)[:, None]
+    dj = pesos.indices - (py @ pesos.indices)[:, None]
+    sigma_i = np.sqrt(np.einsum("nl,nl->n", px, di * di))
+    sigma_j = np.sqrt(np.einsum("nl,nl->n", py, dj * dj))
+    covariancia = np.einsum("nij,ni,nj->n", matrizes, di, dj)
+    validas = (sigma_i > 1e-10) & (sigma_j > 1e-10)
+    correlacao = np.where(validas, covariancia / np.where(validas, sigma_i * sigma_j, 1), 0.0)
+
+    # Distribuições de i+j e |i-j| somando as células já ordenadas por esses valores
+    p_soma = np.add.reduceat(p[:, pesos.sum_order], pesos.sum_starts, axis=1)
+    p_diferenca = np.add.reduceat(p[:, pesos.diff_order], pesos.diff_starts, axis=1)
+    soma_media = p_soma @ np.arange(2 * niveis - 1, dtype=np.float64)
+
+    # IMC: HXY1 = HXY2 = HX + HY (as marginais somam 1), então só falta a entropia de cada marginal
+    hx, hy = _entropia(px), _entropia(py)
+    informacao_mutua = np.maximum(hx + hy - entropia, 0.0)
+    maior = np.maximum(hx, hy)
+    imc1 = np.where(maior > 0, -informacao_mutua / np.where(maior > 0, maior, 1), 0.0)
+    imc2 = np.sqrt(1.0 - np.exp(-2.0 * informacao_mutua * np.log(2)))  # entropias em nats na fórmula
+
+    caracteristicas = {
+        'contraste': contraste,
+        'dissimilaridade': dissimilaridade,
+        'homogeneidade': homogeneidade,
+        'energia': energia,
+        'correlacao': correlacao,
+        'entropia': entropia,
+        'soma_media': soma_media,
+        'entropia_diferenca': _entropia(p_diferenca),
+        'imc1': imc1,
+        'imc2': imc2,
+    }
+    return {nome: valores.reshape(forma) for nome, valores in caracteristicas.items()}
+
 def extrair_caracteristicas_glcm(glcm):
     """
     Extrai características texturais da matriz GLCM
     """
     if glcm.sum() == 0:
         return {}
-    
-    glcm = glcm.astype(np.float64)
-    metrics = {}
-    
-    # Cria matrizes de índices
-    i, j = np.indices(glcm.shape)
-    
-    # 1. Contraste (Contrast)
-    contrast = np.sum(glcm * ((i - j) ** 2))
-    metrics['contraste'] = float(contrast)
-    
-    # 2. Dissimilaridade (Dissimilarity)
-    dissimilarity = np.sum(glcm * np.abs(i - j))
-    metrics['dissimilaridade'] = float(dissimilarity)
-    
-    # 3. Homogeneidade (Homogeneity)
-    with np.errstate(divide='ignore', invalid='ignore'):
-        homogeneity = np.sum(glcm / (1 + (i - j) ** 2))
-    metrics['homogeneidade'] = float(homogeneity)
-    
-    # 4. Energia (Energy)
-    energy = np.sum(glcm ** 2)
-    metrics['energia'] = float(energy)
-    
-    # 5. Correlação (Correlation)
-    mu_i = np.sum(i * glcm)
-    mu_j = np.sum(j * glcm)
-    sigma_i = np.sqrt(np.sum(glcm * (i - mu_i) ** 2))
-    sigma_j = np.sqrt(np.sum(glcm * (j - mu_j) ** 2))
-    
-    if sigma_i > 1e-10 and sigma_j > 1e-10:
-        correlation = np.sum(glcm * (i - mu_i) * (j - mu_j)) / (sigma_i * sigma_j)
-        metrics['correlacao'] = float(correlation)
-    else:
-        metrics['correlacao'] = 0.0
-    
-    # 6. Entropia (Entropy)
-    glcm_nonzero = glcm[glcm > 0]
-    if len(glcm_nonzero) > 0:
-        entropy = -np.sum(glcm_nonzero * np.log2(glcm_nonzero))
-        metrics['entropia'] = float(entropy)
-    else:
-        metrics['entropia'] = 0.0
-    
-    return metrics
+    return {nome: float(valor) for nome, valor in extrair_caracteristicas_lote(glcm).items()}
+
+# Até esta faixa de códigos, a contagem usa um bincount temporário (32 MiB) em vez de ordenar os pares
+_LIMITE_BINCOUNT = 1 << 22
+
+class GLCMEsparsa:
+    """
+    Contagens de co-ocorrência só das células não nulas: `codigos` (ordenados, únicos) e `contagens`,
+    para matrizes `niveis` x `niveis`.
+
+    Para muitos níveis (256 completos, 4096, 16 bits) a matriz densa niveis x niveis seria quase
+    toda zeros; aqui a memória cresce com o número de pares distintos, não com niveis².
+    Somar/subtrair duas instâncias combina as contagens (blocos, quadros de vídeo).
+    `bits` é a profundidade da imagem de origem (None se desconhecida) e atravessa as combinações.
+    """
+    __slots__ = ("codigos", "contagens", "niveis", "bits")
+
+    def __init__(self, codigos, contagens, niveis, bits=None):
+        self.codigos = codigos
+        self.contagens = contagens
+        self.niveis = niveis
+        self.bits = bits
+
+    @classmethod
+    def de_codigos(cls, codigos, niveis, bits=None):
+        if len(codigos) and codigos.max() < _LIMITE_BINCOUNT:
+            # Faixa de códigos pequena (ex.: 256 níveis): contar direto é O(n), sem ordenar
+            contagens = np.bincount(codigos)
+            valores = np.flatnonzero(contagens)
+            return cls(valores.astype(np.int64), contagens[valores].astype(np.int64), niveis, bits)
+        valores, contagens = np.unique(codigos, return_counts=True)
+        return cls(valores.astype(np.int64), contagens.astype(np.int64), niveis, bits)
+
+    def _combinar(self, outra, sinal):
+        if outra.niveis != self.niveis:
+            raise ValueError(f"GLCMs com níveis diferentes: {self.niveis} e {outra.niveis}.")
+        if None not in (self.bits, outra.bits) and outra.bits != self.bits:
+            raise ValueError(f"GLCMs de imagens com profundidades diferentes: {self.bits} e {outra.bits} bits.")
+        codigos, contagens = outra.codigos, sinal * outra.contagens
+        todos, inverso = np.unique(np.concatenate([self.codigos, codigos]), return_inverse=True)
+        soma = np.zeros(len(todos), dtype=np.int64)
+        np.add.at(soma, inverso, np.concatenate([self.contagens, contagens]))
+        nao_nulos = soma != 0
+        return GLCMEsparsa(todos[nao_nulos], soma[nao_nulos], self.niveis,
+                           self.bits if self.bits is not None else outra.bits)
+
+    def __add__(self, outra):
+        return self._combinar(outra, 1)
+
+    def __sub__(self, outra):
+        return self._combinar(outra, -1)
+
+    def total(self):
+        return int(self.contagens.sum())
+
+def contar_glcm_esparsa(img_quantizada, distancia=1, angulos=(0,), niveis=256, nucleo=None, mascara=None,
+                        bits=None):
+    """
+    Como `contar_glcm`, mas esparsa e com vários ângulos numa só estrutura.
+
+    O código de cada par é k*niveis² + atual*niveis + vizinho (k = índice do ângulo), de modo que
+    as células de cada ângulo ficam contíguas nos códigos ordenados. `bits` (profundidade da
+    imagem antes de quantizar) só é guardado na GLCM resultante.
+    """
+    offsets = [deslocamento(distancia, angulo) for angulo in angulos]
+    altura, largura = img_quantizada.shape
+    y0, y1, x0, x1 = nucleo if nucleo is not None else (0, altura, 0, largura)
+    partes = []
+    for k, (offset_x, offset_y) in enumerate(offsets):
+        start_i, end_i = max(y0, -offset_y), min(y1, altura - offset_y)
+        start_j, end_j = max(x0, -offset_x), min(x1, largura - offset_x)
+        if end_i <= start_i or end_j <= start_j:
+            continue
+        atual = img_quantizada[start_i:end_i, start_j:end_j].astype(np.int64)
+        vizinho = img_quantizada[start_i + offset_y:end_i + offset_y, start_j + offset_x:end_j + offset_x]
+        codigos = k * niveis * niveis + atual * niveis + vizinho
+        if mascara is not None:
+            dentro = (mascara[start_i:end_i, start_j:end_j] > 0) & \
+                     (mascara[start_i + offset_y:end_i + offset_y, start_j + offset_x:end_j + offset_x] > 0)
+            codigos = codigos[dentro]
+        partes.append(codigos.ravel())
+    return GLCMEsparsa.de_codigos(np.concatenate(partes) if partes else np.zeros(0, dtype=np.int64), niveis, bits)
+
+def caracteristicas_esparsas(glcm, num_angulos=1):
+    """
+    As mesmas características de `extrair_caracteristicas_lote`, calculadas direto das células
+    não nulas (sem montar matrizes niveis x niveis). Devolve um dicionário de arrays, um valor
+    por ângulo; ângulos sem pares dão zeros.
+    """
+    niveis = glcm.niveis
+    quadrado = np.int64(niveis) * niveis
+    angulo = glcm.codigos // quadrado
+    # Códigos ordenados: as células de cada ângulo são uma fatia contígua
+    limites = np.searchsorted(angulo, np.arange(num_angulos + 1))
+    nomes = ('contraste', 'dissimilaridade', 'homogeneidade', 'energia', 'correlacao', 'entropia',
+             'soma_media', 'entropia_diferenca', 'imc1', 'imc2')
+    saida = {nome: np.zeros(num_angulos) for nome in nomes}
+    for k in range(num_angulos):
+        fatia = slice(limites[k], limites[k + 1])
+        contagens = glcm.contagens[fatia]
+        if contagens.sum() == 0:
+            continue
+        resto = glcm.codigos[fatia] - k * quadrado
+        i, j = resto // niveis, resto % niveis
+        p = contagens / contagens.sum()
+        diferenca = (i - j).astype(np.float64)
+
+        px = np.bincount(i, weights=p, minlength=niveis)
+        py = np.bincount(j, weights=p, minlength=niveis)
+        mu_i, mu_j = float(p @ i), float(p @ j)
+        sigma_i = np.sqrt(px @ (np.arange(niveis) - mu_i) ** 2)
+        sigma_j = np.sqrt(py @ (np.arange(niveis) - mu_j) ** 2)
+        entropia = _entropia(p)
+        hx, hy = _entropia(px), _entropia(py)
+        informacao_mutua = max(hx + hy - entropia, 0.0)
+
+        saida['contraste'][k] = p @ diferenca ** 2
+        saida['dissimilaridade'][k] = p @ np.abs(diferenca)
+        saida['homogeneidade'][k] = p @ (1.0 / (1.0 + diferenca ** 2))
+        saida['energia'][k] = p @ p
+        if sigma_i > 1e-10 and sigma_j > 1e-10:
+            saida['correlacao'][k] = (p @ ((i - mu_i) * (j - mu_j))) / (sigma_i * sigma_j)
+        saida['entropia'][k] = entropia
+        saida['soma_media'][k] = p @ (i + j)
+        saida['entropia_diferenca'][k] = _entropia(np.bincount(np.abs(i - j), weights=p))
+        saida['imc1'][k] = -informacao_mutua / max(hx, hy) if max(hx, hy) > 0 else 0.0
+        saida['imc2'][k] = np.sqrt(1.0 - np.exp(-2.0 * informacao_mutua * np.log(2)))
+    return saida
 
 class AnalisadorGLCM(AnalisadorBase):
     @property
@@ -121,96 +303,128 @@ class AnalisadorGLCM(AnalisadorBase):
     @property
     def ordem(self) -> int:
         return 70
+
+    @property
+    def tags(self) -> tuple:
+        return ("textura", "glcm")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 4
     
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+    # Parâmetros para GLCM
+    distancia = 1
+    angulos = [0, np.pi/4, np.pi/2, 3*np.pi/4]  # 0°, 45°, 90°, 135°
+    niveis = 64  # Reduz níveis para melhor performance
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
         try:
-            img = carregar_imagem_segura(caminho_imagem, conteudo)
-            if img is None:
+            # Imagem já em tons de cinza vinda do motor; sem ela, decodifica direto em cinza
+            img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+            if img_gray is None:
                 return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
             
-            # Converte para tons de cinza
-            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Parâmetros para GLCM
-            distancia = 1
-            angulos = [0, np.pi/4, np.pi/2, 3*np.pi/4]  # 0°, 45°, 90°, 135°
-            niveis = 64  # Reduz níveis para melhor performance
-            
             # Calcula GLCM para diferentes ângulos
-            caracteristicas_por_angulo = []
-            glcm_info = {}
-            
-            for idx, angulo in enumerate(angulos):
+            img_quantizada = quantizar(img_gray, self.niveis)
+            glcms = []
+            for angulo in self.angulos:
                 try:
-                    glcm = calcular_glcm(img_gray, distancia, angulo, niveis)
-                    caracteristicas = extrair_caracteristicas_glcm(glcm)
-                    
-                    if caracteristicas:
-                        caracteristicas_por_angulo.append(caracteristicas)
-                        
-                        # Armazena informações do GLCM
-                        angulo_graus = int(np.degrees(angulo))
-                        glcm_info[f'angulo_{angulo_graus}'] = {
-                            'glcm_nao_zero': int(np.count_nonzero(glcm)),
-                            'soma_glcm': float(glcm.sum())
-                        }
-                        
+                    glcms.append(normalizar_glcm(contar_glcm(img_quantizada, self.distancia, angulo, self.niveis,
+                                                             mascara=mascara)))
                 except Exception as e:
-                    print(f"[DEBUG] Erro no ângulo {np.degrees(angulo):.0f}°: {e}")
-                    continue
-            
-            if not caracteristicas_por_angulo:
-                return AnalysisResult(
-                    detalhe="Não foi possível calcular características GLCM", 
-                    metrics={}
-                )
-            
-            # Combina características (média entre ângulos)
-            metrics = {}
-            todas_chaves = set()
-            for carac in caracteristicas_por_angulo:
-                todas_chaves.update(carac.keys())
-            
-            for key in todas_chaves:
-                valores = [carac.get(key, 0) for carac in caracteristicas_por_angulo]
-                metrics[key] = float(np.mean(valores))
-                metrics[f'{key}_std'] = float(np.std(valores))
-            
-            # Adiciona informações gerais
-            metrics.update({
-                'niveis_cinza': niveis,
-                'distancia': distancia,
-                'num_angulos_validos': len(caracteristicas_por_angulo),
-                'altura_imagem': img_gray.shape[0],
-                'largura_imagem': img_gray.shape[1]
-            })
+                    logger.debug("Erro no ângulo %.0f°: %s", np.degrees(angulo), e)
+                    glcms.append(None)
             
-            # Debug no terminal
-            print(f"[DEBUG GLCM] Imagem: {img_gray.shape}, Ângulos processados: {len(caracteristicas_por_angulo)}")
-            for key, value in metrics.items():
-                if not key.endswith('_std') and key in ['contraste', 'homogeneidade', 'energia', 'entropia']:
-                    print(f"  {key}: {value:.4f}")
-            
-            detalhe = (f"GLCM com {niveis} níveis. "
-                      f"Contraste: {metrics.get('contraste', 0):.2f}, "
-                      f"Homogeneidade: {metrics.get('homogeneidade', 0):.3f}, "
-                      f"Entropia: {metrics.get('entropia', 0):.3f}")
+            return self._resumir(glcms, img_gray.shape)
             
+        except Exception as e:
+            logger.warning("Erro GLCM: %s", e)
             return AnalysisResult(
-                detalhe=detalhe,
-                metrics=metrics,
-                extra={
-                    'angulos_analisados': [int(np.degrees(a)) for a in angulos],
-                    'glcm_info': glcm_info
-                }
+                detalhe=f"Erro na análise GLCM: {str(e)}",
+                metrics={}
             )
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        # Pares cujo vizinho cai no bloco ao lado precisam de `distancia` pixels de margem
+        return self.distancia
+
+    def processar_bloco(self, bloco, nucleo):
+        img_quantizada = quantizar(bloco, self.niveis)
+        return {"contagens": np.stack([contar_glcm(img_quantizada, self.distancia, a, self.niveis, nucleo)
+                                       for a in self.angulos])}
+
+    def finalizar_blocos(self, acumulado, forma):
+        return self._resumir([normalizar_glcm(c) for c in acumulado["contagens"]], forma)
+
+    def _resumir(self, glcms, forma) -> AnalysisResult:
+        """Extrai as características de cada ângulo e combina (média/desvio entre ângulos)."""
+        niveis, distancia, angulos = self.niveis, self.distancia, self.angulos
+        glcm_info = {}
+        validos = []
+        for angulo, glcm in zip(angulos, glcms):
+            if glcm is None or glcm.sum() == 0:
+                continue
+            validos.append(glcm)
             
-        except Exception as e:
-            print(f"[ERRO GLCM] {e}")
+            # Armazena informações do GLCM
+            angulo_graus = int(np.degrees(angulo))
+            glcm_info[f'angulo_{angulo_graus}'] = {
+                'glcm_nao_zero': int(np.count_nonzero(glcm)),
+                'soma_glcm': float(glcm.sum())
+            }
+        
+        # Todos os ângulos de uma vez: cada característica vem como um vetor (um valor por ângulo)
+        caracteristicas_por_angulo = extrair_caracteristicas_lote(np.stack(validos)) if validos else {}
+        
+        if not caracteristicas_por_angulo:
             return AnalysisResult(
-                detalhe=f"Erro na análise GLCM: {str(e)}",
+                detalhe="Não foi possível calcular características GLCM", 
                 metrics={}
             )
+        
+        # Combina características (média entre ângulos)
+        metrics = {}
+        for key, valores in caracteristicas_por_angulo.items():
+            metrics[key] = float(np.mean(valores))
+            metrics[f'{key}_std'] = float(np.std(valores))
+        
+        # Adiciona informações gerais
+        metrics.update({
+            'niveis_cinza': niveis,
+            'distancia': distancia,
+            'num_angulos_validos': len(validos),
+            'altura_imagem': forma[0],
+            'largura_imagem': forma[1]
+        })
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("GLCM: imagem %s, ângulos processados: %d, %s", tuple(forma), len(validos),
+                         ", ".join(f"{k}={metrics[k]:.4f}" for k in ('contraste', 'homogeneidade', 'energia', 'entropia')
+                                   if k in metrics))
+        
+        detalhe = (f"GLCM com {niveis} níveis. "
+                  f"Contraste: {metrics.get('contraste', 0):.2f}, "
+                  f"Homogeneidade: {metrics.get('homogeneidade', 0):.3f}, "
+                  f"Entropia: {metrics.get('entropia', 0):.3f}")
+        
+        return AnalysisResult(
+            detalhe=detalhe,
+            metrics=metrics,
+            extra={
+                'angulos_analisados': [int(np.degrees(a)) for a in angulos],
+                'glcm_info': glcm_info
+            }
+        )
 
 class AnalisadorGLCMContraste(AnalisadorBase):
     @property
@@ -220,44 +434,72 @@ class AnalisadorGLCMContraste(AnalisadorBase):
     @property
     def ordem(self) -> int:
         return 71
+
+    @property
+    def tags(self) -> tuple:
+        return ("textura", "glcm")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 4
     
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
         try:
-            img = carregar_imagem_segura(caminho_imagem, conteudo)
-            if img is None:
+            # Imagem já em tons de cinza vinda do motor; sem ela, decodifica direto em cinza
+            img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+            if img_gray is None:
                 return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
             
-            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
             # Usa apenas ângulo 0° para simplificar
-            glcm = calcular_glcm(img_gray, distancia=1, angulo=0, niveis=64)
-            caracteristicas = extrair_caracteristicas_glcm(glcm)
-            
-            metrics = {
-                'contraste': caracteristicas.get('contraste', 0),
-                'homogeneidade': caracteristicas.get('homogeneidade', 0),
-                'dissimilaridade': caracteristicas.get('dissimilaridade', 0)
-            }
-            
-            detalhe = (f"Contraste: {metrics['contraste']:.2f} | "
-                      f"Homogeneidade: {metrics['homogeneidade']:.3f} | "
-                      f"Dissimilaridade: {metrics['dissimilaridade']:.3f}")
-            
-            print(f"[DEBUG CONTRASTE] Contraste: {metrics['contraste']:.2f}")
-            print(f"[DEBUG HOMOGENEIDADE] Homogeneidade: {metrics['homogeneidade']:.3f}")
-            
-            return AnalysisResult(
-                detalhe=detalhe,
-                metrics=metrics
-            )
+            glcm = calcular_glcm(img_gray, distancia=1, angulo=0, niveis=64, mascara=mascara)
+            return self._resumir(glcm)
             
         except Exception as e:
-            print(f"[ERRO GLCM Contraste] {e}")
+            logger.warning("Erro GLCM Contraste: %s", e)
             return AnalysisResult(
                 detalhe=f"Erro no GLCM Contraste: {str(e)}",
                 metrics={}
             )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        return 1
+
+    def processar_bloco(self, bloco, nucleo):
+        return {"contagens": contar_glcm(quantizar(bloco, 64), 1, 0, 64, nucleo)}
+
+    def finalizar_blocos(self, acumulado, forma):
+        return self._resumir(normalizar_glcm(acumulado["contagens"]))
+
+    def _resumir(self, glcm) -> AnalysisResult:
+        caracteristicas = extrair_caracteristicas_glcm(glcm)
+        
+        metrics = {
+            'contraste': caracteristicas.get('contraste', 0),
+            'homogeneidade': caracteristicas.get('homogeneidade', 0),
+            'dissimilaridade': caracteristicas.get('dissimilaridade', 0)
+        }
+        
+        detalhe = (f"Contraste: {metrics['contraste']:.2f} | "
+                  f"Homogeneidade: {metrics['homogeneidade']:.3f} | "
+                  f"Dissimilaridade: {metrics['dissimilaridade']:.3f}")
+        
+        logger.debug("Contraste: %.2f, homogeneidade: %.3f", metrics['contraste'], metrics['homogeneidade'])
+        
+        return AnalysisResult(
+            detalhe=detalhe,
+            metrics=metrics
+        )
+
 class AnalisadorGLCMEnergiaEntropia(AnalisadorBase):
     @property
     def nome_modulo(self) -> str:
@@ -266,39 +508,190 @@ class AnalisadorGLCMEnergiaEntropia(AnalisadorBase):
     @property
     def ordem(self) -> int:
         return 72
+
+    @property
+    def tags(self) -> tuple:
+        return ("textura", "glcm")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 4
     
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
         try:
-            img = carregar_imagem_segura(caminho_imagem, conteudo)
-            if img is None:
+            # Imagem já em tons de cinza vinda do motor; sem ela, decodifica direto em cinza
+            img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+            if img_gray is None:
                 return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
             
-            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            glcm = calcular_glcm(img_gray, distancia=1, angulo=0, niveis=64)
-            caracteristicas = extrair_caracteristicas_glcm(glcm)
-            
-            metrics = {
-                'energia': caracteristicas.get('energia', 0),
-                'entropia': caracteristicas.get('entropia', 0),
-                'correlacao': caracteristicas.get('correlacao', 0)
-            }
-            
-            detalhe = (f"Energia: {metrics['energia']:.4f} | "
-                      f"Entropia: {metrics['entropia']:.3f} | "
-                      f"Correlação: {metrics['correlacao']:.3f}")
-            
-            print(f"[DEBUG ENERGIA] Energia: {metrics['energia']:.4f}")
-            print(f"[DEBUG ENTROPIA] Entropia: {metrics['entropia']:.3f}")
+            glcm = calcular_glcm(img_gray, distancia=1, angulo=0, niveis=64, mascara=mascara)
+            return self._resumir(glcm)
             
+        except Exception as e:
+            logger.warning("Erro GLCM Energia: %s", e)
             return AnalysisResult(
-                detalhe=detalhe,
-                metrics=metrics
+                detalhe=f"Erro no GLCM Energia: {str(e)}",
+                metrics={}
             )
-            
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        return 1
+
+    def processar_bloco(self, bloco, nucleo):
+        return {"contagens": contar_glcm(quantizar(bloco, 64), 1, 0, 64, nucleo)}
+
+    def finalizar_blocos(self, acumulado, forma):
+        return self._resumir(normalizar_glcm(acumulado["contagens"]))
+
+    def _resumir(self, glcm) -> AnalysisResult:
+        caracteristicas = extrair_caracteristicas_glcm(glcm)
+        
+        metrics = {
+            'energia': caracteristicas.get('energia', 0),
+            'entropia': caracteristicas.get('entropia', 0),
+            'correlacao': caracteristicas.get('correlacao', 0)
+        }
+        
+        detalhe = (f"Energia: {metrics['energia']:.4f} | "
+                  f"Entropia: {metrics['entropia']:.3f} | "
+                  f"Correlação: {metrics['correlacao']:.3f}")
+        
+        logger.debug("Energia: %.4f, entropia: %.3f", metrics['energia'], metrics['entropia'])
+        
+        return AnalysisResult(
+            detalhe=detalhe,
+            metrics=metrics
+        )
+
+# Níveis padrão da GLCM esparsa por profundidade da imagem (bits por amostra)
+NIVEIS_POR_BITS = {8: 256, 16: 4096}
+
+class AnalisadorGLCMAltaResolucao(AnalisadorBase):
+    @property
+    def nome_modulo(self) -> str:
+        return "GLCM: Alta Resolução (Esparsa)"
+
+    @property
+    def ordem(self) -> int:
+        return 74
+
+    @property
+    def tags(self) -> tuple:
+        return ("textura", "glcm")
+
+    @property
+    def modo_leitura(self) -> str:
+        # Mantém os 16 bits de PNG/TIFF (as outras GLCMs recebem a imagem já em 8 bits)
+        return MODE_GRAY16
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 4
+
+    # `niveis` None: derivado da profundidade da imagem (NIVEIS_POR_BITS: 256 em 8 bits, 4096 em 16 bits;
+    # até 65536, com memória proporcional aos pares distintos). Um valor fixo vale para toda imagem,
+    # limitado ao que a profundidade permite (8 bits: 256), e é esse o `niveis_cinza` reportado.
+    distancia = 1
+    angulos = [0, np.pi/4, np.pi/2, 3*np.pi/4]
+    niveis = None
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
+        try:
+            img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY16)
+            if img_gray is None:
+                return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
+
+            niveis = self._niveis(img_gray)
+            glcm = contar_glcm_esparsa(quantizar(img_gray, niveis), self.distancia, self.angulos, niveis,
+                                       mascara=mascara, bits=img_gray.dtype.itemsize * 8)
+            return self._resumir(glcm, img_gray.shape)
+
         except Exception as e:
-            print(f"[ERRO GLCM Energia] {e}")
+            logger.warning("Erro GLCM esparsa: %s", e)
             return AnalysisResult(
-                detalhe=f"Erro no GLCM Energia: {str(e)}",
+                detalhe=f"Erro na GLCM esparsa: {str(e)}",
                 metrics={}
-            )
\ No newline at end of file
+            )
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        return self.distancia
+
+    def processar_bloco(self, bloco, nucleo):
+        # GLCMEsparsa soma (e subtrai) com +/-: a combinação padrão dos blocos funciona sem mudanças
+        niveis = self._niveis(bloco)
+        return {"contagens": contar_glcm_esparsa(quantizar(bloco, niveis), self.distancia, self.angulos,
+                                                 niveis, nucleo, bits=bloco.dtype.itemsize * 8)}
+
+    def finalizar_blocos(self, acumulado, forma):
+        return self._resumir(acumulado["contagens"], forma)
+
+    def _niveis(self, imagem):
+        """Níveis da GLCM para esta imagem: os efetivos de `niveis` ou, sem ele, os da profundidade."""
+        if self.niveis is None:
+            return NIVEIS_POR_BITS.get(imagem.dtype.itemsize * 8, 256)
+        # Em 8 bits não há mais que 256 tons: a GLCM (e o relatório) usam os níveis efetivos
+        return niveis_efetivos(imagem, self.niveis)
+
+    def _resumir(self, glcm, forma) -> AnalysisResult:
+        niveis = glcm.niveis
+        caracteristicas = caracteristicas_esparsas(glcm, len(self.angulos))
+        quadrado = niveis * niveis
+        limites = np.searchsorted(glcm.codigos, np.arange(len(self.angulos) + 1) * quadrado)
+        glcm_info, validos = {}, []
+        for k, angulo in enumerate(self.angulos):
+            contagens = glcm.contagens[limites[k]:limites[k + 1]]
+            if contagens.sum() == 0:
+                continue
+            validos.append(k)
+            glcm_info[f'angulo_{int(np.degrees(angulo))}'] = {
+                'glcm_nao_zero': int(len(contagens)),
+                'pares': int(contagens.sum())
+            }
+
+        if not validos:
+            return AnalysisResult(detalhe="Não foi possível calcular características GLCM", metrics={})
+
+        metrics = {}
+        for key, valores in caracteristicas.items():
+            metrics[key] = float(np.mean(valores[validos]))
+            metrics[f'{key}_std'] = float(np.std(valores[validos]))
+        metrics.update({
+            'niveis_cinza': niveis,
+            'distancia': self.distancia,
+            'num_angulos_validos': len(validos),
+            'celulas_nao_zero': int(len(glcm.codigos)),
+            'altura_imagem': forma[0],
+            'largura_imagem': forma[1]
+        })
+        if glcm.bits:
+            metrics['bits_imagem'] = glcm.bits
+
+        detalhe = (f"GLCM esparsa com {niveis} níveis ({len(glcm.codigos)} células não nulas). "
+                   f"Contraste: {metrics['contraste']:.2f}, "
+                   f"Homogeneidade: {metrics['homogeneidade']:.3f}, "
+                   f"Entropia: {metrics['entropia']:.3f}")
+
+        return AnalysisResult(
+            detalhe=detalhe,
+            metrics=metrics,
+            extra={
+                'angulos_analisados': [int(np.degrees(a)) for a in self.angulos],
+                'glcm_info': glcm_info
+            }
+        )
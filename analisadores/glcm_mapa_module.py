@@ -0,0 +1,176 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from gerenciador import AnalisadorBase
+from models.analysis import AnalysisResult
+from services.decoding import MODE_GRAY
+from services.glcm import glcm_weights
+from services.resources import RESOURCES
+from analisadores.glcm_analyzer import carregar_imagem_segura, deslocamento, quantizar
+
+logger = logging.getLogger(__name__)
+
+CARACTERISTICAS = ("contraste", "energia", "homogeneidade", "entropia")
+
+
+def caracteristicas_lote(contagens, niveis):
+    """Contraste, energia, homogeneidade e entropia de várias GLCMs de uma vez (uma por linha, achatadas).
+
+    Só as quatro dos mapas (o `extrair_caracteristicas_lote` completo custaria mais por janela).
+    """
+    total = contagens.sum(axis=1, keepdims=True)
+    p = contagens / np.maximum(total, 1)
+    pesos = glcm_weights(niveis).weights
+    log_p = np.log2(p, out=np.zeros_like(p), where=p > 0)
+    return {
+        "contraste": p @ pesos[:, 0],
+        "energia": np.einsum("ij,ij->i", p, p),
+        "homogeneidade": p @ pesos[:, 2],
+        "entropia": -np.einsum("ij,ij->i", p, log_p),
+    }
+
+
+def _codigos(img_quantizada, offset_x, offset_y, niveis):
+    """Código de par (atual*niveis + vizinho) de cada pixel; `niveis²` onde o vizinho cai fora da imagem."""
+    altura, largura = img_quantizada.shape
+    codigos = np.full((altura, largura), niveis * niveis, dtype=np.intp)
+    y0, y1 = max(0, -offset_y), min(altura, altura - offset_y)
+    x0, x1 = max(0, -offset_x), min(largura, largura - offset_x)
+    if y1 > y0 and x1 > x0:
+        codigos[y0:y1, x0:x1] = (img_quantizada[y0:y1, x0:x1].astype(np.intp) * niveis
+                                 + img_quantizada[y0 + offset_y:y1 + offset_y, x0 + offset_x:x1 + offset_x])
+    return codigos
+
+
+def _histograma_colunas(codigos, linhas, bins):
+    """Contagem de cada código por coluna nas `linhas` dadas: matriz (largura, bins), sem o código inválido."""
+    bloco = codigos[linhas]
+    largura = bloco.shape[1]
+    indices = (np.arange(largura) * (bins + 1) + bloco).ravel()
+    return np.bincount(indices, minlength=largura * (bins + 1)).reshape(largura, bins + 1)[:, :bins]
+
+
+def _faixa(linhas, topos, codigos_angulos, janela, bins, lefts, niveis, mapas):
+    """Preenche, em `mapas`, as linhas `linhas` do mapa (janelas com linha de topo em `topos`).
+
+    Por ângulo, mantém o histograma de pares por coluna das linhas da janela atual: ao descer
+    `passo` linhas, subtrai as linhas que saem e soma as que entram. Na horizontal, a soma
+    acumulada das colunas dá cada janela como (entra - sai) em relação à anterior. As
+    características de cada linha de janelas são calculadas e gravadas antes de descer, então só
+    as contagens de uma linha de janelas existem por vez.
+    """
+    colunas = [None] * len(codigos_angulos)
+    anterior = None
+    for linha, topo in zip(linhas, topos):
+        janelas = np.zeros((len(lefts), bins), dtype=np.int64)
+        for a, (codigos, (offset_x, offset_y)) in enumerate(codigos_angulos):
+            # Linhas/colunas de referência cujo par (referência, vizinho) cabe inteiro na janela
+            r0, r1 = max(0, -offset_y), janela - max(0, offset_y)
+            c0, c1 = max(0, -offset_x), janela - max(0, offset_x)
+            if r1 <= r0 or c1 <= c0:
+                continue
+            if colunas[a] is None or topo - anterior >= r1 - r0:
+                colunas[a] = _histograma_colunas(codigos, slice(topo + r0, topo + r1), bins).astype(np.int64)
+            else:
+                desce = topo - anterior
+                colunas[a] -= _histograma_colunas(codigos, slice(anterior + r0, anterior + r0 + desce), bins)
+                colunas[a] += _histograma_colunas(codigos, slice(anterior + r1, anterior + r1 + desce), bins)
+            acumulado = np.zeros((colunas[a].shape[0] + 1, bins), dtype=np.int64)
+            np.cumsum(colunas[a], axis=0, out=acumulado[1:])
+            janelas += acumulado[lefts + c1] - acumulado[lefts + c0]
+        anterior = topo
+        for nome, valores in caracteristicas_lote(janelas, niveis).items():
+            mapas[nome][linha] = valores
+
+
+def mapas_glcm(imagem_cinza, janela=15, passo=8, niveis=16, distancia=1, angulos=(0, np.pi / 2), bandas=None):
+    """Mapas de contraste, energia, homogeneidade e entropia de uma janela deslizante.
+
+    A janela `janela` x `janela` anda de `passo` em `passo` pixels (passo 1 = um valor por pixel,
+    menos a borda); o valor (i, j) do mapa é o da janela com canto em (i*passo, j*passo). As
+    contagens dos `angulos` são somadas numa única GLCM por janela. As faixas de linhas do mapa
+    são processadas em paralelo por `bandas` threads (padrão: núcleos do trabalhador atual).
+    """
+    altura, largura = imagem_cinza.shape[:2]
+    if altura < janela or largura < janela:
+        return None
+    img_quantizada = quantizar(imagem_cinza, niveis)
+    bins = niveis * niveis
+    topos = np.arange(0, altura - janela + 1, passo)
+    lefts = np.arange(0, largura - janela + 1, passo)
+    codigos_angulos = []
+    for angulo in angulos:
+        offset_x, offset_y = deslocamento(distancia, angulo)
+        codigos_angulos.append((_codigos(img_quantizada, offset_x, offset_y, niveis), (offset_x, offset_y)))
+
+    mapas = {nome: np.empty((len(topos), len(lefts)), dtype=np.float32) for nome in CARACTERISTICAS}
+    bandas = max(1, min(bandas or RESOURCES.cores_per_worker, len(topos)))
+    faixas = np.array_split(np.arange(len(topos)), bandas)
+
+    def faixa(linhas):
+        _faixa(linhas, topos[linhas], codigos_angulos, janela, bins, lefts, niveis, mapas)
+
+    if bandas == 1:
+        faixa(faixas[0])
+    else:
+        with ThreadPoolExecutor(max_workers=bandas, thread_name_prefix="glcm-mapa") as pool:
+            list(pool.map(faixa, faixas))
+    return mapas
+
+
+class AnalisadorMapaGLCM(AnalisadorBase):
+    @property
+    def nome_modulo(self) -> str:
+        return "GLCM: Mapa de Textura Local"
+
+    @property
+    def ordem(self) -> int:
+        return 73
+
+    @property
+    def tags(self) -> tuple:
+        return ("textura", "glcm", "mapa")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 4
+
+    # Janela deslizante: tamanho, passo (1 = mapa por pixel) e GLCM de cada janela
+    janela = 15
+    passo = 8
+    niveis = 16  # poucos níveis: cada janela tem só janela² pares
+    distancia = 1
+    angulos = (0, np.pi / 2)
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None:
+            return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
+
+        mapas = mapas_glcm(img_gray, self.janela, self.passo, self.niveis, self.distancia, self.angulos)
+        if mapas is None:
+            return AnalysisResult(detalhe=f"Imagem menor que a janela de {self.janela}x{self.janela}.", metrics={})
+
+        metrics = {}
+        for nome, mapa in mapas.items():
+            metrics[f"{nome}_media"] = float(mapa.mean())
+            metrics[f"{nome}_min"] = float(mapa.min())
+            metrics[f"{nome}_max"] = float(mapa.max())
+        linhas, colunas = mapas["contraste"].shape
+        metrics.update({"janela": self.janela, "passo": self.passo, "niveis_cinza": self.niveis,
+                        "linhas_mapa": linhas, "colunas_mapa": colunas})
+        logger.debug("Mapa GLCM %dx%d (janela %d, passo %d)", linhas, colunas, self.janela, self.passo)
+
+        return AnalysisResult(
+            detalhe=(f"Mapa de textura {linhas}x{colunas} (janela {self.janela}px, passo {self.passo}px). "
+                     f"Contraste médio: {metrics['contraste_media']:.2f}, "
+                     f"entropia média: {metrics['entropia_media']:.3f}"),
+            metrics=metrics,
+            extra={"mapas": mapas,
+                   "angulos_analisados": [int(np.degrees(a)) for a in self.angulos]}
+        )
@@ -1,21 +1,32 @@
+import logging
 import cv2
 import numpy as np
 from gerenciador import AnalisadorBase
 from models.analysis import AnalysisResult
+from services.decoding import decode_image, MODE_COLOR, MODE_GRAY
+from services.tiling import core_view
 
-def carregar_imagem_segura(caminho, conteudo):
+logger = logging.getLogger(__name__)
+
+def carregar_imagem_segura(caminho, conteudo, modo=MODE_COLOR):
     """
-    Carrega a imagem garantindo formato BGR (Padrão OpenCV).
+    Carrega a imagem em BGR (Padrão OpenCV) ou direto em tons de cinza (modo="gray").
+    Usado quando o motor não entrega a imagem já decodificada.
     """
-    img = None
-    if conteudo:
-        # Lê direto da memória (mais rápido para uploads)
-        nparr = np.frombuffer(conteudo, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    else:
-        # Lê do disco
-        img = cv2.imread(caminho, cv2.IMREAD_COLOR)
-    return img
+    # Lê direto da memória quando há bytes (mais rápido para uploads), senão do disco
+    return decode_image(caminho, conteudo, modo)
+
+# Eixo dos histogramas, compartilhado (somente leitura) por todos os resultados
+NIVEIS = np.arange(256)
+NIVEIS.flags.writeable = False
+
+def contar_niveis(canal):
+    """Histograma exato (int64) de 256 níveis; usado no modo em blocos, onde os parciais são somados."""
+    return np.bincount(canal.ravel(), minlength=256)
+
+def media_histograma(counts):
+    total = counts.sum()
+    return float(np.dot(NIVEIS, counts) / total) if total else 0.0
 
 # ==========================================
 # 1. ANALISADOR DE INTENSIDADE (CINZA)
@@ -29,19 +40,44 @@ class AnalisadorHistogramaGray(AnalisadorBase):
     def ordem(self) -> int:
         return 60
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: return AnalysisResult(detalhe="Erro imagem", metrics={})
-        
-        # Converte BGR para Cinza (Fórmula correta de luminosidade: 0.299R + 0.587G + 0.114B)
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    @property
+    def tags(self) -> tuple:
+        return ("histograma", "rapido")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 8
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
+        # Decodificação direta em cinza (luminosidade: 0.299R + 0.587G + 0.114B) feita pelo codec
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: return AnalysisResult(detalhe="Erro imagem", metrics={})
         
-        hist = cv2.calcHist([img_gray], [0], None, [256], [0, 256])
-        counts = [int(x) for x in hist.flatten()] # Converte para Inteiros
+        # Com máscara (análise por região), só os pixels marcados entram na contagem
+        hist = cv2.calcHist([img_gray], [0], mascara, [256], [0, 256])
+        counts = hist.ravel().astype(np.int64) # Inteiros; a conversão para JSON fica para a serialização
 
         return AnalysisResult(
             detalhe="Intensidade (Claridade) calculada.",
-            metrics={"bins": list(range(256)), "counts": counts}
+            metrics={"bins": NIVEIS, "counts": counts}
+        )
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    def processar_bloco(self, bloco, nucleo):
+        return {"counts": contar_niveis(core_view(bloco, nucleo))}
+
+    def finalizar_blocos(self, acumulado, forma):
+        return AnalysisResult(
+            detalhe="Intensidade (Claridade) calculada.",
+            metrics={"bins": NIVEIS, "counts": acumulado["counts"]}
         )
 
 # ==========================================
@@ -56,25 +92,51 @@ class AnalisadorHistogramaRed(AnalisadorBase):
     def ordem(self) -> int:
         return 61
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
+    @property
+    def tags(self) -> tuple:
+        return ("histograma", "cor", "rapido")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_COLOR
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 8
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
+        img = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo)
         if img is None: return AnalysisResult(detalhe="Erro imagem", metrics={})
 
         # Separa os canais explicitamente para não haver erro de índice
         # OpenCV carrega como BGR (Blue, Green, Red)
         b, g, r = cv2.split(img)
         
-        # DEBUG: Calcula média para conferência no terminal
-        media_r = np.mean(r)
-        print(f"[DEBUG VERMELHO] Média de cor R: {media_r:.2f} (0=Sem vermelho, 255=Muito vermelho)")
-
         # Calcula histograma SOMENTE do canal R
-        hist = cv2.calcHist([r], [0], None, [256], [0, 256])
-        counts = [int(x) for x in hist.flatten()]
+        hist = cv2.calcHist([r], [0], mascara, [256], [0, 256])
+        counts = hist.ravel().astype(np.int64)
+        media_r = media_histograma(counts)  # média só dos pixels contados (respeita a máscara)
+        logger.debug("Média de cor R: %.2f (0=Sem vermelho, 255=Muito vermelho)", media_r)
 
         return AnalysisResult(
             detalhe=f"Nível médio de Vermelho: {int(media_r)}/255",
-            metrics={"bins": list(range(256)), "counts": counts}
+            metrics={"bins": NIVEIS, "counts": counts}
+        )
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    def processar_bloco(self, bloco, nucleo):
+        return {"counts": contar_niveis(core_view(bloco, nucleo)[:, :, 2])}
+
+    def finalizar_blocos(self, acumulado, forma):
+        counts = acumulado["counts"]
+        media_r = media_histograma(counts)
+        return AnalysisResult(
+            detalhe=f"Nível médio de Vermelho: {int(media_r)}/255",
+            metrics={"bins": NIVEIS, "counts": counts}
         )
 
 # ==========================================
@@ -89,21 +151,48 @@ class AnalisadorHistogramaGreen(AnalisadorBase):
     def ordem(self) -> int:
         return 62
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
+    @property
+    def tags(self) -> tuple:
+        return ("histograma", "cor", "rapido")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_COLOR
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 8
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
+        img = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo)
         if img is None: return AnalysisResult(detalhe="Erro imagem", metrics={})
 
         b, g, r = cv2.split(img)
         
-        media_g = np.mean(g)
-        print(f"[DEBUG VERDE] Média de cor G: {media_g:.2f}")
+        hist = cv2.calcHist([g], [0], mascara, [256], [0, 256])
+        counts = hist.ravel().astype(np.int64)
+        media_g = media_histograma(counts)  # média só dos pixels contados (respeita a máscara)
+        logger.debug("Média de cor G: %.2f", media_g)
+
+        return AnalysisResult(
+            detalhe=f"Nível médio de Verde: {int(media_g)}/255",
+            metrics={"bins": NIVEIS, "counts": counts}
+        )
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
 
-        hist = cv2.calcHist([g], [0], None, [256], [0, 256])
-        counts = [int(x) for x in hist.flatten()]
+    def processar_bloco(self, bloco, nucleo):
+        return {"counts": contar_niveis(core_view(bloco, nucleo)[:, :, 1])}
 
+    def finalizar_blocos(self, acumulado, forma):
+        counts = acumulado["counts"]
+        media_g = media_histograma(counts)
         return AnalysisResult(
             detalhe=f"Nível médio de Verde: {int(media_g)}/255",
-            metrics={"bins": list(range(256)), "counts": counts}
+            metrics={"bins": NIVEIS, "counts": counts}
         )
 
 # ==========================================
@@ -118,19 +207,46 @@ class AnalisadorHistogramaBlue(AnalisadorBase):
     def ordem(self) -> int:
         return 63
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
+    @property
+    def tags(self) -> tuple:
+        return ("histograma", "cor", "rapido")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_COLOR
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 8
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  mascara: np.ndarray = None) -> AnalysisResult:
+        img = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo)
         if img is None: return AnalysisResult(detalhe="Erro imagem", metrics={})
 
         b, g, r = cv2.split(img)
         
-        media_b = np.mean(b)
-        print(f"[DEBUG AZUL] Média de cor B: {media_b:.2f}")
+        hist = cv2.calcHist([b], [0], mascara, [256], [0, 256])
+        counts = hist.ravel().astype(np.int64)
+        media_b = media_histograma(counts)  # média só dos pixels contados (respeita a máscara)
+        logger.debug("Média de cor B: %.2f", media_b)
 
-        hist = cv2.calcHist([b], [0], None, [256], [0, 256])
-        counts = [int(x) for x in hist.flatten()]
+        return AnalysisResult(
+            detalhe=f"Nível médio de Azul: {int(media_b)}/255",
+            metrics={"bins": NIVEIS, "counts": counts}
+        )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    def processar_bloco(self, bloco, nucleo):
+        return {"counts": contar_niveis(core_view(bloco, nucleo)[:, :, 0])}
+
+    def finalizar_blocos(self, acumulado, forma):
+        counts = acumulado["counts"]
+        media_b = media_histograma(counts)
         return AnalysisResult(
             detalhe=f"Nível médio de Azul: {int(media_b)}/255",
-            metrics={"bins": list(range(256)), "counts": counts}
-        )
\ No newline at end of file
+            metrics={"bins": NIVEIS, "counts": counts}
+        )
@@ -1,22 +1,52 @@
+import logging
 import cv2
 import numpy as np
 import base64
 from gerenciador import AnalisadorBase
 from models.analysis import AnalysisResult
+from services.decoding import decode_image, MODE_COLOR, MODE_GRAY
+from services.tiling import core_view
+from services.intermediates import compute
 
-def carregar_imagem_segura(caminho, conteudo):
+logger = logging.getLogger(__name__)
+
+def carregar_imagem_segura(caminho, conteudo, modo=MODE_COLOR):
+    """
+    Carrega a imagem em BGR (Padrão OpenCV) ou direto em tons de cinza (modo="gray").
+    Usado quando o motor não entrega a imagem já decodificada.
     """
-    Carrega a imagem garantindo formato BGR (Padrão OpenCV).
+    # Lê direto da memória quando há bytes (mais rápido para uploads), senão do disco
+    return decode_image(caminho, conteudo, modo)
+
+def limiar_otsu_histograma(hist):
     """
-    img = None
-    if conteudo:
-        # Lê direto da memória (mais rápido para uploads)
-        nparr = np.frombuffer(conteudo, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    else:
-        # Lê do disco
-        img = cv2.imread(caminho, cv2.IMREAD_COLOR)
-    return img
+    Limiar de Otsu calculado a partir de um histograma de 256 níveis.
+    Reproduz o critério do cv2.THRESH_OTSU (máxima variância entre classes) e
+    permite obter o limiar global no modo em blocos, somando os histogramas parciais.
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 0
+    p = hist / total
+    niveis = np.arange(hist.size, dtype=np.float64)
+    mu = np.dot(niveis, p)
+    q1 = np.cumsum(p)
+    m1 = np.cumsum(niveis * p)
+    q2 = 1.0 - q1
+    eps = np.finfo(np.float32).eps
+    validos = (np.minimum(q1, q2) >= eps) & (np.maximum(q1, q2) <= 1.0 - eps)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mu1 = m1 / q1
+        mu2 = (mu - m1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) ** 2
+    sigma = np.where(validos, sigma, 0.0)
+    return int(np.argmax(sigma)) if sigma.max() > 0 else 0
+
+def contar_brancos_nucleo(binaria, nucleo):
+    """Conta pixels brancos apenas no núcleo do bloco (parcial aditivo do modo em blocos)."""
+    regiao = core_view(binaria, nucleo)
+    return {"pixels_brancos": int(np.count_nonzero(regiao)), "total_pixels": int(regiao.size)}
 
 def img_para_base64(imagem):
     """Converte imagem numpy para string base64."""
@@ -36,23 +66,38 @@ class AnalisadorLimiarizacaoSimples(AnalisadorBase):
     def ordem(self) -> int:
         return 10
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("limiarizacao", "rapido")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 8
+
+    @property
+    def insumos(self) -> tuple:
+        return ("binary@127",)
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None,
+                  insumos: dict = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        # Converte para escala de cinza
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Aplica limiarização simples com threshold 127
-        _, img_binaria = cv2.threshold(img_gray, 127, 255, cv2.THRESH_BINARY)
+        # Limiarização simples com threshold 127 (compartilhada pelo motor com outros analisadores)
+        img_binaria = (insumos or compute(self.insumos, img_gray))["binary@127"]
         
         # Calcula métricas
         pixels_brancos = np.sum(img_binaria == 255)
         pixels_pretos = np.sum(img_binaria == 0)
         percentual_brancos = (pixels_brancos / img_binaria.size) * 100
         
-        print(f"[Limiarização Simples] {percentual_brancos:.1f}% pixels brancos")
+        logger.debug("[Limiarização Simples] %.1f%% pixels brancos", percentual_brancos)
         
         # Gera imagens em base64
         imagens = {
@@ -66,6 +111,22 @@ class AnalisadorLimiarizacaoSimples(AnalisadorBase):
             extra={"imagens_processadas": imagens}
         )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    def processar_bloco(self, bloco, nucleo):
+        regiao = core_view(bloco, nucleo)
+        return {"pixels_brancos": int(np.count_nonzero(regiao > 127)), "total_pixels": int(regiao.size)}
+
+    def finalizar_blocos(self, acumulado, forma):
+        pixels_brancos = acumulado["pixels_brancos"]
+        percentual_brancos = (pixels_brancos / acumulado["total_pixels"]) * 100
+        return AnalysisResult(
+            detalhe=f"Limiar fixo em 127. Pixels brancos: {percentual_brancos:.1f}%",
+            metrics={"limiar": 127, "pixels_brancos": int(pixels_brancos), "percentual": round(percentual_brancos, 2)}
+        )
+
 # ==========================================
 # 2. MÉTODO DE OTSU (AUTOMÁTICO)
 # ==========================================
@@ -78,20 +139,31 @@ class AnalisadorLimiarizacaoOtsu(AnalisadorBase):
     def ordem(self) -> int:
         return 11
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("limiarizacao", "rapido")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 8
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
         # Otsu calcula o melhor limiar automaticamente
         limiar_otsu, img_binaria = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         
         pixels_brancos = np.sum(img_binaria == 255)
         percentual_brancos = (pixels_brancos / img_binaria.size) * 100
         
-        print(f"[Otsu] Limiar calculado: {limiar_otsu:.0f}, {percentual_brancos:.1f}% pixels brancos")
+        logger.debug("[Otsu] Limiar calculado: %.0f, %.1f%% pixels brancos", limiar_otsu, percentual_brancos)
         
         # Gera imagens em base64
         imagens = {
@@ -105,6 +177,24 @@ class AnalisadorLimiarizacaoOtsu(AnalisadorBase):
             extra={"imagens_processadas": imagens}
         )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    def processar_bloco(self, bloco, nucleo):
+        # Otsu precisa do histograma global: os blocos só acumulam o histograma
+        return {"hist": np.bincount(core_view(bloco, nucleo).ravel(), minlength=256)}
+
+    def finalizar_blocos(self, acumulado, forma):
+        hist = acumulado["hist"]
+        limiar_otsu = limiar_otsu_histograma(hist)
+        pixels_brancos = int(hist[limiar_otsu + 1:].sum())
+        percentual_brancos = (pixels_brancos / hist.sum()) * 100
+        return AnalysisResult(
+            detalhe=f"Limiar calculado automaticamente: {int(limiar_otsu)}. Pixels brancos: {percentual_brancos:.1f}%",
+            metrics={"limiar": int(limiar_otsu), "pixels_brancos": pixels_brancos, "percentual": round(percentual_brancos, 2)}
+        )
+
 # ==========================================
 # 3. LIMIARIZAÇÃO ADAPTATIVA - MÉDIA
 # ==========================================
@@ -117,13 +207,24 @@ class AnalisadorLimiarizacaoAdaptativaMedia(AnalisadorBase):
     def ordem(self) -> int:
         return 12
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("limiarizacao", "adaptativa")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 2
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
         # Limiarização adaptativa usa média local de cada região
         img_binaria = cv2.adaptiveThreshold(
             img_gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, 
@@ -133,7 +234,7 @@ class AnalisadorLimiarizacaoAdaptativaMedia(AnalisadorBase):
         pixels_brancos = np.sum(img_binaria == 255)
         percentual_brancos = (pixels_brancos / img_binaria.size) * 100
         
-        print(f"[Adaptativa Média] {percentual_brancos:.1f}% pixels brancos")
+        logger.debug("[Adaptativa Média] %.1f%% pixels brancos", percentual_brancos)
         
         # Gera imagens em base64
         imagens = {
@@ -147,6 +248,27 @@ class AnalisadorLimiarizacaoAdaptativaMedia(AnalisadorBase):
             extra={"imagens_processadas": imagens}
         )
 
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        # Janela 11x11: 5 pixels de vizinhança tornam o resultado por bloco idêntico ao global
+        return 5
+
+    def processar_bloco(self, bloco, nucleo):
+        binaria = cv2.adaptiveThreshold(bloco, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2)
+        return contar_brancos_nucleo(binaria, nucleo)
+
+    def finalizar_blocos(self, acumulado, forma):
+        pixels_brancos = acumulado["pixels_brancos"]
+        percentual_brancos = (pixels_brancos / acumulado["total_pixels"]) * 100
+        return AnalysisResult(
+            detalhe=f"Limiar adaptativo por média local. Pixels brancos: {percentual_brancos:.1f}%",
+            metrics={"tamanho_bloco": 11, "pixels_brancos": int(pixels_brancos), "percentual": round(percentual_brancos, 2)}
+        )
+
 # ==========================================
 # 4. LIMIARIZAÇÃO ADAPTATIVA - GAUSSIANA
 # ==========================================
@@ -159,13 +281,24 @@ class AnalisadorLimiarizacaoAdaptativaGaussiana(AnalisadorBase):
     def ordem(self) -> int:
         return 13
 
-    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
-        img = carregar_imagem_segura(caminho_imagem, conteudo)
-        if img is None: 
+    @property
+    def tags(self) -> tuple:
+        return ("limiarizacao", "adaptativa")
+
+    @property
+    def modo_leitura(self) -> str:
+        return MODE_GRAY
+
+    @property
+    def reducao_maxima(self) -> int:
+        return 2
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
+        # O motor entrega a imagem já decodificada em tons de cinza; sem ela, decodifica direto em cinza
+        img_gray = imagem if imagem is not None else carregar_imagem_segura(caminho_imagem, conteudo, MODE_GRAY)
+        if img_gray is None: 
             return AnalysisResult(detalhe="Erro ao carregar imagem", metrics={})
         
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
         # Limiarização adaptativa usa média gaussiana ponderada
         img_binaria = cv2.adaptiveThreshold(
             img_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
@@ -175,7 +308,7 @@ class AnalisadorLimiarizacaoAdaptativaGaussiana(AnalisadorBase):
         pixels_brancos = np.sum(img_binaria == 255)
         percentual_brancos = (pixels_brancos / img_binaria.size) * 100
         
-        print(f"[Adaptativa Gaussiana] {percentual_brancos:.1f}% pixels brancos")
+        logger.debug("[Adaptativa Gaussiana] %.1f%% pixels brancos", percentual_brancos)
         
         # Gera imagens em base64
         imagens = {
@@ -187,4 +320,25 @@ class AnalisadorLimiarizacaoAdaptativaGaussiana(AnalisadorBase):
             detalhe=f"Limiar adaptativo gaussiano. Pixels brancos: {percentual_brancos:.1f}%",
             metrics={"tamanho_bloco": 11, "pixels_brancos": int(pixels_brancos), "percentual": round(percentual_brancos, 2)},
             extra={"imagens_processadas": imagens}
-        )
\ No newline at end of file
+        )
+
+    @property
+    def suporta_blocos(self) -> bool:
+        return True
+
+    @property
+    def halo(self) -> int:
+        # Janela 11x11: 5 pixels de vizinhança tornam o resultado por bloco idêntico ao global
+        return 5
+
+    def processar_bloco(self, bloco, nucleo):
+        binaria = cv2.adaptiveThreshold(bloco, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        return contar_brancos_nucleo(binaria, nucleo)
+
+    def finalizar_blocos(self, acumulado, forma):
+        pixels_brancos = acumulado["pixels_brancos"]
+        percentual_brancos = (pixels_brancos / acumulado["total_pixels"]) * 100
+        return AnalysisResult(
+            detalhe=f"Limiar adaptativo gaussiano. Pixels brancos: {percentual_brancos:.1f}%",
+            metrics={"tamanho_bloco": 11, "pixels_brancos": int(pixels_brancos), "percentual": round(percentual_brancos, 2)}
+        )
@@ -1,11 +1,42 @@
 import os
-import time
-import inspect
+import contextvars
+import mmap
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
 
 from models.report import ResultItem, ConsolidatedReport
 from models.analysis import AnalysisResult
+from models.encoding import ARRAYS_LIST, ARRAYS_RAW, check_mode, encode
+from services.decoding import ImageSource, MODE_COLOR, quality_factor, effective_factor
+from services.tiling import iter_tiles, shrink_halo, merge_partials
+from services.frames import iter_frames
+from services.aggregates import ReportAggregator
+from services.metrics import (REGISTRY, now, ANALYZER_CALLS, ANALYZER_ERRORS, ANALYZER_INPUT_BYTES,
+                              ANALYZER_LATENCY, ANALYZER_QUEUE_WAIT, PIPELINE_INPUT_BYTES, PIPELINE_LATENCY,
+                              PIPELINE_RUNS, VIDEO_FRAMES, DUPLICATE_LOOKUPS)
+from services.tracing import span
+from services.profiling import AnalyzerProfiler, active_options, profiling
+from services.isolation import (STATUS_CANCELLED, STATUS_TIMEOUT, AnalyzerTimeout, RunLimits, process_pool,
+                                run_isolated)
+from services.intermediates import IntermediateGraph, canonical
+from services.registry import AnalyzerDescriptor, AnalyzerRegistry
+from services.costs import COSTS, makespan
+from services.resources import RESOURCES, Lease
+from services.shm import SharedArrays, attached
+from services.phash import DuplicateIndex
+from services.region import Region, region_source
+from services.video import (DEFAULT_DIFF_THRESHOLD, DEFAULT_VIDEO_TILE_SIZE, FrameChangeDetector,
+                            IncrementalTiles, iter_video_frames)
+
+logger = logging.getLogger(__name__)
+
+# Data de modificação de cada módulo de analisadores/ na última carga (ver `_descobrir_analisadores`)
+_VERSOES_MODULOS = {}
 
 
 class AnalisadorBase(ABC):
@@ -14,19 +45,158 @@ class AnalisadorBase(ABC):
     def nome_modulo(self) -> str:
         pass
 
+    @property
+    def versao(self) -> str:
+        """Versão do analisador (registrada no descritor; mude quando os resultados mudarem). Padrão: "1"."""
+        return "1"
+
     @property
     def ordem(self) -> int:
         """Ordem de execução dos analisadores (menor = executado primeiro). Padrão: 999."""
         return 999
 
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        """Etiquetas usadas para selecionar o analisador por grupo (ver PERFIS). Padrão: nenhuma."""
+        return ()
+
+    @property
+    def modo_leitura(self) -> str:
+        """Representação que o analisador espera receber em `imagem`: "color" (BGR) ou "gray". Padrão: "color"."""
+        return MODE_COLOR
+
+    @property
+    def reducao_maxima(self) -> int:
+        """Maior fator de redução (1, 2, 4 ou 8) aceito em modo de pré-visualização. Padrão: 1 (resolução total)."""
+        return 1
+
+    @property
+    def tempo_limite(self) -> Optional[float]:
+        """Orçamento de tempo (segundos) deste analisador; None usa o `tempo_limite` da execução."""
+        return None
+
+    @property
+    def insumos(self) -> Tuple[str, ...]:
+        """Produtos intermediários nomeados que o analisador consome (ex.: "binary@127", "canny@50,150").
+
+        O motor calcula cada produto uma vez por execução, compartilha entre os analisadores
+        que o declaram e o entrega em `processar(..., insumos={nome: array})`. Padrão: nenhum.
+        """
+        return ()
+
     @abstractmethod
     def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
         pass
 
+    # --- Modo em blocos (opcional) -------------------------------------------------
+    # Analisadores com resultado aditivo podem processar a imagem em blocos: o motor
+    # chama `processar_bloco` para cada bloco (com `halo` pixels de vizinhança em volta
+    # do núcleo), soma os parciais com `combinar_blocos` e gera o resultado final com
+    # `finalizar_blocos`. Só pixels do núcleo devem ser contados.
+
+    @property
+    def suporta_blocos(self) -> bool:
+        """Indica se o analisador implementa o modo em blocos. Padrão: False."""
+        return False
+
+    @property
+    def halo(self) -> int:
+        """Pixels de vizinhança necessários em volta de cada bloco. Padrão: 0."""
+        return 0
+
+    @property
+    def blocos_exatos(self) -> bool:
+        """Se o resultado em blocos é idêntico ao da imagem inteira (permite atualização incremental). Padrão: True."""
+        return True
+
+    def processar_bloco(self, bloco, nucleo: Tuple[int, int, int, int]) -> dict:
+        """Processa um bloco; `nucleo` = (y0, y1, x0, x1) da região própria do bloco em `bloco`."""
+        raise NotImplementedError
+
+    def combinar_blocos(self, acumulado: Optional[dict], parcial: dict) -> dict:
+        return merge_partials(acumulado, parcial)
+
+    def finalizar_blocos(self, acumulado: dict, forma: Tuple[int, int]) -> AnalysisResult:
+        raise NotImplementedError
+
+
+# Perfis nomeados: cada perfil expande para um conjunto de tags/nomes de analisadores.
+# `None` significa "todos os analisadores descobertos".
+PERFIS = {
+    "full": None,
+    "fast": ("rapido",),
+    "histograms": ("histograma",),
+    "threshold": ("limiarizacao",),
+    "edges": ("bordas",),
+    "texture": ("textura",),
+}
+
+# Como `trabalhadores` > 1 executa os analisadores: threads (padrão) ou processos com memória compartilhada
+MODO_THREADS = "threads"
+MODO_PROCESSOS = "processos"
+MODOS_PARALELOS = (MODO_THREADS, MODO_PROCESSOS)
+
+
+def _validar_modo_paralelo(modo: str) -> None:
+    if modo not in MODOS_PARALELOS:
+        raise ValueError(f"Modo paralelo desconhecido: {modo!r} (use {', '.join(MODOS_PARALELOS)}).")
+
+
+def _sem_mapas(argumentos: tuple) -> tuple:
+    """Argumentos serializáveis para outro processo: o arquivo mapeado (mmap) vira bytes."""
+    return tuple(bytes(a) if isinstance(a, mmap.mmap) else a for a in argumentos)
+
+
+def _referencia(analisador: AnalisadorBase) -> tuple:
+    """Referência serializável do analisador: (módulo, nome qualificado da classe, atributos da instância).
+
+    O processo filho recria a instância a partir dela (`_instanciar`), sem depender de a classe
+    no processo principal ser o mesmo objeto que o pickle encontraria pelo nome.
+    """
+    cls = type(analisador)
+    return cls.__module__, cls.__qualname__, dict(getattr(analisador, "__dict__", {}))
+
+
+def _instanciar(referencia: tuple) -> AnalisadorBase:
+    """Instância do analisador descrito por `_referencia`, com os mesmos atributos."""
+    import importlib
+    modulo, nome, atributos = referencia
+    cls = importlib.import_module(modulo)
+    for parte in nome.split("."):
+        cls = getattr(cls, parte)
+    analisador = cls.__new__(cls)
+    analisador.__dict__.update(atributos)
+    return analisador
+
+
+def _processar_isolado(referencia: tuple, argumentos: tuple, kwargs: dict, opcoes_perfil) -> tuple:
+    """Alvo do processo filho: chama `processar` (perfilando se pedido) e devolve (resultado, resumo do perfil)."""
+    # Processo filho: pools de threads do OpenCV/BLAS com a fatia de núcleos de um trabalhador
+    RESOURCES.apply_child()
+    analisador = _instanciar(referencia)
+    if opcoes_perfil is None:
+        return analisador.processar(*argumentos, **kwargs), None
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    perfilador = AnalyzerProfiler(analisador.nome_modulo, opcoes_perfil)
+    resultado = perfilador.run(analisador.processar, *argumentos, **kwargs)
+    return resultado, perfilador.summary()
+
+
+def _processar_compartilhado(referencia: tuple, argumentos: tuple, handles: dict, opcoes_perfil) -> tuple:
+    """Alvo do pool de processos: mapeia imagem/insumos da memória compartilhada (sem cópia) e processa."""
+    with attached(handles) as kwargs:
+        return _processar_isolado(referencia, argumentos, kwargs, opcoes_perfil)
+
 
 class MotorDeAnalise:
     def __init__(self):
         self.analisadores = []
+        # Convenção de chamada, insumos, versão e capacidades de cada analisador, resolvidos uma vez
+        self.registro = AnalyzerRegistry(AnalisadorBase)
+        # Custo observado de cada analisador (s/megapixel), usado para escalonar e prever a duração
+        self.custos = COSTS
         self._descobrir_analisadores()
 
     def _descobrir_analisadores(self):
@@ -45,99 +215,744 @@ class MotorDeAnalise:
                         mod_name = p.stem
                         full_mod = f"analisadores.{mod_name}"
                         try:
-                            if full_mod in sys.modules:
-                                importlib.reload(sys.modules[full_mod])
-                            else:
+                            versao = p.stat().st_mtime
+                            if full_mod not in sys.modules:
                                 importlib.import_module(full_mod)
-                            print(f"    [import] {full_mod}")
+                            elif _VERSOES_MODULOS.get(full_mod, versao) != versao:
+                                # Só recarrega arquivo editado: recarregar troca a identidade das classes
+                                # e as instâncias dos motores já criados deixariam de ser serializáveis
+                                importlib.reload(sys.modules[full_mod])
+                            _VERSOES_MODULOS[full_mod] = versao
+                            logger.debug("Importado %s", full_mod)
                         except Exception as ie:
-                            print(f"    [!] Falha ao importar {full_mod}: {ie}")
+                            logger.warning("Falha ao importar %s: %s", full_mod, ie)
         except Exception:
             # Não crítico: prosseguimos mesmo se a importação falhar
             pass
 
-        subclasses = AnalisadorBase.__subclasses__()
-        print(f"[*] Sistema inicializado. {len(subclasses)} módulos de análise encontrados.")
+        # Sem as classes obsoletas que o importlib.reload deixa em __subclasses__()
+        subclasses = self.registro.discover_classes()
+        logger.info("Sistema inicializado. %d módulos de análise encontrados.", len(subclasses))
 
+        nomes = {}
         for cls in subclasses:
             try:
                 instancia = cls()
-                self.analisadores.append(instancia)
-                print(f"    -> Módulo carregado: {instancia.nome_modulo} (ordem: {instancia.ordem})")
+                descritor = self.registro.describe(instancia)
             except Exception as e:
-                print(f"    [!] Erro ao instanciar o módulo {cls.__name__}: {e}")
+                logger.warning("Erro ao instanciar o módulo %s: %s", cls.__name__, e)
+                continue
+            if descritor.name in nomes:
+                logger.warning("Módulo %s ignorado: nome '%s' já registrado por %s",
+                               descritor.qualname, descritor.name, nomes[descritor.name])
+                continue
+            nomes[descritor.name] = descritor.qualname
+            self.analisadores.append(instancia)
+            logger.debug("Módulo carregado: %s v%s (ordem: %s, capacidades: %s)", descritor.name, descritor.version,
+                         descritor.order, ", ".join(descritor.capabilities) or "-")
 
         # Ordenar analisadores pela propriedade 'ordem'
-        self.analisadores.sort(key=lambda a: a.ordem)
+        self.analisadores.sort(key=lambda a: self.registro.describe(a).order)
+
+    def descritores(self) -> List[AnalyzerDescriptor]:
+        """Descritores dos analisadores carregados, na ordem de execução."""
+        return [self.registro.describe(a) for a in self.analisadores]
+
+    def selecionar_analisadores(self, modulos: Optional[Union[str, Iterable[str]]] = None) -> List[AnalisadorBase]:
+        """Resolve um subconjunto de analisadores a partir de nomes, tags ou perfis.
+
+        `modulos` pode ser uma string separada por vírgulas ou uma lista. Cada seletor
+        é comparado (sem diferenciar maiúsculas) com o nome de um perfil em PERFIS,
+        com `nome_modulo`, com o nome da classe ou com uma das `tags`.
+        Sem seletores, todos os analisadores são retornados.
+        """
+        if modulos is None:
+            return list(self.analisadores)
+        if isinstance(modulos, str):
+            modulos = modulos.split(",")
+        seletores = [m.strip().casefold() for m in modulos if m and m.strip()]
+        if not seletores:
+            return list(self.analisadores)
+
+        alvos = set()
+        explicitos = set()
+        todos = False
+        for seletor in seletores:
+            if seletor in PERFIS:
+                perfil = PERFIS[seletor]
+                if perfil is None:
+                    todos = True
+                else:
+                    alvos.update(t.casefold() for t in perfil)
+            else:
+                alvos.add(seletor)
+                explicitos.add(seletor)
+
+        selecionados = []
+        encontrados = set()
+        for analisador in self.analisadores:
+            descritor = self.registro.describe(analisador)
+            chaves = {descritor.name.casefold(), type(analisador).__name__.casefold()}
+            chaves.update(t.casefold() for t in descritor.tags)
+            casados = chaves & alvos
+            if casados or todos:
+                selecionados.append(analisador)
+                encontrados.update(casados)
+
+        # Perfis podem referir tags sem módulo carregado; nomes explícitos precisam existir,
+        # mesmo junto de um perfil que já seleciona todos
+        desconhecidos = explicitos - encontrados
+        if desconhecidos:
+            raise ValueError(f"Seletor(es) de analisador desconhecido(s): {', '.join(sorted(desconhecidos))}")
+        return selecionados
 
-    def executar_pipeline(self, caminho_imagem: str) -> dict:
-        print(f"\n{'='*60}")
-        print(f"INICIANDO ANÁLISE DO ARQUIVO: {caminho_imagem}")
-        print(f"{'='*60}")
+    def executar_pipeline(self, caminho_imagem: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+                          qualidade: Optional[str] = None, tamanho_bloco: Optional[int] = None,
+                          tempo_limite: Optional[float] = None, prazo: Optional[float] = None,
+                          cancelar: Optional[threading.Event] = None, trabalhadores: Optional[int] = None,
+                          modo_paralelo: str = MODO_THREADS, mapear_arquivo: bool = True,
+                          formato_arrays: str = ARRAYS_LIST, roi: Optional[Region] = None,
+                          mascara: Optional[Union[str, bytes, np.ndarray]] = None) -> dict:
+        """Executa os analisadores selecionados sobre a imagem.
+
+        `qualidade` ("full", "half", "preview", "thumbnail") permite decodificar em
+        resolução reduzida para os analisadores que declaram aceitar (`reducao_maxima`).
+        `tamanho_bloco` ativa o modo em blocos (imagens muito grandes): cada analisador
+        que `suporta_blocos` processa blocos com halo e os parciais são combinados.
+        `tempo_limite` (segundos por analisador), `prazo` (segundos para a execução inteira)
+        e `cancelar` (Event) limitam a execução: analisadores com orçamento (próprio ou
+        `tempo_limite`) ou com `cancelar` rodam em um processo filho que é encerrado ao estourar,
+        e aparecem como "TIMEOUT"/"CANCELADO" no relatório. Só com `prazo`, os analisadores rodam
+        no próprio processo e os que ainda não começaram quando ele vence ficam como "TIMEOUT".
+        `trabalhadores` > 1 executa os analisadores em paralelo, o de maior custo previsto primeiro
+        (ver `prever`); o relatório mantém a ordem de `ordem`. Com `modo_paralelo="processos"`
+        eles rodam em um pool de processos, recebendo imagem e insumos por memória compartilhada.
+        `mapear_arquivo` (padrão) mapeia o arquivo em memória uma única vez: o decodificador lê
+        o mapa sem cópia e os analisadores que recebem `conteudo` compartilham o mesmo mapa
+        somente leitura, em vez de um `read()` por analisador.
+        Arrays NumPy deixados nas métricas só são convertidos aqui, na serialização:
+        `formato_arrays` "list" (padrão), "binary" (base64 compacto, ver `models.encoding`) ou "raw".
+        `roi` (x, y, largura, altura) e/ou `mascara` (array, caminho ou bytes de uma imagem binária do
+        tamanho da original) restringem a análise à região (ver `services.region`): os analisadores
+        recebem só o recorte, os que aceitam `mascara` recebem também a máscara recortada, e os que
+        só leem o arquivo pelo caminho aparecem como IGNORADO. Cada resultado ganha `extra.regiao`.
+        """
+        logger.info("Iniciando análise do arquivo: %s", caminho_imagem)
 
         if not caminho_imagem or not isinstance(caminho_imagem, str):
-            print("[ERRO FATAL] Caminho de arquivo inválido.")
+            logger.error("Caminho de arquivo inválido: %r", caminho_imagem)
             return {}
 
         if not os.path.exists(caminho_imagem):
-            print(f"[AVISO] O arquivo '{caminho_imagem}' não foi encontrado no disco.")
-            print("        (Prosseguindo com simulação para fins de teste...)")
+            logger.warning("O arquivo '%s' não foi encontrado no disco; prosseguindo com simulação.", caminho_imagem)
 
-        relatorio_final = ConsolidatedReport()
+        # Seleciona antes de qualquer leitura: módulos fora da seleção não leem nem decodificam nada
+        analisadores = self.selecionar_analisadores(modulos)
+        fator_pedido = quality_factor(qualidade)
+        _validar_modo_paralelo(modo_paralelo)
+        check_mode(formato_arrays)
+        if mascara is not None and tamanho_bloco:
+            raise ValueError("Máscara não é suportada no modo em blocos; use só a ROI.")
 
-        for analisador in self.analisadores:
-            print(f"\n>>> Executando: {analisador.nome_modulo}...")
-            start_time = time.time()
+        limites = RunLimits(tempo_limite, prazo, cancelar).start()
+
+        # Decodificação centralizada: cada (modo, fator) é decodificado no máximo uma vez por execução
+        inicio = now()
+        existe = os.path.exists(caminho_imagem)
+        with span("pipeline", arquivo=os.path.basename(caminho_imagem), analisadores=len(analisadores)):
+            fonte = ImageSource(caminho_imagem if existe else None, mapped=mapear_arquivo)
+            if roi is not None or mascara is not None:
+                fonte = region_source(fonte, roi, mascara)
+            regiao = fonte.region
+            relatorio_final = self._executar_fonte(analisadores, caminho_imagem, fonte, fator_pedido, tamanho_bloco,
+                                                   limites, trabalhadores, modo_paralelo)
+            if regiao is not None:
+                self._anotar_regiao(relatorio_final, analisadores, regiao, mascara is not None)
+            REGISTRY.inc(PIPELINE_RUNS, kind="imagem")
+            REGISTRY.observe(PIPELINE_LATENCY, now() - inicio, kind="imagem")
+            if existe:
+                REGISTRY.inc(PIPELINE_INPUT_BYTES, os.path.getsize(caminho_imagem), kind="imagem")
+            self._gerar_relatorio_consolidado(relatorio_final)
+
+            with span("serializacao"):
+                return relatorio_final.to_dict(formato_arrays) # Precisa fazer assim pra UI entender
+
+    def executar_com_duplicatas(self, caminho_imagem: str, duplicatas: DuplicateIndex,
+                                modulos: Optional[Union[str, Iterable[str]]] = None, qualidade: Optional[str] = None,
+                                tamanho_bloco: Optional[int] = None, formato_arrays: str = ARRAYS_LIST,
+                                chave: Optional[str] = None, **opcoes) -> Tuple[dict, Optional[dict]]:
+        """`executar_pipeline` precedido de um filtro de quase-duplicatas.
+
+        Calcula o hash perceptual da imagem (decodificação em cinza a 1/8, ver `services.phash`)
+        e procura em `duplicatas` um relatório anterior com a mesma seleção de analisadores
+        (nome e versão), qualidade e blocos a no máximo `duplicatas.max_distance` bits: se
+        existir, ele é devolvido sem rodar nenhum analisador. Caso contrário o pipeline roda
+        e o relatório é guardado sob `chave` (padrão: o caminho). Relatórios com TIMEOUT ou
+        CANCELADO não são guardados. `opcoes` são repassadas a `executar_pipeline`; a `roi` faz
+        parte da comparação, e com `mascara` o filtro não se aplica (o pipeline sempre roda).
+
+        Retorna (relatório, duplicata), onde duplicata é {"chave", "distancia"} ou None.
+        """
+        check_mode(formato_arrays)
+        if opcoes.get("mascara") is not None:
+            return self.executar_pipeline(caminho_imagem, modulos, qualidade, tamanho_bloco,
+                                          formato_arrays=formato_arrays, **opcoes), None
+        contexto = (tuple((d.name, d.version) for d in map(self.registro.describe,
+                                                           self.selecionar_analisadores(modulos))),
+                    quality_factor(qualidade), tamanho_bloco, tuple(opcoes.get("roi") or ()))
+        with span("duplicatas", metodo=duplicatas.method) as trecho:
+            fonte = ImageSource(caminho_imagem if os.path.exists(caminho_imagem) else None)
+            try:
+                impressao = duplicatas.hash(fonte)
+            finally:
+                fonte.release()
+            achado = duplicatas.lookup(impressao, contexto) if impressao is not None else None
+            trecho.set(encontrada=achado is not None)
+        REGISTRY.inc(DUPLICATE_LOOKUPS, result="hit" if achado is not None else "miss")
+        if achado is not None:
+            logger.info("Quase-duplicata de %s (%d bits): relatório reaproveitado para %s",
+                        achado.key, achado.distance, caminho_imagem)
+            return encode(achado.report, formato_arrays), {"chave": achado.key, "distancia": achado.distance}
+
+        relatorio = self.executar_pipeline(caminho_imagem, modulos, qualidade, tamanho_bloco,
+                                           formato_arrays=ARRAYS_RAW, **opcoes)
+        if impressao is not None and not any(info.get("status") in (STATUS_TIMEOUT, STATUS_CANCELLED)
+                                             for info in relatorio.values()):
+            duplicatas.add(impressao, chave or caminho_imagem, relatorio, contexto)
+        return encode(relatorio, formato_arrays), None
+
+    def _anotar_regiao(self, relatorio: ConsolidatedReport, analisadores: List[AnalisadorBase], regiao: Region,
+                       com_mascara: bool) -> None:
+        """Registra em `extra.regiao` de cada resultado a região analisada e se a máscara foi aplicada."""
+        x, y, largura, altura = regiao
+        for analisador in analisadores:
+            item = relatorio.items.get(analisador.nome_modulo)
+            if item is None or item.dados is None:
+                continue
+            mascara = com_mascara and self.registro.describe(analisador).takes_mask
+            item.dados.extra = dict(item.dados.extra or {}, regiao={"x": x, "y": y, "largura": largura,
+                                                                    "altura": altura, "mascara": mascara})
+
+    def executar_pipeline_quadros(self, caminho_imagem: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+                                  qualidade: Optional[str] = None,
+                                  tamanho_bloco: Optional[int] = None,
+                                  limites: Optional[RunLimits] = None,
+                                  trabalhadores: Optional[int] = None,
+                                  modo_paralelo: str = MODO_THREADS,
+                                  formato_arrays: str = ARRAYS_LIST,
+                                  conteudo: Optional[bytes] = None) -> Iterator[Tuple[int, dict]]:
+        """Executa o pipeline quadro a quadro em GIFs animados / TIFFs multipágina.
+
+        Gerador: decodifica um quadro por vez e produz (índice, relatório do quadro);
+        só o quadro corrente fica em memória. `limites` vale para a pilha inteira.
+        Com `conteudo` (bytes do arquivo) os quadros vêm dele e `caminho_imagem` só identifica a entrada.
+        """
+        analisadores = self.selecionar_analisadores(modulos)
+        fator_pedido = quality_factor(qualidade)
+        _validar_modo_paralelo(modo_paralelo)
+        check_mode(formato_arrays)
+        limites = (limites or RunLimits()).start()
+        for indice, quadro in iter_frames(caminho_imagem, conteudo):
+            logger.info("Quadro %d de %s", indice, caminho_imagem)
+            with span("quadro", indice=indice):
+                fonte = ImageSource(None, image=quadro)
+                relatorio = self._executar_fonte(analisadores, caminho_imagem, fonte, fator_pedido, tamanho_bloco,
+                                                 limites, trabalhadores, modo_paralelo)
+                with span("serializacao"):
+                    dados = relatorio.to_dict(formato_arrays)
+            yield indice, dados
+
+    def executar_multiquadro(self, caminho_imagem: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+                             qualidade: Optional[str] = None, tamanho_bloco: Optional[int] = None,
+                             manter_imagens: bool = False, tempo_limite: Optional[float] = None,
+                             prazo: Optional[float] = None, cancelar: Optional[threading.Event] = None,
+                             trabalhadores: Optional[int] = None, modo_paralelo: str = MODO_THREADS,
+                             formato_arrays: str = ARRAYS_LIST, conteudo: Optional[bytes] = None) -> dict:
+        """Relatórios por quadro + agregado (histogramas somados, média/desvio das métricas escalares).
+
+        Para limitar memória em pilhas longas, as imagens base64 (`extra.imagens_processadas`)
+        só são mantidas no primeiro quadro, a menos que `manter_imagens=True`.
+        `tempo_limite`/`prazo`/`cancelar`/`trabalhadores`/`modo_paralelo`/`formato_arrays` como em
+        `executar_pipeline` (o prazo cobre todos os quadros); `conteudo` como em `executar_pipeline_quadros`.
+        Os quadros ficam com os arrays originais até o fim, para o agregador somar os histogramas
+        sem converter ida e volta.
+        """
+        agregador = ReportAggregator(label="quadro")
+        quadros = []
+        inicio = now()
+        limites = RunLimits(tempo_limite, prazo, cancelar)
+        check_mode(formato_arrays)
+        for indice, relatorio in self.executar_pipeline_quadros(caminho_imagem, modulos, qualidade, tamanho_bloco,
+                                                                limites, trabalhadores, modo_paralelo, ARRAYS_RAW,
+                                                                conteudo):
+            agregador.add(relatorio)
+            if indice > 0 and not manter_imagens:
+                for info in relatorio.values():
+                    dados = info.get("dados") or {}
+                    if dados.get("extra"):
+                        dados["extra"].pop("imagens_processadas", None)
+                        if not dados["extra"]:
+                            del dados["extra"]
+            quadros.append(relatorio)
+        REGISTRY.inc(PIPELINE_RUNS, kind="multiquadro")
+        REGISTRY.observe(PIPELINE_LATENCY, now() - inicio, kind="multiquadro")
+        if conteudo is not None:
+            REGISTRY.inc(PIPELINE_INPUT_BYTES, len(conteudo), kind="multiquadro")
+        elif os.path.exists(caminho_imagem):
+            REGISTRY.inc(PIPELINE_INPUT_BYTES, os.path.getsize(caminho_imagem), kind="multiquadro")
+        with span("serializacao"):
+            return {"num_quadros": len(quadros), "agregado": encode(agregador.to_report(), formato_arrays),
+                    "quadros": encode(quadros, formato_arrays)}
+
+    def executar_video(self, fonte_video: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+                       qualidade: Optional[str] = None, limiar_diferenca: float = DEFAULT_DIFF_THRESHOLD,
+                       tamanho_bloco: int = DEFAULT_VIDEO_TILE_SIZE, passo: int = 1,
+                       incluir_histogramas: bool = False) -> Iterator[dict]:
+        """Analisa um vídeo ou sequência numerada de imagens como série temporal.
+
+        Gerador: produz um registro por quadro ({"quadro", "tempo_s", "reutilizado", "motivo",
+        "blocos", "metricas", "erros"}). Quadros cujo digest é igual ao último quadro analisado,
+        ou cuja miniatura difere dele menos que `limiar_diferenca`, reaproveitam as métricas.
+        Analisadores com blocos exatos são atualizados incrementalmente (só os blocos alterados
+        são recalculados); os demais rodam sobre o quadro inteiro.
+        `incluir_histogramas` mantém `bins`/`counts` nas métricas (por padrão só escalares).
+        """
+        analisadores = self.selecionar_analisadores(modulos)
+        fator_pedido = quality_factor(qualidade)
+        detector = FrameChangeDetector(limiar_diferenca)
+
+        incrementais = {}
+        completos = []
+        for analisador in analisadores:
+            descritor = self.registro.describe(analisador)
+            if descritor.tiled and descritor.exact_tiles:
+                fator = effective_factor(fator_pedido, descritor.max_reduction)
+                incrementais.setdefault((descritor.read_mode, fator), []).append(analisador)
+            else:
+                completos.append(analisador)
+        caches = {
+            chave: IncrementalTiles(membros, tamanho_bloco,
+                                    [self.registro.describe(a).additive_tiles for a in membros])
+            for chave, membros in incrementais.items()
+        }
+
+        metricas, erros = {}, {}
+        for indice, tempo_s, quadro in iter_video_frames(fonte_video, passo):
+            motivo = detector.check(quadro)
+            registro = {"quadro": indice, "tempo_s": tempo_s, "reutilizado": motivo is not None, "motivo": motivo}
+            REGISTRY.inc(VIDEO_FRAMES, reused=motivo or "none")
+            if motivo is not None:
+                registro.update(blocos={"recalculados": 0, "total": 0}, metricas=metricas, erros=erros)
+                yield registro
+                continue
+
+            logger.info("Quadro %d de %s (tempo %s)", indice, fonte_video, tempo_s)
+            with span("quadro", indice=indice):
+                fonte = ImageSource(None, image=quadro)
+                itens = {}
+                recalculados = total_blocos = 0
+                inicio = now()
+                for (modo, fator), cache in caches.items():
+                    imagem = fonte.get(modo, fator)
+                    with span("incremental", modo=modo, fator=fator) as trecho:
+                        totais = cache.update(imagem)
+                        trecho.set(blocos_recalculados=cache.changed_tiles, blocos=len(cache.tiles))
+                    recalculados += cache.changed_tiles
+                    total_blocos += len(cache.tiles)
+                    for analisador, total, segundos in zip(cache.analyzers, totais, cache.seconds):
+                        nome = analisador.nome_modulo
+                        start_time = now()
+                        try:
+                            if isinstance(total, Exception):
+                                raise total
+                            ar = analisador.finalizar_blocos(total, imagem.shape[:2])
+                            item = ResultItem(module=nome, status="OK", dados=ar, time_taken=segundos + now() - start_time)
+                        except Exception as e:
+                            item = ResultItem(module=nome, status="ERRO", msg=str(e), time_taken=segundos + now() - start_time)
+                        itens[nome] = self._registrar_metricas(item)
+                grafo = self._planejar_insumos(completos, fonte, fator_pedido)
+                for analisador in completos:
+                    itens[analisador.nome_modulo] = self._executar_analisador(analisador, fonte_video, fonte, fator_pedido,
+                                                                              inicio, grafo=grafo)
+                grafo.clear()
+                fonte.release()
+
+            metricas, erros = {}, {}
+            for analisador in analisadores:
+                item = itens[analisador.nome_modulo]
+                if item.status != "OK":
+                    erros[item.module] = item.msg
+                    continue
+                dados = item.dados.metrics if isinstance(item.dados, AnalysisResult) else {}
+                metricas[item.module] = encode({
+                    k: v for k, v in (dados or {}).items()
+                    if incluir_histogramas or k not in ("bins", "counts")
+                })
+            registro.update(blocos={"recalculados": recalculados, "total": total_blocos}, metricas=metricas, erros=erros)
+            yield registro
+
+    def _executar_fonte(self, analisadores: List[AnalisadorBase], caminho_imagem: str, fonte: ImageSource,
+                        fator_pedido: int, tamanho_bloco: Optional[int],
+                        limites: Optional[RunLimits] = None,
+                        trabalhadores: Optional[int] = None,
+                        modo_paralelo: str = MODO_THREADS) -> ConsolidatedReport:
+        relatorio = ConsolidatedReport()
+        inicio = now()
+        paralelo = bool(trabalhadores and trabalhadores > 1 and len(analisadores) > 1 and not tamanho_bloco)
+        # Reserva os núcleos da execução: o gerenciador ajusta as threads do OpenCV/BLAS ao total ativo
+        with RESOURCES.lease(trabalhadores if paralelo else 1) as reserva:
+            if tamanho_bloco:
+                with span("blocos", tamanho=tamanho_bloco):
+                    itens = self._executar_em_blocos(analisadores, fonte, fator_pedido, tamanho_bloco, limites)
+            else:
+                grafo = self._planejar_insumos(analisadores, fonte, fator_pedido)
+                if paralelo:
+                    itens = self._executar_paralelo(analisadores, caminho_imagem, fonte, fator_pedido, inicio,
+                                                    limites, grafo, reserva, modo_paralelo)
+                else:
+                    itens = [self._executar_analisador(analisador, caminho_imagem, fonte, fator_pedido, inicio,
+                                                       limites, grafo) for analisador in analisadores]
+                grafo.clear()
+        for item in itens:
+            relatorio.add(item)
+        fonte.release()
+        return relatorio
+
+    def _executar_paralelo(self, analisadores: List[AnalisadorBase], caminho_imagem: str, fonte: ImageSource,
+                           fator_pedido: int, inicio: float, limites: Optional[RunLimits],
+                           grafo: IntermediateGraph, reserva: Lease,
+                           modo_paralelo: str = MODO_THREADS) -> List[ResultItem]:
+        """Executa em um pool de threads, submetendo primeiro o maior custo previsto (LPT, minimiza o makespan).
+
+        Analisadores nunca observados vão na frente (custo desconhecido pode ser o maior).
+        Cada tarefa herda o contexto (rastreamento/perfil) da requisição; com afinidade ativa
+        cada thread do pool fica fixada na sua fatia de núcleos (`services.resources`).
+
+        Em `MODO_PROCESSOS` cada thread decodifica/obtém as entradas no processo principal e
+        despacha `processar` para o pool de processos (`_despachar_processo`); a imagem e os
+        insumos vão uma única vez para a memória compartilhada, com um consumidor por analisador.
+        """
+        previstos = self._prever_analisadores(analisadores, fonte, fator_pedido)
+        ordem = sorted(range(len(analisadores)),
+                       key=lambda i: -previstos[i] if previstos[i] is not None else float("-inf"))
+        processos = None
+        if modo_paralelo == MODO_PROCESSOS:
+            processos = (process_pool(reserva.workers), SharedArrays().plan(self._chaves_compartilhadas(
+                analisadores, fator_pedido)))
+        try:
+            with ThreadPoolExecutor(max_workers=reserva.workers, thread_name_prefix="analisador",
+                                    initializer=reserva.initializer) as pool:
+                futuros = {i: pool.submit(contextvars.copy_context().run, self._executar_analisador, analisadores[i],
+                                          caminho_imagem, fonte, fator_pedido, inicio, limites, grafo, processos)
+                           for i in ordem}
+        finally:
+            if processos is not None:
+                processos[1].close()
+        return [futuros[i].result() for i in range(len(analisadores))]
+
+    def _chaves_compartilhadas(self, analisadores: List[AnalisadorBase], fator_pedido: int) -> List[tuple]:
+        """Segmentos de memória compartilhada que cada analisador vai consumir (um consumidor por ocorrência)."""
+        chaves = []
+        for analisador in analisadores:
+            descritor = self.registro.describe(analisador)
+            fator = effective_factor(fator_pedido, descritor.max_reduction)
+            if descritor.takes_image:
+                chaves.append(("imagem", descritor.read_mode, fator))
+            if descritor.takes_inputs:
+                chaves.extend(("insumo", nome, fator) for nome in {canonical(n) for n in descritor.inputs})
+        return chaves
+
+    @staticmethod
+    def _despachar_processo(processos: Tuple[Any, SharedArrays], analisador: AnalisadorBase, descritor,
+                            argumentos: tuple, kwargs: dict, fator: int, opcoes_perfil) -> tuple:
+        """Chama `processar` no pool de processos passando só handles dos arrays compartilhados."""
+        pool, compartilhados = processos
+        chaves, handles = [], {}
+        try:
+            if 'imagem' in kwargs:
+                chave = ("imagem", descritor.read_mode, fator)
+                handles['imagem'] = compartilhados.publish(chave, kwargs['imagem'])
+                chaves.append(chave)
+            if 'insumos' in kwargs:
+                handles['insumos'] = {}
+                for nome in {canonical(n) for n in kwargs['insumos']}:
+                    chaves.append(("insumo", nome, fator))
+                for nome, valor in kwargs['insumos'].items():
+                    handles['insumos'][nome] = (None if valor is None
+                                                else compartilhados.publish(("insumo", canonical(nome), fator), valor))
+            if 'mascara' in kwargs:
+                handles['mascara'] = kwargs['mascara']  # uint8 do recorte: vai por pickle, sem segmento próprio
+            return pool.submit(_processar_compartilhado, _referencia(analisador), argumentos, handles, opcoes_perfil).result()
+        finally:
+            for chave in chaves:
+                compartilhados.release(chave)
+
+    def _prever_analisadores(self, analisadores: List[AnalisadorBase], fonte: ImageSource,
+                             fator_pedido: int) -> List[Optional[float]]:
+        """Segundos previstos para cada analisador nesta fonte (None = nunca observado ou tamanho ilegível)."""
+        previstos = []
+        for analisador in analisadores:
+            descritor = self.registro.describe(analisador)
+            megapixels = fonte.megapixels(effective_factor(fator_pedido, descritor.max_reduction))
+            previstos.append(None if megapixels is None
+                             else self.custos.predict(descritor.name, descritor.version, megapixels))
+        return previstos
+
+    def prever(self, caminho_imagem: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+               qualidade: Optional[str] = None, trabalhadores: Optional[int] = None) -> dict:
+        """Duração prevista de `executar_pipeline` com essas opções, sem executar nada.
+
+        Usa só o cabeçalho da imagem (dimensões) e o modelo de custo. `estimado_s` é o makespan
+        com `trabalhadores` (1 = soma); analisadores sem histórico aparecem em `desconhecidos`
+        e não entram na soma, então a estimativa é um limite inferior nesse caso.
+        """
+        analisadores = self.selecionar_analisadores(modulos)
+        fator_pedido = quality_factor(qualidade)
+        fonte = ImageSource(caminho_imagem if os.path.exists(caminho_imagem) else None)
+        previstos = self._prever_analisadores(analisadores, fonte, fator_pedido)
+        nomes = [self.registro.describe(a).name for a in analisadores]
+        conhecidos = [p for p in previstos if p is not None]
+        megapixels = fonte.megapixels()
+        return {
+            "megapixels": round(megapixels, 3) if megapixels is not None else None,
+            "qualidade": qualidade or "full",
+            "trabalhadores": max(1, trabalhadores or 1),
+            "por_modulo": {n: (round(p, 4) if p is not None else None) for n, p in zip(nomes, previstos)},
+            "desconhecidos": [n for n, p in zip(nomes, previstos) if p is None],
+            "sequencial_s": round(sum(conhecidos), 4),
+            "estimado_s": round(makespan(conhecidos, trabalhadores or 1), 4),
+        }
 
-            conteudo = None
+    def _planejar_insumos(self, analisadores: List[AnalisadorBase], fonte: ImageSource,
+                          fator_pedido: int) -> IntermediateGraph:
+        """Grafo dos produtos intermediários da execução, com a contagem de consumidores já conhecida."""
+        descritores = [self.registro.describe(a) for a in analisadores]
+        return IntermediateGraph(fonte).plan(
+            (d.inputs, effective_factor(fator_pedido, d.max_reduction))
+            for d in descritores if d.takes_inputs and d.inputs)
+
+    def _executar_analisador(self, analisador: AnalisadorBase, caminho_imagem: str, fonte: ImageSource,
+                             fator_pedido: int, inicio_execucao: Optional[float] = None,
+                             limites: Optional[RunLimits] = None,
+                             grafo: Optional[IntermediateGraph] = None,
+                             processos: Optional[Tuple[Any, SharedArrays]] = None) -> ResultItem:
+        with span("analisador", modulo=self.registro.describe(analisador).name) as trecho:
+            item = self._chamar_analisador(analisador, caminho_imagem, fonte, fator_pedido, inicio_execucao,
+                                           limites or RunLimits(), grafo, processos)
+            trecho.set(status=item.status)
+            return item
+
+    def _chamar_analisador(self, analisador: AnalisadorBase, caminho_imagem: str, fonte: ImageSource,
+                           fator_pedido: int, inicio_execucao: Optional[float], limites: RunLimits,
+                           grafo: Optional[IntermediateGraph] = None,
+                           processos: Optional[Tuple[Any, SharedArrays]] = None) -> ResultItem:
+        # Tudo o que depende da classe (assinatura, insumos, orçamento) já está no descritor
+        descritor = self.registro.describe(analisador)
+        nome = descritor.name
+        logger.debug("Executando: %s", nome)
+        start_time = now()
+        if inicio_execucao is not None:
+            REGISTRY.observe(ANALYZER_QUEUE_WAIT, start_time - inicio_execucao, module=nome)
+
+        if fonte.region is not None and not (descritor.takes_image or descritor.passes_content):
+            # Só recebe o caminho: leria a imagem inteira, fora da região pedida
+            return self._registrar_metricas(ResultItem(module=nome, status="IGNORADO", time_taken=0.0,
+                                                       msg="Analisador não suporta ROI/máscara."))
+
+        opcoes_perfil = active_options()
+        perfilador = AnalyzerProfiler(nome, opcoes_perfil) if opcoes_perfil else None
+        resumo_perfil = None
+        conteudo = None
+        if descritor.passes_content and fonte.image is not None:
+            # Quadro já decodificado: bytes (PNG) só para analisadores que não recebem `imagem`
+            if not descritor.takes_image:
+                conteudo = fonte.encoded_content()
+        elif descritor.passes_content:
+            # Arquivo mapeado uma vez por execução: todos os analisadores (e threads) compartilham o mesmo mapa
+            conteudo = fonte.buffer()
             try:
-                if os.path.exists(caminho_imagem):
+                if conteudo is None and os.path.exists(caminho_imagem):
                     with open(caminho_imagem, 'rb') as f:
                         conteudo = f.read()
             except Exception:
                 conteudo = None
 
-            try:
-                sig = inspect.signature(analisador.processar)
-                params = [p for p in sig.parameters.values() if p.name != 'self']
-                if len(params) >= 2:
-                    resultado = analisador.processar(caminho_imagem, conteudo)
-                else:
-                    resultado = analisador.processar(caminho_imagem)
-
-                tempo = time.time() - start_time
-                print(f"    [SUCESSO] Concluído em {tempo:.2f}s")
-                if isinstance(resultado, dict):
-                    ar = AnalysisResult(detalhe=resultado.get("detalhe"), extra={k: v for k, v in resultado.items() if k != "detalhe"})
-                elif isinstance(resultado, AnalysisResult):
-                    ar = resultado
-                else:
-                    ar = AnalysisResult(extra={"value": resultado})
+        # Produtos intermediários só vêm do grafo planejado; fora dele o analisador os calcula sozinho
+        usa_insumos = grafo is not None and descritor.takes_inputs and bool(descritor.inputs)
+        fator_leitura = effective_factor(fator_pedido, descritor.max_reduction)
+        try:
+            limites.check()
+            fator = 1
+            kwargs = {}
+            if descritor.takes_image:
+                fator = fator_leitura
+                kwargs['imagem'] = fonte.get(descritor.read_mode, fator)
+            if usa_insumos:
+                fator = fator_leitura
+                kwargs['insumos'] = grafo.acquire(descritor.inputs, fator)
+            if descritor.takes_mask and fonte.mask is not None:
+                kwargs['mascara'] = fonte.mask_at(fator_leitura if descritor.takes_image else 1)
+            entrada = kwargs['imagem'] if 'imagem' in kwargs else conteudo
+            REGISTRY.inc(ANALYZER_INPUT_BYTES, getattr(entrada, "nbytes", None) or len(entrada or b""), module=nome)
+            argumentos = (caminho_imagem, conteudo) if descritor.passes_content else (caminho_imagem,)
+            if limites.interrupts(descritor.timeout):
+                # Isolado em processo filho para poder ser interrompido; o perfil é coletado lá
+                resultado, resumo_perfil = run_isolated(
+                    _processar_isolado, (_referencia(analisador), _sem_mapas(argumentos), kwargs, opcoes_perfil),
+                    timeout=limites.budget(descritor.timeout), cancel=limites.cancel)
+                perfilador = None
+            elif processos is not None:
+                resultado, resumo_perfil = self._despachar_processo(processos, analisador, descritor,
+                                                                    _sem_mapas(argumentos), kwargs, fator_leitura,
+                                                                    opcoes_perfil)
+                perfilador = None
+            elif perfilador is not None:
+                resultado = perfilador.run(analisador.processar, *argumentos, **kwargs)
+            else:
+                resultado = analisador.processar(*argumentos, **kwargs)
 
-                item = ResultItem(module=analisador.nome_modulo, status="OK", dados=ar, time_taken=tempo)
-                relatorio_final.add(item)
+            tempo = now() - start_time
+            logger.debug("%s concluído em %.3fs", nome, tempo)
+            ar = descritor.normalize(resultado)
+            if fator > 1:
+                ar.extra = dict(ar.extra or {}, decodificacao={"modo": descritor.read_mode, "fator": fator})
 
-            except Exception as e:
-                tempo = time.time() - start_time
-                print(f"    [FALHA] Ocorreu um erro: {str(e)}")
-                item = ResultItem(module=analisador.nome_modulo, status="ERRO", msg=str(e), time_taken=tempo)
-                relatorio_final.add(item)
+            item = ResultItem(module=nome, status="OK", dados=ar, time_taken=tempo)
+            imagem = kwargs.get('imagem')
+            megapixels = imagem.shape[0] * imagem.shape[1] / 1e6 if imagem is not None else fonte.megapixels(fator)
+            if megapixels is not None:
+                self.custos.observe(nome, descritor.version, tempo, megapixels)
+
+        except Exception as e:
+            tempo = now() - start_time
+            status = getattr(e, "status", "ERRO")
+            msg = str(e)
+            if isinstance(e, AnalyzerTimeout) and (limites.remaining() or 0) < 0:
+                msg = f"Prazo da execução ({limites.deadline_s:g}s) esgotado."
+            logger.warning("Falha em %s (%s): %s", nome, status, msg)
+            item = ResultItem(module=nome, status=status, msg=msg, time_taken=tempo)
+        finally:
+            if usa_insumos:
+                grafo.release(descritor.inputs, fator_leitura)
+
+        if perfilador is not None:
+            item.profile = perfilador.summary()
+        elif resumo_perfil is not None:
+            item.profile = resumo_perfil
+        return self._registrar_metricas(item)
+
+    @staticmethod
+    def _registrar_metricas(item: ResultItem) -> ResultItem:
+        """Contabiliza chamada, erro e latência do analisador no registro de métricas (`/metrics`)."""
+        REGISTRY.inc(ANALYZER_CALLS, module=item.module, status=item.status)
+        if item.status == "ERRO":
+            REGISTRY.inc(ANALYZER_ERRORS, module=item.module)
+        if item.status != "IGNORADO":
+            REGISTRY.observe(ANALYZER_LATENCY, item.time_taken, module=item.module)
+        return item
+
+    def _executar_em_blocos(self, analisadores: List[AnalisadorBase], fonte: ImageSource, fator_pedido: int,
+                            tamanho_bloco: int, limites: Optional[RunLimits] = None) -> List[ResultItem]:
+        """Modo em blocos: percorre a imagem uma vez por (modo, fator) e alimenta cada analisador bloco a bloco.
 
-        self._gerar_relatorio_consolidado(relatorio_final)
+        Os intermediários de cada analisador ficam limitados ao tamanho do bloco (+ halo); só a
+        imagem decodificada é mantida inteira. Analisadores sem suporte são reportados como IGNORADO.
+        Os `limites` são verificados entre blocos (cada bloco é curto), sem processo filho.
+        """
+        limites = limites or RunLimits()
+        itens = {}
+        grupos = {}
+        for analisador in analisadores:
+            descritor = self.registro.describe(analisador)
+            if not descritor.tiled:
+                itens[analisador.nome_modulo] = ResultItem(
+                    module=analisador.nome_modulo, status="IGNORADO",
+                    msg="Analisador não suporta processamento em blocos.", time_taken=0.0)
+                continue
+            fator = effective_factor(fator_pedido, descritor.max_reduction)
+            grupos.setdefault((descritor.read_mode, fator), []).append(analisador)
 
-        return relatorio_final.to_dict() # Precisa fazer assim pra UI entender
+        for (modo, fator), membros in grupos.items():
+            imagem = fonte.get(modo, fator)
+            if imagem is None:
+                for analisador in membros:
+                    itens[analisador.nome_modulo] = ResultItem(
+                        module=analisador.nome_modulo, status="ERRO", msg="Erro ao carregar imagem", time_taken=0.0)
+                continue
+
+            altura, largura = imagem.shape[:2]
+            descritores = {a.nome_modulo: self.registro.describe(a) for a in membros}
+            halo_max = max(d.halo for d in descritores.values())
+            parciais = {a.nome_modulo: None for a in membros}
+            tempos = {a.nome_modulo: 0.0 for a in membros}
+            opcoes_perfil = active_options()
+            perfiladores = {a.nome_modulo: AnalyzerProfiler(a.nome_modulo, opcoes_perfil)
+                            for a in membros} if opcoes_perfil else {}
+            falhas = {}
+            num_blocos = 0
+            logger.debug("Modo em blocos (%s, fator %d): %dx%d, bloco %d, halo %d",
+                         modo, fator, altura, largura, tamanho_bloco, halo_max)
+
+            for (y0, y1, x0, x1), nucleo in iter_tiles(altura, largura, tamanho_bloco, halo_max):
+                num_blocos += 1
+                bloco = imagem[y0:y1, x0:x1]
+                for analisador in membros:
+                    nome = analisador.nome_modulo
+                    if nome in falhas:
+                        continue
+                    descritor = descritores[nome]
+                    orcamento = descritor.timeout if descritor.timeout is not None else limites.timeout
+                    start_time = now()
+                    try:
+                        limites.check()
+                        if orcamento is not None and tempos[nome] > orcamento:
+                            raise AnalyzerTimeout(f"Tempo limite de {orcamento:g}s excedido.")
+                        sub, sub_nucleo = shrink_halo(bloco, nucleo, descritor.halo)
+                        if perfiladores:
+                            parcial = perfiladores[nome].run(analisador.processar_bloco, sub, sub_nucleo)
+                        else:
+                            parcial = analisador.processar_bloco(sub, sub_nucleo)
+                        parciais[nome] = analisador.combinar_blocos(parciais[nome], parcial)
+                    except Exception as e:
+                        falhas[nome] = e
+                    tempos[nome] += now() - start_time
+
+            for analisador in membros:
+                nome = analisador.nome_modulo
+                start_time = now()
+                try:
+                    if nome in falhas:
+                        raise falhas[nome]
+                    ar = analisador.finalizar_blocos(parciais[nome], (altura, largura))
+                    ar.extra = dict(ar.extra or {}, blocos={"tamanho": tamanho_bloco, "quantidade": num_blocos,
+                                                            "halo": descritores[nome].halo, "fator": fator,
+                                                            "exato": descritores[nome].exact_tiles})
+                    tempo = tempos[nome] + now() - start_time
+                    logger.debug("%s concluído em %.3fs", nome, tempo)
+                    itens[nome] = ResultItem(module=nome, status="OK", dados=ar, time_taken=tempo)
+                    self.custos.observe(nome, descritores[nome].version, tempo, altura * largura / 1e6)
+                except Exception as e:
+                    tempo = tempos[nome] + now() - start_time
+                    status = getattr(e, "status", "ERRO")
+                    logger.warning("Falha em %s (%s): %s", nome, status, e)
+                    itens[nome] = ResultItem(module=nome, status=status, msg=str(e), time_taken=tempo)
+                if perfiladores:
+                    itens[nome].profile = perfiladores[nome].summary()
+                parciais[nome] = None
+
+        # Mantém a ordem de execução original no relatório
+        return [self._registrar_metricas(itens[a.nome_modulo]) for a in analisadores]
 
     def _gerar_relatorio_consolidado(self, dados: ConsolidatedReport):
-        print(f"\n{'-'*60}")
-        print("RESUMO DA EXECUÇÃO")
-        print(f"{'-'*60}")
+        """Resumo da execução no log (nível INFO; um registro por módulo, com campos estruturados)."""
+        if not logger.isEnabledFor(logging.INFO):
+            return
         for modulo, info in dados:
-                status = info.status
-                if status == 'OK':
-                    detalhe = None
-                    if isinstance(info.dados, AnalysisResult):
-                        detalhe = info.dados.detalhe
-                    print(f"[{status}] {modulo} -> Tempo: {info.time_taken:.2f}s" + (f" | Detalhe: {detalhe}" if detalhe else ""))
-                else:
-                    print(f"[{status}] {modulo} -> Erro: {info.msg} (tempo: {info.time_taken:.2f}s)")
-
+            campos = {"modulo": modulo, "status": info.status, "tempo": info.time_taken}
+            if info.status == 'OK':
+                detalhe = info.dados.detalhe if isinstance(info.dados, AnalysisResult) else None
+                logger.info("[%s] %s -> Tempo: %.2fs%s", info.status, modulo, info.time_taken,
+                            f" | Detalhe: {detalhe}" if detalhe else "", extra=campos)
+            else:
+                logger.info("[%s] %s -> Erro: %s (tempo: %.2fs)", info.status, modulo, info.msg, info.time_taken,
+                            extra=campos)
@@ -1,8 +1,13 @@
 import os
 import sys
+import logging
 
 def main():
+	from services.logging_setup import configure_logging
+	from services.resources import RESOURCES
 	from ui.app import run
+	configure_logging()
+	logging.getLogger(__name__).info("Recursos: %s", RESOURCES.report())
 	port = int(os.environ.get("PORT", "5000"))
 	run(port=port)
 
@@ -1,20 +1,44 @@
-from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 
+from .encoding import ARRAYS_LIST, encode
 
-@dataclass
-class AnalysisResult:
 
-    detalhe: Optional[str] = None
-    metrics: Optional[Dict[str, Any]] = field(default_factory=dict)
-    extra: Optional[Dict[str, Any]] = field(default_factory=dict)
+class SlotModel:
+    """Base for the result models: `__slots__` declared by hand (``dataclass(slots=True)`` needs
+    Python 3.10), with the field-wise `__repr__`/`__eq__` a dataclass would generate."""
 
-    def to_dict(self) -> Dict[str, Any]:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+
+class AnalysisResult(SlotModel):
+    """Result of one analyzer. `metrics`/`extra` may hold NumPy arrays and scalars as they are;
+    they are converted only by `to_dict` (see `models.encoding`)."""
+
+    __slots__ = ("detalhe", "metrics", "extra")
+
+    def __init__(self, detalhe: Optional[str] = None, metrics: Optional[Dict[str, Any]] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.detalhe = detalhe
+        self.metrics = {} if metrics is None else metrics
+        self.extra = {} if extra is None else extra
+
+    def to_dict(self, arrays: str = ARRAYS_LIST) -> Dict[str, Any]:
         out: Dict[str, Any] = {}
         if self.detalhe is not None:
             out["detalhe"] = self.detalhe
         if self.metrics:
-            out["metrics"] = self.metrics
+            out["metrics"] = encode(self.metrics, arrays)
         if self.extra:
-            out["extra"] = self.extra
+            out["extra"] = encode(self.extra, arrays)
         return out
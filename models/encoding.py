@@ -0,0 +1,81 @@
+"""Array-aware conversion of result models to JSON-ready values.
+
+Analyzers may leave NumPy arrays and scalars in `metrics` (histograms,
+per-angle values...); they are only converted here, when a report is
+serialized. Array modes:
+
+- ``"list"`` (default): arrays become lists via `ndarray.tolist()` (one C-level pass);
+- ``"binary"``: numeric arrays of at least `BINARY_MIN_SIZE` elements become
+  ``{"__ndarray__": <base64 of the raw little-endian buffer>, "dtype": ..., "shape": [...]}``,
+  integers narrowed to the smallest dtype holding their range; much smaller and
+  faster to produce and parse than a list of numbers (`decode_array` reverses it);
+- ``"raw"``: arrays are kept as they are (in-process consumers).
+"""
+import base64
+import json
+from typing import Any, Tuple
+
+import numpy as np
+
+ARRAYS_LIST = "list"
+ARRAYS_BINARY = "binary"
+ARRAYS_RAW = "raw"
+ARRAY_MODES = (ARRAYS_LIST, ARRAYS_BINARY, ARRAYS_RAW)
+
+# Small arrays stay as lists: the base64 wrapper would be larger than the numbers
+BINARY_MIN_SIZE = 16
+
+
+def check_mode(arrays: str, modes: Tuple[str, ...] = ARRAY_MODES) -> str:
+    """Validate an array format; `modes` narrows the accepted ones (e.g. no "raw" where JSON is written)."""
+    if arrays not in modes:
+        raise ValueError(f"Formato de arrays desconhecido: {arrays!r} (use {', '.join(modes)}).")
+    return arrays
+
+
+def encode_array(array: np.ndarray, arrays: str = ARRAYS_LIST) -> Any:
+    if arrays == ARRAYS_RAW:
+        return array
+    if arrays == ARRAYS_BINARY and array.dtype.kind in "biuf" and array.size >= BINARY_MIN_SIZE:
+        dtype = array.dtype
+        if dtype.kind in "iu":
+            dtype = np.result_type(np.min_scalar_type(array.min()), np.min_scalar_type(array.max()))
+        data = np.ascontiguousarray(array, dtype=dtype.newbyteorder("<"))
+        return {"__ndarray__": base64.b64encode(data.tobytes()).decode("ascii"),
+                "dtype": data.dtype.str, "shape": list(array.shape)}
+    return array.tolist()
+
+
+def decode_array(value: Any) -> Any:
+    """Inverse of the binary encoding; anything else is returned unchanged."""
+    if isinstance(value, dict) and "__ndarray__" in value:
+        data = base64.b64decode(value["__ndarray__"])
+        return np.frombuffer(data, dtype=np.dtype(value["dtype"])).reshape(value["shape"])
+    return value
+
+
+def encode(value: Any, arrays: str = ARRAYS_LIST) -> Any:
+    """`value` with every NumPy array/scalar inside dicts, lists and tuples converted per `arrays`."""
+    if isinstance(value, dict):
+        return {k: encode(v, arrays) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return encode_array(value, arrays)
+    if isinstance(value, (list, tuple)):
+        return [encode(v, arrays) for v in value]
+    if isinstance(value, np.generic) and arrays != ARRAYS_RAW:
+        return value.item()
+    return value
+
+
+def json_default(value: Any) -> Any:
+    """`json.dumps(default=...)`: serialize the NumPy scalars/arrays left in a report."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any, **kwargs) -> str:
+    """`json.dumps` that accepts NumPy values directly (no intermediate copy of the report)."""
+    return json.dumps(value, default=json_default, **kwargs)
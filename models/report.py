@@ -1,40 +1,51 @@
-from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 
-from .analysis import AnalysisResult
+from .analysis import AnalysisResult, SlotModel
+from .encoding import ARRAYS_LIST, check_mode
 
 
-@dataclass
-class ResultItem:
-    module: str
-    status: str  # e.g. 'OK' ou 'ERRO'
-    dados: Optional[AnalysisResult] = None
-    msg: Optional[str] = None
-    time_taken: Optional[float] = None
+class ResultItem(SlotModel):
+    __slots__ = ("module", "status", "dados", "msg", "time_taken", "profile")
 
-    def to_dict(self) -> Dict[str, Any]:
+    def __init__(self, module: str, status: str, dados: Optional[AnalysisResult] = None,
+                 msg: Optional[str] = None, time_taken: Optional[float] = None,
+                 profile: Optional[Dict[str, Any]] = None):
+        self.module = module
+        self.status = status  # e.g. 'OK' ou 'ERRO'
+        self.dados = dados
+        self.msg = msg
+        self.time_taken = time_taken
+        self.profile = profile  # cProfile/tracemalloc summary when profiling is on
+
+    def to_dict(self, arrays: str = ARRAYS_LIST) -> Dict[str, Any]:
         out: Dict[str, Any] = {"status": self.status}
         if self.dados is not None:
             try:
-                out["dados"] = self.dados.to_dict()
+                out["dados"] = self.dados.to_dict(arrays)
             except Exception:
                 out["dados"] = self.dados
         if self.msg is not None:
             out["msg"] = self.msg
         if self.time_taken is not None:
             out["time_taken"] = round(self.time_taken, 3)
+        if self.profile is not None:
+            out["profile"] = self.profile
         return out
 
 
-@dataclass
-class ConsolidatedReport:
-    items: Dict[str, ResultItem] = field(default_factory=dict)
+class ConsolidatedReport(SlotModel):
+    __slots__ = ("items",)
+
+    def __init__(self, items: Optional[Dict[str, ResultItem]] = None):
+        self.items = {} if items is None else items
 
     def add(self, item: ResultItem) -> None:
         self.items[item.module] = item
 
-    def to_dict(self) -> Dict[str, Dict[str, Any]]:
-        return {k: v.to_dict() for k, v in self.items.items()}
+    def to_dict(self, arrays: str = ARRAYS_LIST) -> Dict[str, Dict[str, Any]]:
+        """JSON-ready report; `arrays` chooses how NumPy arrays are written ("list", "binary" or "raw")."""
+        check_mode(arrays)
+        return {k: v.to_dict(arrays) for k, v in self.items.items()}
 
     def __iter__(self):
         return iter(self.items.items())
@@ -0,0 +1,306 @@
+"""Incremental aggregation of consolidated reports.
+
+Reports are folded in one at a time so callers never need to keep every
+report alive: numeric scalar metrics keep a running mean/variance (Welford),
+histogram `counts` are summed element-wise, count metrics listed in `total_metrics`
+(shape classes, edge pixels) are summed, and metrics listed in
+`distributions` (edge density) are binned into a fixed histogram. Distribution
+keys are ``"module pattern/metric"`` (fnmatch on the module name, so the Canny
+`percentual` is not mixed with the thresholding one) or a bare ``"metric"`` for
+every module. Memory is
+bounded by the number of modules/metrics, not by the number of reports.
+
+Aggregators built in different processes (or shards of a corpus) combine
+with `merge` (Chan et al. pairwise update for mean/variance), and their state
+is a plain JSON-able dict (`to_state`/`from_state`), so a long batch can be
+checkpointed with `save` and resumed with `load`.
+"""
+import json
+import math
+import os
+import threading
+from fnmatch import fnmatchcase
+from numbers import Number
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from models.report import ConsolidatedReport
+
+# Count metrics summed over the corpus (AnalisadorDeteccaoFormas, Canny)
+DEFAULT_TOTALS = ("total_formas", "triangulos", "quadrados", "circulos", "pixels_borda", "total_pixels")
+# "module pattern/metric" -> (low, high, bins) of the distribution histogram (Canny: % of edge pixels)
+DEFAULT_DISTRIBUTIONS = {"Canny*/percentual": (0.0, 100.0, 20)}
+
+
+class RunningStats:
+    """Running count/mean/variance/min/max of a scalar (Welford's algorithm)."""
+
+    __slots__ = ("n", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "RunningStats") -> None:
+        """Fold another partial aggregate in (Chan et al.), as if its values had been added here."""
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"n": self.n, "media": self.mean, "desvio": self.std, "min": self.min, "max": self.max}
+
+    def to_state(self) -> list:
+        return [self.n, self.mean, self.m2, self.min, self.max]
+
+    @classmethod
+    def from_state(cls, state: Sequence[float]) -> "RunningStats":
+        stats = cls()
+        stats.n, stats.mean, stats.m2, stats.min, stats.max = state
+        return stats
+
+
+class Distribution:
+    """Fixed-bin histogram of a scalar over [low, high]; values outside are clamped to the edge bins."""
+
+    __slots__ = ("low", "high", "counts")
+
+    def __init__(self, low: float, high: float, bins: int):
+        self.low = low
+        self.high = high
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def add(self, value: float) -> None:
+        bins = len(self.counts)
+        index = int((value - self.low) / (self.high - self.low) * bins)
+        self.counts[min(max(index, 0), bins - 1)] += 1
+
+    def merge(self, other: "Distribution") -> None:
+        self.counts += other.counts
+
+    def to_dict(self) -> Dict[str, list]:
+        return {"bordas": np.linspace(self.low, self.high, len(self.counts) + 1).tolist(),
+                "contagens": self.counts.tolist()}
+
+    def to_state(self) -> list:
+        return [self.low, self.high, self.counts.tolist()]
+
+    @classmethod
+    def from_state(cls, state: Sequence[Any]) -> "Distribution":
+        low, high, counts = state
+        distribution = cls(low, high, len(counts))
+        distribution.counts[:] = counts
+        return distribution
+
+
+def module_distributions(module: str, distributions: Dict[str, Tuple[float, float, int]] = DEFAULT_DISTRIBUTIONS
+                         ) -> Dict[str, Tuple[float, float, int]]:
+    """Metric -> spec of the `distributions` that apply to `module` (see the module docstring for the keys)."""
+    specs = {}
+    for key, spec in distributions.items():
+        pattern, _, metric = key.rpartition("/")
+        if not pattern or fnmatchcase(module, pattern):
+            specs[metric] = spec
+    return specs
+
+
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (Number, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+class ModuleAggregate:
+    """Aggregated view of one analyzer across many reports."""
+
+    def __init__(self, total_metrics: Sequence[str] = DEFAULT_TOTALS,
+                 distributions: Optional[Dict[str, Tuple[float, float, int]]] = None, module: str = ""):
+        self.ok = 0
+        self.errors = 0
+        self.stats: Dict[str, RunningStats] = {}
+        self.counts = None
+        self.bins = None
+        self.totals: Dict[str, int] = {}
+        self.distributions: Dict[str, Distribution] = {}
+        self._total_names = frozenset(total_metrics)
+        self._distribution_specs = module_distributions(
+            module, DEFAULT_DISTRIBUTIONS if distributions is None else distributions)
+
+    def add(self, info: Dict[str, Any]) -> None:
+        if info.get("status") != "OK":
+            self.errors += 1
+            return
+        self.add_metrics((info.get("dados") or {}).get("metrics") or {})
+
+    def add_metrics(self, metrics: Dict[str, Any]) -> None:
+        """Fold the metrics of one OK result (dict or raw `AnalysisResult.metrics`)."""
+        self.ok += 1
+        for name, value in metrics.items():
+            if name == "counts":
+                counts = np.asarray(value, dtype=np.int64)
+                self.counts = counts.copy() if self.counts is None else self.counts + counts
+            elif name == "bins":
+                if self.bins is None:
+                    self.bins = np.asarray(value).tolist()
+            elif _is_scalar(value):
+                self.stats.setdefault(name, RunningStats()).add(float(value))
+                if name in self._total_names:
+                    self.totals[name] = self.totals.get(name, 0) + int(value)
+                spec = self._distribution_specs.get(name)
+                if spec is not None:
+                    if name not in self.distributions:
+                        self.distributions[name] = Distribution(*spec)
+                    self.distributions[name].add(float(value))
+
+    def merge(self, other: "ModuleAggregate") -> None:
+        self.ok += other.ok
+        self.errors += other.errors
+        for name, stats in other.stats.items():
+            self.stats.setdefault(name, RunningStats()).merge(stats)
+        if other.counts is not None:
+            self.counts = other.counts.copy() if self.counts is None else self.counts + other.counts
+        if self.bins is None:
+            self.bins = other.bins
+        for name, total in other.totals.items():
+            self.totals[name] = self.totals.get(name, 0) + total
+        for name, distribution in other.distributions.items():
+            if name in self.distributions:
+                self.distributions[name].merge(distribution)
+            else:
+                self.distributions[name] = Distribution.from_state(distribution.to_state())
+
+    def to_report_item(self, label: str) -> Dict[str, Any]:
+        """Render as a report entry (same shape as `ResultItem.to_dict`) so the UI can show it."""
+        if not self.ok:
+            return {"status": "ERRO", "msg": f"Falhou em todos os {self.errors} {label}(s)."}
+        metrics: Dict[str, Any] = {}
+        for name, stats in self.stats.items():
+            metrics[name] = stats.mean
+            metrics[f"{name}_std"] = stats.std
+        for name, total in self.totals.items():
+            metrics[f"{name}_soma"] = total
+        for name, distribution in self.distributions.items():
+            metrics[f"{name}_distribuicao"] = distribution.to_dict()
+        if self.counts is not None:
+            metrics["bins"] = self.bins if self.bins is not None else list(range(len(self.counts)))
+            metrics["counts"] = self.counts.tolist()
+        detalhe = f"Agregado de {self.ok} {label}(s) (média e desvio padrão por métrica)."
+        if self.errors:
+            detalhe += f" {self.errors} {label}(s) com erro."
+        return {"status": "OK", "dados": {"detalhe": detalhe, "metrics": metrics}}
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok, "errors": self.errors,
+            "stats": {n: s.to_state() for n, s in self.stats.items()},
+            "counts": self.counts.tolist() if self.counts is not None else None,
+            "bins": self.bins,
+            "totals": dict(self.totals),
+            "distributions": {n: d.to_state() for n, d in self.distributions.items()},
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> "ModuleAggregate":
+        self.ok, self.errors = state["ok"], state["errors"]
+        self.stats = {n: RunningStats.from_state(s) for n, s in state["stats"].items()}
+        self.counts = np.asarray(state["counts"], dtype=np.int64) if state["counts"] is not None else None
+        self.bins = state["bins"]
+        self.totals = dict(state["totals"])
+        self.distributions = {n: Distribution.from_state(d) for n, d in state["distributions"].items()}
+        return self
+
+
+class ReportAggregator:
+    """Folds consolidated reports (module -> item dict, or `ConsolidatedReport`) into per-module aggregates.
+
+    `add` and `merge` are thread-safe, so one aggregator can be fed by a pool of workers.
+    """
+
+    def __init__(self, label: str = "quadro", total_metrics: Sequence[str] = DEFAULT_TOTALS,
+                 distributions: Optional[Dict[str, Tuple[float, float, int]]] = None):
+        self.label = label
+        self.total_metrics = tuple(total_metrics)
+        self.distributions = dict(DEFAULT_DISTRIBUTIONS if distributions is None else distributions)
+        self.reports = 0
+        self.modules: Dict[str, ModuleAggregate] = {}
+        self._lock = threading.Lock()
+
+    def _module(self, name: str) -> ModuleAggregate:
+        if name not in self.modules:
+            self.modules[name] = ModuleAggregate(self.total_metrics, self.distributions, name)
+        return self.modules[name]
+
+    def add(self, report: Union[ConsolidatedReport, Dict[str, Dict[str, Any]]]) -> None:
+        with self._lock:
+            self.reports += 1
+            if isinstance(report, ConsolidatedReport):
+                # Straight from the objects: no intermediate dicts, no array conversion
+                for module, item in report:
+                    aggregate = self._module(module)
+                    if item.status == "OK":
+                        aggregate.add_metrics(getattr(item.dados, "metrics", None) or {})
+                    else:
+                        aggregate.errors += 1
+            else:
+                for module, info in report.items():
+                    self._module(module).add(info)
+
+    def merge(self, other: "ReportAggregator") -> "ReportAggregator":
+        """Fold a partial aggregator (another worker/shard) into this one."""
+        with self._lock:
+            self.reports += other.reports
+            for module, aggregate in other.modules.items():
+                self._module(module).merge(aggregate)
+        return self
+
+    def to_report(self) -> Dict[str, Dict[str, Any]]:
+        return {module: agg.to_report_item(self.label) for module, agg in self.modules.items()}
+
+    # --- checkpoints -----------------------------------------------------------------
+
+    def to_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"label": self.label, "total_metrics": list(self.total_metrics),
+                    "distributions": {n: list(spec) for n, spec in self.distributions.items()},
+                    "reports": self.reports,
+                    "modules": {module: agg.to_state() for module, agg in self.modules.items()}}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ReportAggregator":
+        aggregator = cls(state["label"], state["total_metrics"],
+                         {n: tuple(spec) for n, spec in state["distributions"].items()})
+        aggregator.reports = state["reports"]
+        for module, module_state in state["modules"].items():
+            aggregator._module(module).load_state(module_state)
+        return aggregator
+
+    def save(self, path: str) -> None:
+        """Checkpoint to a JSON file (written to a temporary file and renamed, so a crash never leaves half a file)."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.to_state(), f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ReportAggregator":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_state(json.load(f))
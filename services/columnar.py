@@ -0,0 +1,185 @@
+"""Columnar store of batch results: one typed column per analyzer metric.
+
+A batch over a dataset produces one consolidated report per image; keeping
+them as nested dicts costs several hundred bytes per metric. The store keeps
+only the scalar metrics, appended row by row into preallocated ``float64``
+columns named ``"<module>/<metric>"`` (``NaN`` where an image has no value,
+e.g. the analyzer failed), plus the image id column.
+
+Every `chunk_rows` images the current chunk is sealed; with a `path` it is
+written as a compressed ``.npz`` file (``chunk-000000.npz``, ...) and dropped
+from memory. Queries (`column`, `where`, `aggregate`, `select`) read only the
+columns they need, chunk by chunk, and never rebuild per-image dicts.
+`ColumnarReportStore.open(path)` reopens a spilled store for analysis.
+"""
+import glob
+import math
+import os
+import threading
+from numbers import Number
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from models.report import ConsolidatedReport
+
+ID_COLUMN = "imagem"
+DEFAULT_CHUNK_ROWS = 4096
+
+_NAMES_KEY = "__colunas__"
+_OPERATORS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": np.not_equal,
+}
+
+
+def column_name(module: str, metric: str) -> str:
+    return f"{module}/{metric}"
+
+
+def scalar_metrics(report: Union[ConsolidatedReport, Dict[str, Any]]) -> Iterator[Tuple[str, float]]:
+    """(column, value) for every numeric scalar metric of the OK items of a report (object or dict form)."""
+    if isinstance(report, ConsolidatedReport):
+        entries = ((module, item.status, getattr(item.dados, "metrics", None)) for module, item in report)
+    else:
+        entries = ((module, info.get("status"), (info.get("dados") or {}).get("metrics"))
+                   for module, info in report.items())
+    for module, status, metrics in entries:
+        if status != "OK" or not metrics:
+            continue
+        for metric, value in metrics.items():
+            if isinstance(value, (Number, np.number)) and not isinstance(value, (bool, np.bool_)):
+                yield column_name(module, metric), float(value)
+
+
+class ColumnarReportStore:
+    def __init__(self, path: Optional[str] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be >= 1")
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        self._chunks: List[Union[str, Tuple[np.ndarray, Dict[str, np.ndarray]]]] = []
+        self._names: Dict[str, None] = {}  # every column seen, in first-seen order
+        self._ids: List[str] = []
+        self._columns: Dict[str, np.ndarray] = {}
+        self.rows = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def open(cls, path: str) -> "ColumnarReportStore":
+        """Reopen the chunks spilled under `path` (further appends add new chunks)."""
+        store = cls(path)
+        for file in sorted(glob.glob(os.path.join(path, "chunk-*.npz"))):
+            with np.load(file) as chunk:
+                store.rows += len(chunk[ID_COLUMN])
+                store._names.update(dict.fromkeys(str(n) for n in chunk[_NAMES_KEY]))
+            store._chunks.append(file)
+        return store
+
+    # --- writing -------------------------------------------------------------------
+
+    def append(self, image_id: str, report: Union[ConsolidatedReport, Dict[str, Any]]) -> None:
+        values = list(scalar_metrics(report))
+        with self._lock:
+            row = len(self._ids)
+            for name, value in values:
+                column = self._columns.get(name)
+                if column is None:
+                    column = self._columns[name] = np.full(self.chunk_rows, np.nan)
+                    self._names.setdefault(name)
+                column[row] = value
+            self._ids.append(str(image_id))
+            self.rows += 1
+            if len(self._ids) == self.chunk_rows:
+                self._seal()
+
+    def _seal(self) -> None:
+        rows = len(self._ids)
+        ids = np.array(self._ids)
+        columns = {name: column[:rows].copy() for name, column in self._columns.items()}
+        if self.path is None:
+            self._chunks.append((ids, columns))
+        else:
+            file = os.path.join(self.path, f"chunk-{len(self._chunks):06d}.npz")
+            names = list(columns)
+            np.savez_compressed(file, **{ID_COLUMN: ids, _NAMES_KEY: np.array(names, dtype=str)},
+                                **{f"c{i}": columns[n] for i, n in enumerate(names)})
+            self._chunks.append(file)
+        self._ids = []
+        self._columns = {}
+
+    def flush(self) -> None:
+        """Seal the partial chunk (written to disk when the store has a path)."""
+        with self._lock:
+            if self._ids:
+                self._seal()
+
+    # --- reading -------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._names)
+
+    def _iter_chunks(self, names: Iterable[str], with_ids: bool = False) -> Iterator[Tuple[Optional[np.ndarray], Dict[str, np.ndarray]]]:
+        """(ids, {name: values}) per chunk for the requested columns only; missing columns come back as NaN."""
+        names = list(names)
+        with self._lock:
+            chunks = list(self._chunks)
+            partial = (np.array(self._ids), {n: c[:len(self._ids)].copy() for n, c in self._columns.items()})
+        if len(partial[0]):
+            chunks.append(partial)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                with np.load(chunk) as data:
+                    index = {str(n): f"c{i}" for i, n in enumerate(data[_NAMES_KEY])}
+                    ids = data[ID_COLUMN]
+                    stored = {n: data[index[n]] for n in names if n in index}
+            else:
+                ids, stored = chunk
+            yield (ids if with_ids else None), {n: stored.get(n, np.full(len(ids), np.nan)) for n in names}
+
+    def column(self, name: str) -> np.ndarray:
+        parts = [values[name] for _, values in self._iter_chunks([name])]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def ids(self) -> np.ndarray:
+        parts = [ids for ids, _ in self._iter_chunks([], with_ids=True)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=str)
+
+    def where(self, name: str, op: str, value: float) -> np.ndarray:
+        """Boolean row mask of `column(name) <op> value` (NaN rows never match)."""
+        try:
+            compare = _OPERATORS[op]
+        except KeyError:
+            raise ValueError(f"Operador desconhecido: {op} (use {', '.join(_OPERATORS)})")
+        return compare(self.column(name), value)
+
+    def select(self, names: Iterable[str], mask: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """The requested columns (plus the id column) restricted to the rows of `mask`."""
+        names = list(names)
+        parts: Dict[str, List[np.ndarray]] = {n: [] for n in [ID_COLUMN] + names}
+        start = 0
+        for ids, values in self._iter_chunks(names, with_ids=True):
+            rows = slice(start, start + len(ids))
+            keep = mask[rows] if mask is not None else slice(None)
+            parts[ID_COLUMN].append(ids[keep])
+            for n in names:
+                parts[n].append(values[n][keep])
+            start += len(ids)
+        return {n: (np.concatenate(p) if p else np.empty(0)) for n, p in parts.items()}
+
+    def aggregate(self, name: str, mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Count/mean/std/min/max of a column over the rows of `mask`, ignoring missing values."""
+        values = self.column(name)
+        if mask is not None:
+            values = values[mask]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {"n": 0, "media": math.nan, "desvio": math.nan, "min": math.nan, "max": math.nan}
+        return {"n": int(len(values)), "media": float(values.mean()), "desvio": float(values.std()),
+                "min": float(values.min()), "max": float(values.max())}
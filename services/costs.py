@@ -0,0 +1,71 @@
+"""Running cost model of the analyzers, used for scheduling and run-time prediction.
+
+Each successful analyzer call updates an exponentially weighted moving average
+of its seconds per processed megapixel (the decoded size it actually worked
+on, so reduced-quality runs are accounted for), keyed by (module, version):
+a new analyzer version starts from scratch.
+
+`predict` turns the rates back into seconds for a given image; `makespan`
+estimates the wall time of a set of calls on N workers with the same
+longest-expected-first (LPT) order the engine uses when running in parallel.
+"""
+import heapq
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_ALPHA = 0.2
+# Floor for tiny images so fixed per-call overhead does not blow up the rate
+MIN_MEGAPIXELS = 0.01
+
+
+class CostModel:
+    def __init__(self, alpha: float = DEFAULT_ALPHA):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._rates: Dict[Tuple[str, str], Tuple[float, int]] = {}  # (module, version) -> (s/MP, samples)
+
+    def observe(self, module: str, version: str, seconds: float, megapixels: float) -> None:
+        rate = seconds / max(megapixels, MIN_MEGAPIXELS)
+        key = (module, version)
+        with self._lock:
+            current = self._rates.get(key)
+            if current is None:
+                self._rates[key] = (rate, 1)
+            else:
+                average, samples = current
+                self._rates[key] = (average + self.alpha * (rate - average), samples + 1)
+
+    def rate(self, module: str, version: str) -> Optional[float]:
+        """Expected seconds per megapixel, or None when the analyzer was never observed."""
+        current = self._rates.get((module, version))
+        return None if current is None else current[0]
+
+    def predict(self, module: str, version: str, megapixels: float) -> Optional[float]:
+        rate = self.rate(module, version)
+        return None if rate is None else rate * max(megapixels, MIN_MEGAPIXELS)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rates.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {module: {"versao": version, "s_por_mp": round(rate, 6), "amostras": samples}
+                    for (module, version), (rate, samples) in sorted(self._rates.items())}
+
+
+def makespan(durations: Iterable[float], workers: int = 1) -> float:
+    """Wall time of running `durations` longest-first on `workers` parallel workers (greedy LPT)."""
+    durations = sorted(durations, reverse=True)
+    if workers <= 1 or len(durations) <= 1:
+        return float(sum(durations))
+    loads = [0.0] * min(workers, len(durations))
+    for duration in durations:
+        heapq.heapreplace(loads, loads[0] + duration)
+    return max(loads)
+
+
+# Process-wide model fed by every engine instance (kept warm by the web server)
+COSTS = CostModel()
@@ -0,0 +1,237 @@
+"""Image decoding helpers shared by the engine and the analyzers.
+
+OpenCV can decode straight into grayscale and at 1/2, 1/4 or 1/8 of the
+original size (for JPEG this skips most of the IDCT work). `ImageSource`
+decodes a file at most once per (mode, factor) during a pipeline run so every
+analyzer that asks for the same representation shares the same array.
+
+With ``mapped=True`` the file is memory-mapped once per run: decoding reads
+the mapping through a zero-copy buffer and analyzers that take the raw bytes
+all receive the same read-only map, so the pages come from the OS page cache
+instead of one heap copy per analyzer.
+"""
+import io
+import mmap
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from services.metrics import DECODE_CACHE_HITS, DECODE_CACHE_MISSES, DECODE_LATENCY, REGISTRY, now
+from services.tracing import span
+
+MODE_COLOR = "color"
+MODE_GRAY = "gray"
+# Grayscale keeping the file's bit depth (16-bit PNG/TIFF stay uint16); the codec has no reduced
+# variant for it, so factors > 1 are resized from the full decode.
+MODE_GRAY16 = "gray16"
+
+# Request-level quality presets -> maximum downscale factor allowed.
+QUALITIES = {"full": 1, "half": 2, "preview": 4, "thumbnail": 8}
+
+_FLAGS = {
+    (MODE_COLOR, 1): cv2.IMREAD_COLOR,
+    (MODE_COLOR, 2): cv2.IMREAD_REDUCED_COLOR_2,
+    (MODE_COLOR, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (MODE_COLOR, 8): cv2.IMREAD_REDUCED_COLOR_8,
+    (MODE_GRAY, 1): cv2.IMREAD_GRAYSCALE,
+    (MODE_GRAY, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (MODE_GRAY, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (MODE_GRAY, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    (MODE_GRAY16, 1): cv2.IMREAD_GRAYSCALE | cv2.IMREAD_ANYDEPTH,
+}
+
+
+def quality_factor(quality: Optional[str]) -> int:
+    """Translate a quality name (or None) into a downscale factor."""
+    if quality is None:
+        return 1
+    try:
+        return QUALITIES[quality]
+    except KeyError:
+        raise ValueError(f"Qualidade desconhecida: {quality} (use {', '.join(QUALITIES)})")
+
+
+def effective_factor(requested: int, max_reduction: int) -> int:
+    """Largest supported factor not above what the request and the analyzer allow."""
+    limit = max(1, min(requested, max_reduction))
+    factor = 1
+    for f in (2, 4, 8):
+        if f <= limit:
+            factor = f
+    return factor
+
+
+def decode_image(path: Optional[str], content=None, mode: str = MODE_COLOR, factor: int = 1) -> Optional[np.ndarray]:
+    """Decode from in-memory bytes when available, otherwise from disk."""
+    if mode == MODE_GRAY16 and factor > 1:
+        image = decode_image(path, content, mode)
+        return reduce_image(image, factor) if image is not None else None
+    flag = _FLAGS[(mode, factor)]
+    if content:
+        return cv2.imdecode(np.frombuffer(content, np.uint8), flag)
+    if path:
+        return cv2.imread(path, flag)
+    return None
+
+
+def map_file(path: str) -> Optional[mmap.mmap]:
+    """Read-only memory map of the whole file, or None when it cannot be mapped (empty, special file...)."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def reduce_image(image: np.ndarray, factor: int) -> np.ndarray:
+    """Downscale an already decoded array by `factor` (same output size as the codec's reduced modes)."""
+    if factor == 1:
+        return image
+    h, w = image.shape[:2]
+    return cv2.resize(image, ((w + factor - 1) // factor, (h + factor - 1) // factor), interpolation=cv2.INTER_AREA)
+
+
+class ImageSource:
+    """Per-run, lazily decoded view of one input image.
+
+    Decoded arrays are cached by (mode, factor). When a color decode at the
+    requested factor already exists, grayscale is derived with `cvtColor`
+    instead of decoding the file a second time.
+
+    A source can also wrap an already decoded BGR array (`image=`), e.g. one
+    frame of a multi-page file; other modes/factors are derived from it and
+    `encoded_content()` provides PNG bytes for analyzers that only take bytes.
+
+    With `mapped=True` a file source is memory-mapped on first use (`buffer()`)
+    and decoded from the mapping; `release()` unmaps it.
+
+    A source restricted to a region of interest (see `services.region`) wraps the
+    cropped array and records `region` (x, y, width, height in the full image) and
+    an optional binary `mask` of the crop, available at every factor via `mask_at`.
+
+    `get` is safe to call from several threads (analyzers running in parallel).
+    """
+
+    def __init__(self, path: Optional[str], content=None, image: Optional[np.ndarray] = None,
+                 mapped: bool = False, mask: Optional[np.ndarray] = None,
+                 region: Optional[Tuple[int, int, int, int]] = None):
+        self.path = path
+        self.content = content
+        self.image = image
+        self.mapped = mapped and path is not None and content is None and image is None
+        self._mapping: Optional[mmap.mmap] = None
+        self._encoded = None
+        self._cache: Dict[Tuple[str, int], Optional[np.ndarray]] = {}
+        self._size: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()
+        self.mask = mask
+        self.region = region
+        self._masks: Dict[int, np.ndarray] = {}
+
+    def get(self, mode: str = MODE_COLOR, factor: int = 1) -> Optional[np.ndarray]:
+        key = (mode, factor)
+        if self.image is not None and key == (MODE_COLOR, 1):
+            return self.image
+        if key in self._cache:
+            REGISTRY.inc(DECODE_CACHE_HITS, mode=mode, factor=factor)
+            return self._cache[key]
+        with self._lock:
+            if key in self._cache:
+                REGISTRY.inc(DECODE_CACHE_HITS, mode=mode, factor=factor)
+                return self._cache[key]
+            return self._decode(key)
+
+    def _decode(self, key: Tuple[str, int]) -> Optional[np.ndarray]:
+        mode, factor = key
+        REGISTRY.inc(DECODE_CACHE_MISSES, mode=mode, factor=factor)
+        start = now()
+        color = self._cache.get((MODE_COLOR, factor))
+        with span("decodificacao", mode=mode, factor=factor) as current:
+            if self.image is not None and factor > 1:
+                image, source = reduce_image(self.get(mode, 1), factor), "resize"
+            elif mode == MODE_GRAY and (color is not None or self.image is not None):
+                image, source = cv2.cvtColor(color if color is not None else self.image, cv2.COLOR_BGR2GRAY), "convert"
+            elif mode == MODE_GRAY16 and self.image is not None:
+                # Wrapped arrays (frames, regions) keep the depth they were decoded with
+                image = self.image if self.image.ndim == 2 else cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+                source = "convert"
+            else:
+                image, source = decode_image(self.path, self.buffer(), mode, factor), "codec"
+            current.set(source=source)
+        REGISTRY.observe(DECODE_LATENCY, now() - start, mode=mode, factor=factor, source=source)
+        self._cache[key] = image
+        return image
+
+    def buffer(self):
+        """Raw file bytes without copying: the given content, or the shared read-only map of the file.
+
+        None when the source is not mapped (or mapping failed); callers then read the path themselves.
+        """
+        if self.content is not None or not self.mapped:
+            return self.content
+        if self._mapping is None:
+            with self._lock:
+                if self._mapping is None:
+                    self._mapping = map_file(self.path)
+                    if self._mapping is None:
+                        self.mapped = False
+        return self._mapping
+
+    def mask_at(self, factor: int = 1) -> Optional[np.ndarray]:
+        """The mask (uint8, 255 inside) at the size of the images decoded at `factor`, or None without a mask."""
+        if self.mask is None or factor == 1:
+            return self.mask
+        with self._lock:
+            if factor not in self._masks:
+                h, w = self.mask.shape
+                size = ((w + factor - 1) // factor, (h + factor - 1) // factor)
+                self._masks[factor] = cv2.resize(self.mask, size, interpolation=cv2.INTER_NEAREST)
+            return self._masks[factor]
+
+    def size(self) -> Optional[Tuple[int, int]]:
+        """(height, width) at full resolution without decoding pixels (header only), or None if unreadable."""
+        if self._size is None:
+            if self.image is not None:
+                self._size = self.image.shape[:2]
+            else:
+                try:
+                    with Image.open(io.BytesIO(self.content) if self.content else self.path) as im:
+                        self._size = (im.height, im.width)
+                except Exception:
+                    return None
+        return self._size
+
+    def megapixels(self, factor: int = 1) -> Optional[float]:
+        """Pixels (in millions) of the image decoded at `factor`."""
+        size = self.size()
+        if size is None:
+            return None
+        h, w = size
+        return ((h + factor - 1) // factor) * ((w + factor - 1) // factor) / 1e6
+
+    def encoded_content(self):
+        """Raw bytes for legacy analyzers: the given content, or a PNG of the wrapped array."""
+        if self.content is not None or self.image is None:
+            return self.content
+        if self._encoded is None:
+            ok, buffer = cv2.imencode(".png", self.image)
+            self._encoded = buffer.tobytes() if ok else None
+        return self._encoded
+
+    def release(self) -> None:
+        self._cache.clear()
+        self._masks.clear()
+        self._encoded = None
+        self.image = None
+        mapping, self._mapping = self._mapping, None
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                pass  # an analyzer still holds a view; the map is freed with it
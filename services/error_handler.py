@@ -25,6 +25,9 @@ def format_exception(e: Exception) -> Dict[str, str]:
     elif isinstance(e, PermissionError):
         suggestion = "Permissão negada. Execute com permissões adequadas ou altere as permissões do arquivo."
         can_retry = "no"
+    elif isinstance(e, ValueError):
+        suggestion = "Parâmetros inválidos. Revise os módulos/perfis solicitados e tente novamente."
+        can_retry = "yes"
     else:
         # For unknown errors we suggest retry and contacting support if persists
         suggestion = "Ocorreu um erro inesperado. Tente novamente; se ocorrer novamente, verifique os logs."
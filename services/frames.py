@@ -0,0 +1,52 @@
+"""Lazy frame access for multi-frame inputs (animated GIF, multi-page TIFF).
+
+`cv2.imdecode` only returns the first frame, and `cv2.imreadmulti` decodes
+every page up front. Pillow seeks page by page, so frames are produced one at
+a time and only the current frame is kept in memory.
+"""
+import io
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+MULTIFRAME_EXTENSIONS = {"gif", "tif", "tiff"}
+
+
+def is_multiframe_candidate(path: str) -> bool:
+    return "." in path and path.rsplit(".", 1)[1].lower() in MULTIFRAME_EXTENSIONS
+
+
+def count_frames(path: str) -> int:
+    """Number of frames/pages in the file (1 for single-frame or unreadable files)."""
+    if not is_multiframe_candidate(path):
+        return 1
+    try:
+        with Image.open(path) as im:
+            return int(getattr(im, "n_frames", 1))
+    except Exception:
+        return 1
+
+
+def frame_to_bgr(im: Image.Image) -> np.ndarray:
+    """Convert the current Pillow frame to an 8-bit BGR array (OpenCV layout)."""
+    if im.mode.startswith("I;16") or im.mode == "I":
+        # 16/32-bit grayscale pages (microscopy): keep the most significant byte of the range
+        # actually used. Pillow stores 16-bit PNG/TIFF content in mode "I" (int32), so a 32-bit
+        # container whose values fit in 16 bits is shifted like 16-bit data.
+        data = np.clip(np.asarray(im).astype(np.int64), 0, None)
+        shift = 23 if im.mode == "I" and data.max(initial=0) > 0xFFFF else 8
+        gray = np.clip(data >> shift, 0, 255).astype(np.uint8)
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    rgb = np.asarray(im.convert("RGB"))
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def iter_frames(path: str, content: Optional[bytes] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield (index, BGR frame) pairs, decoding one frame at a time (from `content` when given)."""
+    with Image.open(io.BytesIO(content) if content is not None else path) as im:
+        total = int(getattr(im, "n_frames", 1))
+        for index in range(total):
+            im.seek(index)
+            yield index, frame_to_bgr(im)
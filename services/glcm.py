@@ -0,0 +1,41 @@
+"""Weight tables for GLCM (co-occurrence) features, cached per gray-level count.
+
+Lives outside `analisadores/` on purpose: the engine reloads every analyzer
+module when it discovers analyzers (once per `MotorDeAnalise`, i.e. per
+request), which would throw away a cache kept there.
+"""
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+
+class GLCMWeights(NamedTuple):
+    """Flattened (levels²) feature weights for levels x levels matrices; arrays are read-only."""
+    indices: np.ndarray       # 0..levels-1
+    weights: np.ndarray       # (levels², 3): (i-j)², |i-j| and 1/(1+(i-j)²)
+    sum_order: np.ndarray     # cells sorted by i+j ...
+    sum_starts: np.ndarray    # ... and where each value of i+j starts (for np.add.reduceat)
+    diff_order: np.ndarray    # the same for |i-j|
+    diff_starts: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def glcm_weights(levels: int) -> GLCMWeights:
+    """Build the tables once per number of gray levels."""
+    i, j = (m.ravel() for m in np.indices((levels, levels)))
+    square = ((i - j) ** 2).astype(np.float64)
+    absolute = np.abs(i - j)
+    sum_order = np.argsort(i + j, kind="stable")
+    diff_order = np.argsort(absolute, kind="stable")
+    tables = GLCMWeights(
+        indices=np.arange(levels, dtype=np.float64),
+        weights=np.column_stack([square, absolute.astype(np.float64), 1.0 / (1.0 + square)]),
+        sum_order=sum_order,
+        sum_starts=np.searchsorted((i + j)[sum_order], np.arange(2 * levels - 1)),
+        diff_order=diff_order,
+        diff_starts=np.searchsorted(absolute[diff_order], np.arange(levels)),
+    )
+    for array in tables:
+        array.flags.writeable = False
+    return tables
@@ -0,0 +1,172 @@
+"""Persistent history of analyses in a local SQLite database.
+
+Each analysis is stored once with the content hash of the input (SHA-256 of
+the file bytes), the time it ran, the versions of the analyzers that produced
+it and the serialized report. Every numeric scalar metric of the report also
+goes to an indexed ``metricas`` table (module, metric, value), so past
+reports can be fetched by hash or filtered by ranges (``contraste > 50``)
+without analyzing anything again.
+
+Writes are buffered: `record` queues a row and the buffer is written in a
+single transaction (`executemany`) every `batch_size` records or on `flush`,
+which keeps batch runs from paying one commit per image.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from models.encoding import dumps
+from models.report import ConsolidatedReport
+from services.columnar import scalar_metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analises (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    arquivo TEXT,
+    criado_em REAL NOT NULL,
+    versoes TEXT NOT NULL,
+    relatorio TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analises_hash ON analises (hash, criado_em);
+CREATE TABLE IF NOT EXISTS metricas (
+    analise_id INTEGER NOT NULL REFERENCES analises (id) ON DELETE CASCADE,
+    modulo TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    valor REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_metricas_valor ON metricas (metrica, valor);
+CREATE INDEX IF NOT EXISTS idx_metricas_analise ON metricas (analise_id);
+"""
+
+OPERATORS = ("<=", ">=", "==", "!=", "<", ">")
+_SQL_OPERATORS = {"==": "=", "!=": "<>"}
+# "metrica>50", "GLCM: Análise de Textura/contraste <= 0.5"
+_FILTER = re.compile(r"^\s*(.+?)\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*$")
+
+DEFAULT_LIMIT = 100
+
+Condition = Tuple[str, str, float]
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 (hex) of the file bytes, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_filter(text: str) -> Condition:
+    """``"[modulo/]metrica <op> valor"`` -> (column, op, value); raises ValueError when malformed."""
+    match = _FILTER.match(text)
+    if not match:
+        raise ValueError(f"Filtro inválido: {text!r} (use metrica<op>valor, com op em {' '.join(OPERATORS)})")
+    column, op, value = match.groups()
+    return column, op, float(value)
+
+
+class AnalysisHistory:
+    def __init__(self, path: str, batch_size: int = 1):
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: List[Tuple[str, Optional[str], float, Dict[str, str], Any]] = []
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA foreign_keys=ON")
+            self._connection.executescript(_SCHEMA)
+
+    # --- writing -------------------------------------------------------------------
+
+    def record(self, hash_: str, report: Union[ConsolidatedReport, Dict[str, Any]],
+               versions: Optional[Dict[str, str]] = None, filename: Optional[str] = None,
+               timestamp: Optional[float] = None) -> None:
+        """Queue one analysis; written once `batch_size` analyses are pending (or on `flush`)."""
+        entry = (hash_, filename, time.time() if timestamp is None else timestamp, dict(versions or {}), report)
+        with self._lock:
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self._write()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self._connection:
+            for hash_, filename, timestamp, versions, report in pending:
+                if isinstance(report, ConsolidatedReport):
+                    report = report.to_dict()
+                cursor = self._connection.execute(
+                    "INSERT INTO analises (hash, arquivo, criado_em, versoes, relatorio) VALUES (?, ?, ?, ?, ?)",
+                    (hash_, filename, timestamp, json.dumps(versions, ensure_ascii=False),
+                     dumps(report, ensure_ascii=False)))
+                rows = [(cursor.lastrowid, *column.rsplit("/", 1), value) for column, value in scalar_metrics(report)]
+                self._connection.executemany(
+                    "INSERT INTO metricas (analise_id, modulo, metrica, valor) VALUES (?, ?, ?, ?)", rows)
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    # --- reading -------------------------------------------------------------------
+
+    @staticmethod
+    def _row(row: sqlite3.Row, with_report: bool) -> Dict[str, Any]:
+        entry = {"id": row["id"], "hash": row["hash"], "arquivo": row["arquivo"],
+                 "criado_em": row["criado_em"], "versoes": json.loads(row["versoes"])}
+        if with_report:
+            entry["report"] = json.loads(row["relatorio"])
+        return entry
+
+    def get(self, hash_: str, versions: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """Most recent analysis of this content (with `versions`, only one made by those analyzer versions)."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM analises WHERE hash = ? ORDER BY criado_em DESC", (hash_,)).fetchall()
+        for row in rows:
+            if versions is None or all(json.loads(row["versoes"]).get(k) == v for k, v in versions.items()):
+                return self._row(row, with_report=True)
+        return None
+
+    def query(self, conditions: Iterable[Condition], limit: int = DEFAULT_LIMIT,
+              with_report: bool = False) -> List[Dict[str, Any]]:
+        """Analyses matching every (column, op, value), newest first.
+
+        A column is ``"modulo/metrica"`` or just ``"metrica"`` (any module that reports it).
+        Each condition is answered from the (metrica, valor) index.
+        """
+        clauses, params = [], []
+        for column, op, value in conditions:
+            if op not in OPERATORS:
+                raise ValueError(f"Operador desconhecido: {op} (use {', '.join(OPERATORS)})")
+            module, _, metric = column.rpartition("/")
+            sql = f"SELECT analise_id FROM metricas WHERE metrica = ? AND valor {_SQL_OPERATORS.get(op, op)} ?"
+            params += [metric, value]
+            if module:
+                sql += " AND modulo = ?"
+                params.append(module)
+            clauses.append(f"id IN ({sql})")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT * FROM analises {where} ORDER BY criado_em DESC, id DESC LIMIT ?",
+                (*params, limit)).fetchall()
+        return [self._row(row, with_report) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM analises").fetchone()[0]
@@ -0,0 +1,214 @@
+"""Named intermediate products shared between analyzers within one run.
+
+Analyzers declare the products they need (`AnalisadorBase.insumos`) by name:
+
+    gray                       grayscale decode of the input (root)
+    color                      BGR decode of the input (root)
+    binary@127                 fixed threshold of its input
+    canny@50,150               Canny edges of its input
+    blur@5 / blur@5,1.4 / blur5  Gaussian blur (kernel, optional sigma)
+
+A name is a chain of steps read right to left: ``canny@50,150:binary@127``
+is Canny applied to the binary image, which is the threshold of ``gray``
+(the implicit root). Each chain suffix is itself a product, so the names
+form a DAG. `IntermediateGraph` computes every product at most once per
+(product, factor) and frees it as soon as its last consumer, analyzer or
+dependent product, has released it.
+
+`compute()` evaluates the same producers without caching; analyzers use it
+as a fallback when they are called outside the engine.
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from services.decoding import MODE_COLOR, MODE_GRAY, ImageSource
+from services.tracing import span
+
+ROOTS = {"gray": MODE_GRAY, "color": MODE_COLOR}
+DEFAULT_ROOT = "gray"
+
+
+def _gray(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def _binary(image: np.ndarray, threshold: float = 127) -> np.ndarray:
+    return cv2.threshold(_gray(image), threshold, 255, cv2.THRESH_BINARY)[1]
+
+
+def _canny(image: np.ndarray, low: float = 50, high: float = 150) -> np.ndarray:
+    return cv2.Canny(_gray(image), low, high)
+
+
+def _blur(image: np.ndarray, kernel: float = 5, sigma: float = 0) -> np.ndarray:
+    k = int(kernel)
+    return cv2.GaussianBlur(image, (k, k), sigma)
+
+
+# op -> producer(input_image, *params). Add entries with `register_producer`.
+PRODUCERS: Dict[str, Callable[..., np.ndarray]] = {
+    "binary": _binary,
+    "canny": _canny,
+    "blur": _blur,
+}
+
+_STEP = re.compile(r"^([a-z_]+?)(?:@(.*)|(\d+))?$")
+
+
+def register_producer(op: str, fn: Callable[..., np.ndarray]) -> None:
+    """Make `op@params` available as a product; `fn(input_image, *params)` must not modify its input."""
+    PRODUCERS[op] = fn
+
+
+def _parse_step(step: str) -> Tuple[str, Tuple[float, ...]]:
+    match = _STEP.match(step.strip())
+    if not match:
+        raise ValueError(f"Insumo inválido: {step!r}")
+    op, params, shorthand = match.groups()
+    if op in ROOTS:
+        if params or shorthand:
+            raise ValueError(f"Insumo raiz não aceita parâmetros: {step!r}")
+        return op, ()
+    if op not in PRODUCERS:
+        raise ValueError(f"Insumo desconhecido: {op!r} (use {', '.join(sorted(set(ROOTS) | set(PRODUCERS)))})")
+    raw = shorthand if shorthand is not None else params
+    try:
+        values = tuple(float(v) for v in raw.split(",")) if raw else ()
+    except ValueError:
+        raise ValueError(f"Parâmetros inválidos em {step!r}")
+    return op, values
+
+
+def _format_step(op: str, params: Tuple[float, ...]) -> str:
+    return op + ("@" + ",".join(f"{p:g}" for p in params) if params else "")
+
+
+@lru_cache(maxsize=None)
+def canonical(name: str) -> str:
+    """Normalized product name (``blur5`` -> ``blur@5:gray``), used as the cache key."""
+    steps = [_format_step(*_parse_step(s)) for s in name.split(":")]
+    if steps[-1] not in ROOTS:
+        steps.append(DEFAULT_ROOT)
+    if any(s in ROOTS for s in steps[:-1]):
+        raise ValueError(f"Insumo raiz só pode aparecer no fim da cadeia: {name!r}")
+    return ":".join(steps)
+
+
+def dependency(name: str) -> Optional[str]:
+    """Canonical product this one is computed from (None for roots)."""
+    _, _, rest = canonical(name).partition(":")
+    return rest or None
+
+
+def _apply(name: str, image: np.ndarray) -> np.ndarray:
+    op, params = _parse_step(name.split(":", 1)[0])
+    return PRODUCERS[op](image, *params)
+
+
+def compute(names: Iterable[str], image: np.ndarray) -> Dict[str, np.ndarray]:
+    """Evaluate products from an already decoded image, without the engine (no sharing across analyzers).
+
+    Roots are taken from `image` (``gray`` converts BGR when needed).
+    """
+    memo: Dict[str, np.ndarray] = {}
+
+    def get(product: str) -> np.ndarray:
+        if product not in memo:
+            parent = dependency(product)
+            if parent is None:
+                memo[product] = _gray(image) if product == "gray" else image
+            else:
+                memo[product] = _apply(product, get(parent))
+        return memo[product]
+
+    return {name: get(canonical(name)) for name in names}
+
+
+class IntermediateGraph:
+    """Per-run cache of intermediate products with reference counting.
+
+    `plan` registers every consumer up front (so reference counts are known before
+    anything is computed); `acquire` returns the arrays for one consumer and `release`
+    drops its references. A product's own inputs are released as soon as it exists.
+    Thread-safe: a product requested concurrently is still computed only once.
+    """
+
+    def __init__(self, source: ImageSource):
+        self.source = source
+        self._refs: Dict[Tuple[str, int], int] = {}
+        self._values: Dict[Tuple[str, int], Optional[np.ndarray]] = {}
+        self.computed = 0
+        self._lock = threading.RLock()
+
+    def plan(self, consumers: Iterable[Tuple[Sequence[str], int]]) -> "IntermediateGraph":
+        """Register consumers as (product names, factor); each product's chain is counted once per consumer."""
+        for names, factor in consumers:
+            for name in {canonical(n) for n in names}:
+                self._add_node((name, factor))
+                self._refs[(name, factor)] += 1
+        return self
+
+    def _add_node(self, key: Tuple[str, int]) -> None:
+        # A node holds exactly one reference on its input, taken when the node is first added
+        name, factor = key
+        if key in self._refs:
+            return
+        self._refs[key] = 0
+        parent = dependency(name)
+        if parent is not None:
+            self._add_node((parent, factor))
+            self._refs[(parent, factor)] += 1
+
+    def _get(self, key: Tuple[str, int]) -> Optional[np.ndarray]:
+        if key in self._values:
+            return self._values[key]
+        name, factor = key
+        parent = dependency(name)
+        if parent is None:
+            value = self.source.get(ROOTS[name], factor)
+        else:
+            base = self._get((parent, factor))
+            with span("insumo", produto=name, fator=factor):
+                value = None if base is None else _apply(name, base)
+            self.computed += 1
+            self._drop((parent, factor))
+        self._values[key] = value
+        return value
+
+    def acquire(self, names: Sequence[str], factor: int) -> Dict[str, Optional[np.ndarray]]:
+        """Products for one consumer, keyed by the names it declared."""
+        with self._lock:
+            return {name: self._get((canonical(name), factor)) for name in names}
+
+    def release(self, names: Sequence[str], factor: int) -> None:
+        with self._lock:
+            for name in {canonical(n) for n in names}:
+                self._drop((name, factor))
+
+    def _drop(self, key: Tuple[str, int]) -> None:
+        if key not in self._refs:
+            return
+        self._refs[key] -= 1
+        if self._refs[key] <= 0:
+            del self._refs[key]
+            if key in self._values:
+                del self._values[key]
+            else:
+                # Never computed: the reference on its input was never handed back
+                parent = dependency(key[0])
+                if parent is not None:
+                    self._drop((parent, key[1]))
+
+    @property
+    def alive(self) -> List[Tuple[str, int]]:
+        """Products currently held in memory (for diagnostics/tests)."""
+        return list(self._values)
+
+    def clear(self) -> None:
+        self._refs.clear()
+        self._values.clear()
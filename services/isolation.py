@@ -0,0 +1,188 @@
+"""Time budgets, run deadlines and cancellation for analyzer calls.
+
+A Python thread cannot be stopped from outside, so an analyzer that must be
+interruptible runs in a child process (`run_isolated`); when its budget runs
+out or the run is cancelled the child is terminated and the engine reports the
+analyzer as TIMEOUT/CANCELADO while the rest of the report is still produced.
+
+Only analyzers with a budget of their own (or the run's `tempo_limite`) and
+runs with a cancel flag are isolated; a bare run deadline is checked before
+each analyzer starts and does not pay for a child process.
+
+The engine is multithreaded (thread pool, logging, metrics and image source
+locks), so children are never forked from it: the start method defaults to
+``forkserver`` on POSIX, whose server is started clean and preloads the engine
+so each child starts quickly, and ``spawn`` elsewhere; set
+``ISOLATION_START_METHOD`` to override it. Analyzers reach the child as a
+picklable (module, class, attributes) reference.
+
+`process_pool` keeps one warm process pool per worker count for the
+``modo_paralelo="processos"`` engine mode, where analyzers run in worker
+processes and receive their inputs through `services.shm`.
+"""
+import atexit
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from services.metrics import now
+
+START_METHOD = os.environ.get("ISOLATION_START_METHOD") or (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+PRELOAD = ["gerenciador"]  # imported once by the fork server instead of by every child
+POLL_INTERVAL = 0.05
+
+STATUS_TIMEOUT = "TIMEOUT"
+STATUS_CANCELLED = "CANCELADO"
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+class AnalyzerTimeout(Exception):
+    status = STATUS_TIMEOUT
+
+
+class AnalyzerCancelled(Exception):
+    status = STATUS_CANCELLED
+
+
+class RunLimits:
+    """Limits of one pipeline run: default per-analyzer budget, absolute deadline and cancel flag.
+
+    `timeout` and `deadline` are in seconds; the deadline is relative to `start()`.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, deadline: Optional[float] = None,
+                 cancel: Optional[threading.Event] = None):
+        for name, value in (("tempo_limite", timeout), ("prazo", deadline)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} deve ser positivo (segundos).")
+        self.timeout = timeout
+        self.deadline_s = deadline
+        self.cancel = cancel
+        self.deadline_at: Optional[float] = None
+
+    def start(self) -> "RunLimits":
+        if self.deadline_s is not None and self.deadline_at is None:
+            self.deadline_at = now() + self.deadline_s
+        return self
+
+    @property
+    def active(self) -> bool:
+        return self.timeout is not None or self.deadline_s is not None or self.cancel is not None
+
+    def cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.is_set()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline_at is None else self.deadline_at - now()
+
+    def check(self) -> None:
+        """Raise if the run was cancelled or its deadline has passed."""
+        if self.cancelled():
+            raise AnalyzerCancelled("Execução cancelada.")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise AnalyzerTimeout(f"Prazo da execução ({self.deadline_s:g}s) esgotado.")
+
+    def interrupts(self, analyzer_timeout: Optional[float] = None) -> bool:
+        """Whether the analyzer must run isolated: it has a budget (own or default) or the run can be cancelled."""
+        return analyzer_timeout is not None or self.timeout is not None or self.cancel is not None
+
+    def budget(self, analyzer_timeout: Optional[float] = None) -> Optional[float]:
+        """Seconds the next analyzer may run: its own/default budget capped by what is left of the deadline."""
+        budget = analyzer_timeout if analyzer_timeout is not None else self.timeout
+        remaining = self.remaining()
+        if remaining is not None:
+            budget = remaining if budget is None else min(budget, remaining)
+        return budget
+
+
+def _worker(conn, fn, args, kwargs) -> None:
+    try:
+        result = (True, fn(*args, **kwargs))
+    except BaseException as e:  # noqa: B902 - everything must reach the parent
+        result = (False, e)
+    try:
+        conn.send(result)
+    except Exception as e:
+        # Unpicklable result/exception: report it as an error instead of dying silently
+        conn.send((False, RuntimeError(f"Resultado não serializável: {e}")))
+    finally:
+        conn.close()
+
+
+def _context():
+    ctx = multiprocessing.get_context(START_METHOD)
+    if START_METHOD == "forkserver":
+        ctx.set_forkserver_preload(PRELOAD)
+    return ctx
+
+
+def run_isolated(fn: Callable, args=(), kwargs=None, timeout: Optional[float] = None,
+                 cancel: Optional[threading.Event] = None) -> Any:
+    """Call `fn(*args, **kwargs)` in a child process, terminating it on timeout or cancellation.
+
+    `fn` and the arguments are pickled (see the start method above).
+    """
+    ctx = _context()
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_worker, args=(sender, fn, args, kwargs or {}), daemon=True)
+    process.start()
+    sender.close()
+    limit = now() + timeout if timeout is not None else None
+    try:
+        while True:
+            wait = POLL_INTERVAL if cancel is not None else None
+            if limit is not None:
+                remaining = limit - now()
+                if remaining <= 0:
+                    raise AnalyzerTimeout(f"Tempo limite de {timeout:g}s excedido.")
+                wait = remaining if wait is None else min(wait, remaining)
+            if receiver.poll(wait):
+                try:
+                    ok, value = receiver.recv()
+                except EOFError:
+                    process.join()
+                    raise RuntimeError(f"Processo do analisador terminou sem resultado (código {process.exitcode}).")
+                break
+            if cancel is not None and cancel.is_set():
+                raise AnalyzerCancelled("Execução cancelada.")
+    finally:
+        if process.is_alive():
+            process.terminate()
+            process.join(1)
+            if process.is_alive():
+                process.kill()
+        process.join()
+        receiver.close()
+    if ok:
+        return value
+    raise value
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared pool of `workers` processes, created on first use and kept until exit.
+
+    A pool broken by a crashed worker is replaced on the next call.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None or getattr(pool, "_broken", False):
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=_context())
+            _pools[workers] = pool
+        return pool
+
+
+@atexit.register
+def shutdown_pools() -> None:
+    # cancel_futures only exists from Python 3.9 on
+    options = {"cancel_futures": True} if sys.version_info >= (3, 9) else {}
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, **options)
+        _pools.clear()
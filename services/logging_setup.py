@@ -0,0 +1,58 @@
+"""Logging configuration for the engine, analyzers and web app.
+
+Modules log through `logging.getLogger(__name__)`; nothing is printed. The
+level defaults to WARNING so production runs stay quiet, and is raised with
+the ``LOG_LEVEL`` environment variable (e.g. ``INFO`` for the per-run summary,
+``DEBUG`` for per-analyzer values). ``LOG_FORMAT=json`` emits one JSON object
+per line including the current trace/span ids and any ``extra=`` fields.
+"""
+import json
+import logging
+import os
+from typing import Optional
+
+from services.tracing import current_ids
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamp records with the trace/span id of the running span (if tracing is on)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in current_ids().items():
+            setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        out.update({k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS})
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """Install a single stderr handler on the root logger (idempotent)."""
+    level = (level or os.environ.get("LOG_LEVEL") or "WARNING").upper()
+    fmt = (fmt or os.environ.get("LOG_FORMAT") or "text").lower()
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceContextFilter())
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if getattr(h, "_eng_comp", False)]:
+        root.removeHandler(existing)
+    handler._eng_comp = True
+    root.addHandler(handler)
+    root.setLevel(level)
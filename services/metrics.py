@@ -0,0 +1,160 @@
+"""In-process instrumentation: counters and latency summaries per analyzer.
+
+Every duration is measured with `now()` (`time.perf_counter`, monotonic and
+high resolution). Latencies keep a sliding window of the most recent samples
+for p50/p95/p99 plus an all-time count and sum. `REGISTRY.render()` produces
+the Prometheus text exposition format served by ``GET /metrics``.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Tuple
+
+now = time.perf_counter
+
+QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_WINDOW = 1024
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Metric families: name -> (type, help)
+ANALYZER_LATENCY = "analyzer_latency_seconds"
+ANALYZER_QUEUE_WAIT = "analyzer_queue_wait_seconds"
+ANALYZER_CALLS = "analyzer_calls_total"
+ANALYZER_ERRORS = "analyzer_errors_total"
+ANALYZER_INPUT_BYTES = "analyzer_input_bytes_total"
+DECODE_LATENCY = "decode_seconds"
+DECODE_CACHE_HITS = "decode_cache_hits_total"
+DECODE_CACHE_MISSES = "decode_cache_misses_total"
+PIPELINE_LATENCY = "pipeline_latency_seconds"
+PIPELINE_RUNS = "pipeline_runs_total"
+PIPELINE_INPUT_BYTES = "pipeline_input_bytes_total"
+VIDEO_FRAMES = "video_frames_total"
+DUPLICATE_LOOKUPS = "duplicate_lookups_total"
+HTTP_REQUEST_BYTES = "http_request_bytes_total"
+HTTP_RESPONSE_BYTES = "http_response_bytes_total"
+
+FAMILIES = {
+    ANALYZER_LATENCY: ("summary", "Wall time of one analyzer call."),
+    ANALYZER_QUEUE_WAIT: ("summary", "Time from the start of a run until the analyzer started."),
+    ANALYZER_CALLS: ("counter", "Analyzer calls by final status (OK, ERRO, IGNORADO)."),
+    ANALYZER_ERRORS: ("counter", "Analyzer calls that raised."),
+    ANALYZER_INPUT_BYTES: ("counter", "Bytes handed to analyzers (decoded array or encoded content)."),
+    DECODE_LATENCY: ("summary", "Time to decode or derive one image representation."),
+    DECODE_CACHE_HITS: ("counter", "Image representations served from the per-run decode cache."),
+    DECODE_CACHE_MISSES: ("counter", "Image representations that had to be decoded or derived."),
+    PIPELINE_LATENCY: ("summary", "Wall time of a whole pipeline run."),
+    PIPELINE_RUNS: ("counter", "Pipeline runs."),
+    PIPELINE_INPUT_BYTES: ("counter", "Size of the input files read by pipeline runs."),
+    VIDEO_FRAMES: ("counter", "Video frames seen, by reuse reason (digest, diferenca) or none when analyzed."),
+    DUPLICATE_LOOKUPS: ("counter", "Perceptual-hash duplicate lookups by result (hit, miss)."),
+    HTTP_REQUEST_BYTES: ("counter", "Request body bytes received per endpoint."),
+    HTTP_RESPONSE_BYTES: ("counter", "Response body bytes sent per endpoint (non-streamed responses)."),
+}
+
+
+class Summary:
+    """All-time count/sum plus a sliding window of recent samples for quantiles."""
+
+    __slots__ = ("count", "total", "window")
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.window.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.window:
+            return float("nan")
+        ordered = sorted(self.window)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters and summaries."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._summaries: Dict[Tuple[str, Labels], Summary] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary(self.window)
+            summary.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def snapshot(self) -> Dict[str, Dict[Labels, dict]]:
+        """Plain-dict view: counters as values, summaries as {count, sum, p50, p95, p99}."""
+        out: Dict[str, Dict[Labels, object]] = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                out.setdefault(name, {})[labels] = value
+            for (name, labels), summary in self._summaries.items():
+                entry = {"count": summary.count, "sum": summary.total}
+                entry.update({f"p{int(q * 100)}": summary.quantile(q) for q in QUANTILES})
+                out.setdefault(name, {})[labels] = entry
+        return out
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            names = sorted({n for n, _ in self._counters} | {n for n, _ in self._summaries})
+            for name in names:
+                kind, help_text = FAMILIES.get(name, ("untyped", ""))
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                for (n, labels), summary in sorted(self._summaries.items(), key=lambda item: item[0]):
+                    if n != name:
+                        continue
+                    for q in QUANTILES:
+                        lines.append(f"{name}{_format_labels(labels + (('quantile', str(q)),))} "
+                                     f"{_format_value(summary.quantile(q))}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(summary.total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {summary.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,137 @@
+"""Perceptual hashes and a near-duplicate index in front of the pipeline.
+
+Re-encoded, resized or lightly recompressed copies of an image have different
+bytes but almost the same 64-bit perceptual hash, computed from a tiny
+grayscale decode (1/8 resolution straight from the codec, see
+`services.decoding`):
+
+- ``"average"``: 8x8 thumbnail, one bit per pixel above the mean;
+- ``"difference"``: 9x8 thumbnail, one bit per horizontal gradient sign;
+- ``"dct"`` (default): low 8x8 frequencies of the DCT of a 32x32 thumbnail,
+  one bit per coefficient above their median (the most robust to resizing
+  and recompression).
+
+`DuplicateIndex` keeps the last `capacity` hashes in a ring buffer and finds
+the closest one within `max_distance` differing bits with one vectorized
+XOR + popcount, so the previous report can be returned without running any
+analyzer (see `MotorDeAnalise.executar_com_duplicatas`).
+"""
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+import cv2
+import numpy as np
+
+from services.decoding import ImageSource, MODE_GRAY
+
+HASH_AVERAGE = "average"
+HASH_DIFFERENCE = "difference"
+HASH_DCT = "dct"
+HASH_METHODS = (HASH_AVERAGE, HASH_DIFFERENCE, HASH_DCT)
+
+DEFAULT_MAX_DISTANCE = 4
+DEFAULT_CAPACITY = 1024  # reports keep their processed images: bound the memory
+
+# Set bits of every byte value (numpy < 2 has no bitwise_count)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def check_method(method: str) -> str:
+    if method not in HASH_METHODS:
+        raise ValueError(f"Hash perceptual desconhecido: {method!r} (use {', '.join(HASH_METHODS)}).")
+    return method
+
+
+def _bits(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def hash_array(gray: np.ndarray, method: str = HASH_DCT) -> int:
+    """64-bit perceptual hash of a grayscale array."""
+    check_method(method)
+    if method == HASH_AVERAGE:
+        small = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA).astype(np.float32)
+        return _bits(small > small.mean())
+    if method == HASH_DIFFERENCE:
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+        return _bits(small[:, 1:] > small[:, :-1])
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    # The DC term only carries the mean brightness: keep it out of the threshold
+    return _bits(low > np.median(low.ravel()[1:]))
+
+
+def perceptual_hash(source: ImageSource, method: str = HASH_DCT) -> Optional[int]:
+    """Hash of an image from its 1/8 grayscale decode (None when it cannot be decoded)."""
+    gray = source.get(MODE_GRAY, 8)
+    return hash_array(gray, method) if gray is not None else None
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+@dataclass(frozen=True)
+class Duplicate:
+    key: str
+    distance: int
+    report: Any
+
+
+class DuplicateIndex:
+    """Bounded (FIFO) index of hashes -> previous reports, searched by Hamming distance.
+
+    Entries are grouped by a `context` (e.g. the analyzer selection and quality):
+    a report is only reused for a request that would have produced the same one.
+    `lookup` and `add` are thread-safe.
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE, method: str = HASH_DCT,
+                 capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.max_distance = max_distance
+        self.method = check_method(method)
+        self.capacity = capacity
+        self._hashes = np.zeros(capacity, dtype=">u8")
+        self._contexts = np.full(capacity, -1, dtype=np.int32)
+        self._entries: list = [None] * capacity
+        self._context_ids: Dict[Hashable, int] = {}
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def hash(self, source: ImageSource) -> Optional[int]:
+        return perceptual_hash(source, self.method)
+
+    def lookup(self, value: int, context: Hashable = None) -> Optional[Duplicate]:
+        """Closest entry of `context` within `max_distance` bits of `value`, or None."""
+        with self._lock:
+            context_id = self._context_ids.get(context)
+            if context_id is None:
+                return None
+            rows = np.flatnonzero(self._contexts == context_id)
+            if not len(rows):
+                return None
+            xor = self._hashes[rows] ^ np.array(value, dtype=">u8")
+            distances = _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+            best = int(np.argmin(distances))
+            if distances[best] > self.max_distance:
+                return None
+            key, report = self._entries[rows[best]]
+            return Duplicate(key, int(distances[best]), report)
+
+    def add(self, value: int, key: str, report: Any, context: Hashable = None) -> None:
+        """Remember `report` under `value`; the oldest entry is dropped once `capacity` is reached."""
+        with self._lock:
+            context_id = self._context_ids.setdefault(context, len(self._context_ids))
+            row = self._next
+            self._hashes[row] = value
+            self._contexts[row] = context_id
+            self._entries[row] = (key, report)
+            self._next = (row + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
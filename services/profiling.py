@@ -0,0 +1,131 @@
+"""Opt-in per-analyzer profiling (cProfile + tracemalloc).
+
+Enabled for a block of work with `profiling()`; the engine then wraps every
+analyzer call in an `AnalyzerProfiler`, attaches `summary()` (top functions by
+cumulative time, peak traced allocation) to the analyzer's `ResultItem.profile`
+and writes the raw `.prof` file (open with `python -m pstats`, snakeviz, ...).
+
+No analyzer code changes are needed, so third-party analyzers dropped into
+`analisadores/` are profiled the same way. Only one profiler can be active per
+process (enforced since Python 3.12), so profiled calls are serialized by a
+module lock: with profiling on, a parallel run executes its analyzers one at a
+time. tracemalloc is process-wide, so the peak also counts allocations made
+meanwhile by other threads (decoding, intermediates). Before Python 3.9 the
+peak cannot be reset and the net growth between two snapshots is reported.
+"""
+import contextvars
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+DEFAULT_PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+DEFAULT_TOP = 15
+
+_sequence = itertools.count()
+_profile_lock = threading.Lock()
+_options: contextvars.ContextVar[Optional["ProfilingOptions"]] = contextvars.ContextVar("profiling", default=None)
+
+
+class ProfilingOptions:
+    def __init__(self, directory: Optional[str] = DEFAULT_PROFILE_DIR, top: int = DEFAULT_TOP):
+        self.directory = directory
+        self.top = top
+
+
+@contextmanager
+def profiling(directory: Optional[str] = DEFAULT_PROFILE_DIR, top: int = DEFAULT_TOP) -> Iterator[ProfilingOptions]:
+    """Profile every analyzer call made inside the block; `directory=None` skips writing `.prof` files."""
+    options = ProfilingOptions(directory, top)
+    token = _options.set(options)
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield options
+    finally:
+        if started:
+            tracemalloc.stop()
+        _options.reset(token)
+
+
+def active_options() -> Optional[ProfilingOptions]:
+    return _options.get()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^0-9A-Za-z]+", "_", name).strip("_")[:60] or "analisador"
+
+
+class AnalyzerProfiler:
+    """Accumulates cProfile stats and the tracemalloc peak over one or more calls of one analyzer."""
+
+    def __init__(self, module: str, options: ProfilingOptions):
+        self.module = module
+        self.options = options
+        self.profile = cProfile.Profile()
+        self.peak_bytes = 0
+        self.calls = 0
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        with _profile_lock:
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+                before = None
+            else:
+                before = tracemalloc.take_snapshot()
+            base, _ = tracemalloc.get_traced_memory()
+            self.profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.profile.disable()
+                self.calls += 1
+                self.peak_bytes = max(self.peak_bytes, self._peak_since(base, before))
+
+    @staticmethod
+    def _peak_since(base: int, before: Optional[tracemalloc.Snapshot]) -> int:
+        if before is None:
+            _, peak = tracemalloc.get_traced_memory()
+            return peak - base
+        # No reset_peak (Python < 3.9): allocations still alive after the call
+        growth = tracemalloc.take_snapshot().compare_to(before, "filename")
+        return sum(stat.size_diff for stat in growth if stat.size_diff > 0)
+
+    def _top_functions(self):
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        top = []
+        for func in stats.fcn_list[:self.options.top]:
+            _, ncalls, tottime, cumtime, _ = stats.stats[func]
+            filename, line, name = func
+            top.append({
+                "function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+                "calls": ncalls,
+                "tottime": round(tottime, 6),
+                "cumtime": round(cumtime, 6),
+            })
+        return top
+
+    def dump(self) -> Optional[str]:
+        if not self.options.directory:
+            return None
+        os.makedirs(self.options.directory, exist_ok=True)
+        path = os.path.join(self.options.directory,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{next(_sequence)}_{_slug(self.module)}.prof")
+        self.profile.dump_stats(path)
+        return path
+
+    def summary(self) -> Dict[str, Any]:
+        out = {"calls": self.calls, "peak_bytes": self.peak_bytes, "top": self._top_functions()}
+        path = self.dump()
+        if path:
+            out["file"] = path
+        return out
@@ -0,0 +1,84 @@
+"""Runs restricted to a region of interest (rectangle) and/or a binary mask.
+
+`region_source` turns the source of a run into one that only holds the
+region: the full image is decoded once, in color, and every representation
+the analyzers ask for (gray, reduced, intermediates) is derived from a copy
+of the crop (the full decode is freed before the analyzers run), so their
+work and memory scale with the area of interest. With a mask the
+crop is its bounding box (intersected with the rectangle, when both are
+given) and analyzers that accept ``mascara`` also receive the cropped mask,
+resized to their decode factor, to restrict what they count.
+"""
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from services.decoding import ImageSource, MODE_COLOR, MODE_GRAY, decode_image
+
+Region = Tuple[int, int, int, int]  # x, y, width, height
+
+
+def parse_roi(text: str) -> Region:
+    """``"x,y,largura,altura"`` -> tuple of ints (ValueError when malformed)."""
+    parts = [p.strip() for p in text.split(",")]
+    if len(parts) != 4:
+        raise ValueError(f"ROI inválida: {text!r} (use x,y,largura,altura)")
+    x, y, w, h = (int(p) for p in parts)
+    return x, y, w, h
+
+
+def read_mask(mask: Union[str, bytes, np.ndarray]) -> np.ndarray:
+    """Binary mask as uint8 (255 inside) from an array, a file path or encoded image bytes."""
+    if isinstance(mask, np.ndarray):
+        array = mask
+    elif isinstance(mask, (bytes, bytearray)):
+        array = decode_image(None, mask, MODE_GRAY)
+    else:
+        array = decode_image(mask, None, MODE_GRAY)
+    if array is None:
+        raise ValueError("Não foi possível ler a máscara.")
+    if array.ndim == 3:
+        array = array.any(axis=2)
+    return np.where(array > 0, 255, 0).astype(np.uint8)
+
+
+def resolve_region(shape: Tuple[int, int], roi: Optional[Region] = None,
+                   mask: Optional[np.ndarray] = None) -> Tuple[Region, Optional[np.ndarray]]:
+    """Clip `roi` to the image, shrink it to the mask's bounding box and crop the mask to it."""
+    height, width = shape
+    x, y, w, h = roi if roi is not None else (0, 0, width, height)
+    if w <= 0 or h <= 0:
+        raise ValueError("A ROI precisa ter largura e altura positivas.")
+    x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, width), min(y + h, height)
+    if mask is not None:
+        if mask.shape != (height, width):
+            raise ValueError(f"Máscara de {mask.shape[1]}x{mask.shape[0]} não corresponde à imagem de "
+                             f"{width}x{height}.")
+        points = cv2.findNonZero(mask[y0:y1, x0:x1]) if x1 > x0 and y1 > y0 else None
+        if points is None:
+            raise ValueError("A máscara não tem pixels dentro da região.")
+        bx, by, bw, bh = cv2.boundingRect(points)
+        x0, y0, x1, y1 = x0 + bx, y0 + by, x0 + bx + bw, y0 + by + bh
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError(f"A ROI ({x},{y},{w},{h}) está fora da imagem de {width}x{height}.")
+    region = (x0, y0, x1 - x0, y1 - y0)
+    return region, (mask[y0:y1, x0:x1] if mask is not None else None)
+
+
+def region_source(source: ImageSource, roi: Optional[Region] = None,
+                  mask: Optional[Union[str, bytes, np.ndarray]] = None) -> ImageSource:
+    """A source holding only the region of `source` (which is released)."""
+    try:
+        image = source.get(MODE_COLOR, 1)
+        if image is None:
+            raise ValueError("Erro ao carregar imagem")
+        region, cropped = resolve_region(image.shape[:2], roi, read_mask(mask) if mask is not None else None)
+    finally:
+        source.release()
+    x, y, w, h = region
+    if (h, w) != image.shape[:2]:
+        # A view would keep the whole decode (and the whole mask) alive for the entire run
+        image = image[y:y + h, x:x + w].copy()
+        cropped = cropped.copy() if cropped is not None else None
+    return ImageSource(source.path, image=image, mask=cropped, region=region)
@@ -0,0 +1,166 @@
+"""Analyzer descriptors, resolved once when a plugin is registered.
+
+Everything the engine needs to know to call an analyzer (calling convention of
+`processar`, declared intermediate products, version, tiling capabilities and
+budgets) is read from the class once and frozen into an `AnalyzerDescriptor`.
+The per-image loop then only dispatches: no `inspect.signature`, no property
+lookups per tile.
+
+`AnalyzerRegistry.discover_classes` also drops the stale classes that
+`importlib.reload` leaves in `__subclasses__()` (same module and qualified name):
+only the class currently bound in its module is kept, so a module never runs twice.
+The engine only reloads analyzer files that changed on disk, so class identity
+stays stable across engines built from unchanged sources.
+"""
+import inspect
+import logging
+import sys
+import typing
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.analysis import AnalysisResult
+from services.intermediates import canonical
+
+logger = logging.getLogger(__name__)
+
+
+def _legacy_result(result: Any) -> AnalysisResult:
+    """Convert what legacy analyzers return (dict, raw value) into an AnalysisResult."""
+    if isinstance(result, AnalysisResult):
+        return result
+    if isinstance(result, dict):
+        return AnalysisResult(detalhe=result.get("detalhe"), extra={k: v for k, v in result.items() if k != "detalhe"})
+    return AnalysisResult(extra={"value": result})
+
+
+def _typed_result(result: Any) -> AnalysisResult:
+    # Annotated `-> AnalysisResult`: trust the annotation, fall back only if it lied
+    return result if result.__class__ is AnalysisResult else _legacy_result(result)
+
+
+def _returns_result(fn: Callable) -> bool:
+    try:
+        return typing.get_type_hints(fn).get("return") is AnalysisResult
+    except Exception:
+        return inspect.signature(fn).return_annotation in (AnalysisResult, "AnalysisResult")
+
+
+@dataclass(frozen=True)
+class AnalyzerDescriptor:
+    name: str
+    qualname: str  # "module.Class"
+    version: str
+    order: int
+    tags: Tuple[str, ...]
+    read_mode: str
+    max_reduction: int
+    timeout: Optional[float]
+    inputs: Tuple[str, ...]
+    passes_content: bool  # processar(path, content, ...) vs processar(path)
+    takes_image: bool
+    takes_inputs: bool
+    takes_mask: bool  # processar(..., mascara=...) restricts itself to the mask of a region run
+    tiled: bool
+    halo: int
+    exact_tiles: bool
+    additive_tiles: bool  # combinar_blocos is the default sum (partials can be subtracted)
+    normalize: Callable[[Any], AnalysisResult] = field(repr=False, compare=False)
+
+    @property
+    def capabilities(self) -> Tuple[str, ...]:
+        caps = []
+        if self.takes_image:
+            caps.append("imagem")
+        if self.passes_content:
+            caps.append("conteudo")
+        if self.takes_inputs and self.inputs:
+            caps.append("insumos")
+        if self.takes_mask:
+            caps.append("mascara")
+        if self.max_reduction > 1:
+            caps.append("reducao")
+        if self.tiled:
+            caps.append("blocos_exatos" if self.exact_tiles else "blocos")
+        if self.tiled and self.exact_tiles:
+            caps.append("incremental")  # video frames only recompute changed tiles
+        return tuple(caps)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "nome": self.name,
+            "classe": self.qualname,
+            "versao": self.version,
+            "ordem": self.order,
+            "tags": list(self.tags),
+            "modo_leitura": self.read_mode,
+            "reducao_maxima": self.max_reduction,
+            "tempo_limite": self.timeout,
+            "insumos": list(self.inputs),
+            "capacidades": list(self.capabilities),
+        }
+
+
+class AnalyzerRegistry:
+    """Descriptors of the analyzers of one engine, keyed by instance.
+
+    Analyzers found by discovery are described up front; instances handed to the
+    engine any other way (tests, embedding code) are described on first use.
+    """
+
+    def __init__(self, base: type):
+        self.base = base
+        self._descriptors: "weakref.WeakKeyDictionary[Any, AnalyzerDescriptor]" = weakref.WeakKeyDictionary()
+
+    def discover_classes(self) -> List[type]:
+        """Concrete subclasses of `base`, without the stale duplicates left by `importlib.reload`."""
+        latest: Dict[Tuple[str, str], type] = {}
+        for cls in self.base.__subclasses__():
+            key = (cls.__module__, cls.__qualname__)
+            previous = latest.get(key)
+            if previous is not None:
+                bound = getattr(sys.modules.get(cls.__module__), cls.__qualname__, None)
+                if bound is previous:
+                    logger.debug("Ignorando classe obsoleta de %s.%s (recarregada)", *key)
+                    continue
+                logger.debug("Substituindo classe obsoleta de %s.%s (recarregada)", *key)
+            latest[key] = cls
+        return list(latest.values())
+
+    def describe(self, analyzer: Any) -> AnalyzerDescriptor:
+        try:
+            return self._descriptors[analyzer]
+        except KeyError:
+            descriptor = self._descriptors[analyzer] = self._build(analyzer)
+            return descriptor
+
+    def _build(self, analyzer: Any) -> AnalyzerDescriptor:
+        cls = type(analyzer)
+        params = inspect.signature(analyzer.processar).parameters
+        positional = [p.name for p in params.values() if p.name != "self" and p.kind in (
+            inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+        inputs = tuple(analyzer.insumos)
+        for name in inputs:
+            canonical(name)  # invalid product names fail at registration, not mid-run
+        tiled = bool(analyzer.suporta_blocos)
+        return AnalyzerDescriptor(
+            name=analyzer.nome_modulo,
+            qualname=f"{cls.__module__}.{cls.__qualname__}",
+            version=str(analyzer.versao),
+            order=analyzer.ordem,
+            tags=tuple(analyzer.tags),
+            read_mode=analyzer.modo_leitura,
+            max_reduction=analyzer.reducao_maxima,
+            timeout=analyzer.tempo_limite,
+            inputs=inputs,
+            passes_content=positional[1:2] == ["conteudo"],  # processar(path, imagem=None) gets no bytes
+            takes_image="imagem" in params,
+            takes_inputs="insumos" in params,
+            takes_mask="mascara" in params,
+            tiled=tiled,
+            halo=analyzer.halo if tiled else 0,
+            exact_tiles=bool(analyzer.blocos_exatos),
+            additive_tiles=cls.combinar_blocos is self.base.combinar_blocos,
+            normalize=_typed_result if _returns_result(analyzer.processar) else _legacy_result,
+        )
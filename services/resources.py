@@ -0,0 +1,189 @@
+"""Process-wide CPU budget shared by OpenCV, BLAS and our own worker pools.
+
+OpenCV (and the BLAS behind NumPy) keep their own thread pools sized to the
+whole machine. Running several analyzers, images or HTTP requests at once on
+top of that oversubscribes the CPU: on a 32-core box, 8 workers x 32 OpenCV
+threads is slower than one worker.
+
+Every unit of concurrent work takes a `lease` on the manager: the engine
+(one worker for a sequential run, N for `trabalhadores=N`), `run_batch`
+(one per image in flight) and, through them, every web request. From the
+number of workers currently active the manager derives the cores each one
+gets and sets the library thread counts to match (`cv2.setNumThreads`,
+threadpoolctl when installed, and the OMP/BLAS environment variables read
+by child processes). With `pin=True` pool threads are also pinned to their
+own slice of CPUs (Linux `sched_setaffinity`).
+
+Configure with `configure_resources()` or the environment:
+``ANALYZER_CORES`` (core budget, default: CPUs this process may use) and
+``PIN_CPUS=1``.
+"""
+import contextvars
+import itertools
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+
+try:  # optional: limits BLAS/OpenMP pools that are already loaded in this process
+    from threadpoolctl import threadpool_limits
+except ImportError:  # pragma: no cover - depends on the environment
+    threadpool_limits = None
+
+logger = logging.getLogger(__name__)
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+
+_lease: contextvars.ContextVar[Optional["Lease"]] = contextvars.ContextVar("resource_lease", default=None)
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (respects affinity masks/cgroup cpusets where the OS exposes them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class Lease:
+    """Cores granted to one pool of `workers`; `initializer` pins each pool thread when pinning is on."""
+
+    def __init__(self, manager: "ResourceManager", workers: int, nested: bool):
+        self.manager = manager
+        self.workers = workers
+        self.nested = nested
+
+    @property
+    def cores_per_worker(self) -> int:
+        return self.manager.cores_per_worker
+
+    def initializer(self) -> None:
+        """`ThreadPoolExecutor(initializer=...)`: pins the calling pool thread to its slice of CPUs."""
+        if self.manager.pin:
+            self.manager.pin_current_thread(self.manager.next_slot())
+
+
+class ResourceManager:
+    def __init__(self, cores: Optional[int] = None, pin: bool = False):
+        self.cpus = available_cpus()
+        self.cores = max(1, min(cores or len(self.cpus), len(self.cpus)))
+        self.pin = pin and hasattr(os, "sched_setaffinity")
+        self.active_workers = 0
+        self._lock = threading.Lock()
+        self._slot = itertools.count()
+        self._opencv_default = cv2.getNumThreads()
+        self._applied: Optional[int] = None
+        self._blas_limiter = None
+
+    # --- leases --------------------------------------------------------------------
+
+    @contextmanager
+    def lease(self, workers: int = 1) -> Iterator[Lease]:
+        """Reserve `workers` concurrent workers for the duration of the block.
+
+        Inside another lease a single worker reuses the caller's slot (nothing changes);
+        a nested pool of N workers adds N-1 workers, since it subdivides the caller's slot.
+        """
+        workers = max(1, int(workers))
+        parent = _lease.get()
+        extra = workers - 1 if parent is not None else workers
+        current = Lease(self, workers, nested=parent is not None)
+        token = _lease.set(current)
+        if extra:
+            self._adjust(extra)
+        try:
+            yield current
+        finally:
+            if extra:
+                self._adjust(-extra)
+            _lease.reset(token)
+
+    def _adjust(self, delta: int) -> None:
+        with self._lock:
+            self.active_workers += delta
+            self._apply_thread_counts(self.cores_per_worker if self.active_workers else None)
+
+    @property
+    def cores_per_worker(self) -> int:
+        return max(1, self.cores // max(1, self.active_workers))
+
+    @property
+    def effective_parallelism(self) -> int:
+        """Cores doing useful work at once: never more than the budget, whatever the worker count."""
+        return min(self.cores, max(1, self.active_workers) * self.cores_per_worker)
+
+    # --- library thread pools ------------------------------------------------------
+
+    def _apply_thread_counts(self, threads: Optional[int]) -> None:
+        """Size OpenCV/BLAS pools for `threads` per worker; None (idle) restores OpenCV's default."""
+        if threads == self._applied:
+            return
+        self._applied = threads
+        cv2.setNumThreads(threads if threads is not None else self._opencv_default)
+        if threads is not None:
+            for name in THREAD_ENV_VARS:
+                os.environ[name] = str(threads)  # read by child processes (spawn) and libraries loaded later
+        if threadpool_limits is not None:
+            if self._blas_limiter is not None:
+                self._blas_limiter.restore_original_limits()
+                self._blas_limiter = None
+            if threads is not None:
+                self._blas_limiter = threadpool_limits(limits=threads)
+
+    def apply_child(self, threads: Optional[int] = None) -> None:
+        """Inside a worker process: size the inherited pools for one worker's share."""
+        threads = threads or self.cores_per_worker
+        cv2.setNumThreads(threads)
+        if threadpool_limits is not None:
+            threadpool_limits(limits=threads)
+
+    # --- affinity --------------------------------------------------------------------
+
+    def next_slot(self) -> int:
+        return next(self._slot)
+
+    def pin_current_thread(self, slot: int) -> List[int]:
+        """Pin the calling thread (Linux: pid 0 = calling thread) to slice `slot` of the CPU budget."""
+        per = self.cores_per_worker
+        budget = self.cpus[:self.cores]
+        start = (slot * per) % len(budget)
+        chosen = [budget[(start + i) % len(budget)] for i in range(per)]
+        try:
+            os.sched_setaffinity(0, chosen)
+        except OSError as e:
+            logger.warning("Não foi possível fixar a afinidade em %s: %s", chosen, e)
+        return chosen
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "nucleos": self.cores,
+            "cpus_disponiveis": len(self.cpus),
+            "trabalhadores_ativos": self.active_workers,
+            "nucleos_por_trabalhador": self.cores_per_worker,
+            "opencv_threads": cv2.getNumThreads(),
+            "blas_threads": os.environ.get("OMP_NUM_THREADS"),
+            "threadpoolctl": threadpool_limits is not None,
+            "afinidade": self.pin,
+            "paralelismo_efetivo": self.effective_parallelism,
+        }
+
+
+RESOURCES = ResourceManager(int(os.environ["ANALYZER_CORES"]) if os.environ.get("ANALYZER_CORES") else None,
+                            os.environ.get("PIN_CPUS", "").strip().lower() in ("1", "true", "yes", "sim"))
+
+
+def configure_resources(cores: Optional[int] = None, pin: Optional[bool] = None) -> ResourceManager:
+    """Change the process-wide budget (call at startup, before work is running)."""
+    if cores is not None:
+        RESOURCES.cores = max(1, min(cores, len(RESOURCES.cpus)))
+    if pin is not None:
+        RESOURCES.pin = pin and hasattr(os, "sched_setaffinity")
+    return RESOURCES
+
+
+def current_lease() -> Optional[Lease]:
+    return _lease.get()
+
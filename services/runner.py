@@ -1,13 +1,287 @@
-from typing import Any, Dict
+import contextvars
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+import numpy as np
 from gerenciador import MotorDeAnalise
 from services.error_handler import format_exception
+from services.frames import count_frames
+from services.video import DEFAULT_DIFF_THRESHOLD, DEFAULT_VIDEO_TILE_SIZE
+from services.tracing import trace
+from services.profiling import DEFAULT_PROFILE_DIR, profiling
+from services.decoding import QUALITIES
+from services.resources import RESOURCES
+from services.columnar import ColumnarReportStore
+from services.aggregates import ReportAggregator
+from services.phash import DuplicateIndex
+from services.history import AnalysisHistory, content_hash
+from services.region import Region
+from services.similarity import DESCRIPTOR_MODULES, SimilarityIndex, feature_vector
 
+logger = logging.getLogger(__name__)
 
-def run_analysis(caminho_imagem: str) -> Dict[str, Any]:
+
+def run_analysis(caminho_imagem: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+                 qualidade: Optional[str] = None, tamanho_bloco: Optional[int] = None,
+                 rastrear: bool = False, perfilar: bool = False,
+                 diretorio_perfis: Optional[str] = None, tempo_limite: Optional[float] = None,
+                 prazo: Optional[float] = None, trabalhadores: Optional[int] = None,
+                 modo_paralelo: Optional[str] = None, formato_arrays: Optional[str] = None,
+                 duplicatas: Optional[DuplicateIndex] = None,
+                 historico: Optional[AnalysisHistory] = None, roi: Optional[Region] = None,
+                 mascara: Optional[Union[str, bytes, np.ndarray]] = None) -> Dict[str, Any]:
+    """Run the pipeline on one image.
+
+    `modulos` restricts the run to a subset of analyzers by name, tag or profile
+    (see `gerenciador.PERFIS`); when omitted every discovered analyzer runs.
+    `qualidade` selects a reduced-resolution decode (see `services.decoding.QUALITIES`).
+    `tamanho_bloco` enables tiled, memory-bounded processing for very large images.
+
+    Multi-frame inputs (animated GIF, multi-page TIFF) are analyzed frame by frame;
+    `report` then holds the aggregate and `frames` the per-frame reports.
+
+    `rastrear=True` records a trace of the run (decode, each analyzer, serialization)
+    and returns it under `trace`. `perfilar=True` profiles every analyzer call
+    (see `services.profiling`): each report entry gets a `profile` summary and the
+    `.prof` files are written to `diretorio_perfis` (default `PROFILE_DIR`/profiles).
+
+    `tempo_limite` (seconds per analyzer) and `prazo` (seconds for the whole request)
+    bound the run; analyzers that overrun are stopped and reported as "TIMEOUT".
+    With `prazo`, the run time is predicted first (see `MotorDeAnalise.prever`): if it
+    would miss the deadline the quality is lowered to the first preset that fits
+    (`qualidade_ajustada`), and if none fits the request is rejected without running.
+    `trabalhadores` > 1 runs the analyzers in parallel, longest expected first; with
+    `modo_paralelo="processos"` on a pool of worker processes that receive the decoded
+    image through shared memory instead of threads.
+
+    `formato_arrays="binary"` writes the numeric arrays of the report (histograms...)
+    as compact base64 buffers instead of lists (see `models.encoding`).
+
+    With `duplicatas` (a `services.phash.DuplicateIndex`) a single-frame image whose
+    perceptual hash is close to one analyzed before with the same options gets that
+    report back without running the analyzers; `duplicata` then names the original
+    (`chave`) and the Hamming `distancia`.
+
+    `historico` (a `services.history.AnalysisHistory`) records every successful report
+    under the SHA-256 of the file with the analyzer versions; the hash is returned as
+    `hash` so the report can be fetched again later without re-analysis.
+
+    `roi` (x, y, width, height) and/or `mascara` (binary image: array, path or encoded bytes)
+    restrict the analyzers to that region (see `services.region`); single-frame images only.
+    """
+    with ExitStack() as stack:
+        current = stack.enter_context(trace()) if rastrear else None
+        if perfilar:
+            stack.enter_context(profiling(diretorio_perfis or DEFAULT_PROFILE_DIR))
+        result = _run_analysis(caminho_imagem, modulos, qualidade, tamanho_bloco, tempo_limite, prazo,
+                               trabalhadores, modo_paralelo, formato_arrays, duplicatas, historico, roi, mascara)
+    if current is not None:
+        result["trace"] = current.to_dict()
+        logger.debug("Trace %s: %d spans", current.trace_id, len(current.spans), extra={"trace": result["trace"]})
+    return result
+
+
+def run_batch(caminhos: Iterable[str], simultaneas: Optional[int] = None,
+              colunas: Optional[ColumnarReportStore] = None, agregador: Optional[ReportAggregator] = None,
+              indice: Optional[SimilarityIndex] = None, **options) -> Dict[str, Any]:
+    """Run `run_analysis` on several images with the same options (e.g. `perfilar=True` for a profiling batch).
+
+    `simultaneas` > 1 analyzes that many images at once; the batch takes one resource lease
+    for all of them (see `services.resources`), so OpenCV/BLAS threads are split between the
+    images instead of each image assuming the whole machine.
+
+    With `colunas` (a `services.columnar.ColumnarReportStore`) each report's scalar metrics are
+    appended to the store as soon as the image finishes and the report itself is dropped:
+    `results` then only keeps `success`/`error` per image (plus any other top-level keys).
+    `agregador` (a `services.aggregates.ReportAggregator`) folds every successful report into
+    corpus statistics as it arrives; checkpoint it with `agregador.save(path)`.
+    `indice` (a `services.similarity.SimilarityIndex`) receives the descriptor vector of every
+    image under its path; run with `modulos=DESCRIPTOR_MODULES` to compute only what it needs.
+    With `historico=AnalysisHistory(path, batch_size=...)` the reports are written in batches
+    and the last partial batch is flushed at the end.
+
+    Returns `{"success": <all succeeded>, "results": {path: run_analysis result}, "recursos": {...}}`.
+    """
+    caminhos = list(caminhos)
+    if not simultaneas or simultaneas <= 1 or len(caminhos) <= 1:
+        results = {caminho: _run_batch_item(caminho, colunas, agregador, indice, options)
+                   for caminho in caminhos}
+        report = RESOURCES.report()
+    else:
+        with RESOURCES.lease(simultaneas) as lease:
+            with ThreadPoolExecutor(max_workers=simultaneas, thread_name_prefix="lote",
+                                    initializer=lease.initializer) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, _run_batch_item, caminho, colunas,
+                                       agregador, indice, options)
+                           for caminho in caminhos]
+                report = RESOURCES.report()
+            results = {caminho: future.result() for caminho, future in zip(caminhos, futures)}
+    if colunas is not None:
+        colunas.flush()
+    if options.get("historico") is not None:
+        options["historico"].flush()
+    return {"success": all(r.get("success") for r in results.values()), "results": results, "recursos": report}
+
+
+def _run_batch_item(caminho: str, colunas: Optional[ColumnarReportStore], agregador: Optional[ReportAggregator],
+                    indice: Optional[SimilarityIndex], options: Dict[str, Any]) -> Dict[str, Any]:
+    result = run_analysis(caminho, **options)
+    if agregador is not None and result.get("success"):
+        agregador.add(result["report"])
+    if indice is not None and result.get("success"):
+        indice.add(caminho, feature_vector(result["report"]))
+    if colunas is not None and result.get("success"):
+        colunas.append(caminho, result.pop("report"))
+        result.pop("frames", None)
+    return result
+
+
+def find_similar(caminho_imagem: str, indice: SimilarityIndex, k: int = 5, aproximado: bool = False,
+                 qualidade: Optional[str] = None, chave: Optional[str] = None) -> Dict[str, Any]:
+    """The `k` indexed images most similar to this one.
+
+    Only the descriptor analyzers (`DESCRIPTOR_MODULES`: histograms and GLCM) run on the
+    query image; matches come from the index, nothing is recomputed for them. With `chave`
+    the image is also added to the index under that key (after the query, so it never
+    matches itself).
+    """
+    try:
+        report = MotorDeAnalise().executar_pipeline(caminho_imagem, modulos=DESCRIPTOR_MODULES, qualidade=qualidade,
+                                                   formato_arrays="raw")
+        vector = feature_vector(report)
+        matches = indice.query(vector, k, approximate=aproximado)
+        if chave is not None:
+            indice.add(chave, vector)
+        return {"success": True, "similares": matches, "indexadas": len(indice)}
+    except Exception as e:
+        return {"success": False, "error": format_exception(e)}
+
+
+def list_analyzers() -> List[Dict[str, Any]]:
+    """Descriptors (version, inputs, capabilities) of the discovered analyzers, in run order."""
+    return [d.to_dict() for d in MotorDeAnalise().descritores()]
+
+
+def predict_analysis(caminho_imagem: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+                     qualidade: Optional[str] = None, trabalhadores: Optional[int] = None) -> Dict[str, Any]:
+    """Predicted run time of `run_analysis` with these options, from the analyzers' observed costs."""
+    try:
+        return {"success": True, "previsao": _predict(MotorDeAnalise(), caminho_imagem, modulos, qualidade,
+                                                      trabalhadores)}
+    except Exception as e:
+        return {"success": False, "error": format_exception(e)}
+
+
+def _predict(engine: MotorDeAnalise, caminho_imagem: str, modulos, qualidade, trabalhadores) -> Dict[str, Any]:
+    previsao = engine.prever(caminho_imagem, modulos=modulos, qualidade=qualidade, trabalhadores=trabalhadores)
+    frames = count_frames(caminho_imagem)
+    if frames > 1:
+        previsao.update(quadros=frames, sequencial_s=round(previsao["sequencial_s"] * frames, 4),
+                        estimado_s=round(previsao["estimado_s"] * frames, 4))
+    return previsao
+
+
+def _fit_deadline(engine: MotorDeAnalise, caminho_imagem: str, modulos, qualidade, trabalhadores,
+                  prazo: float) -> Dict[str, Any]:
+    """Prediction for the requested quality or, if it misses `prazo`, for the first lower quality that fits."""
+    presets = list(QUALITIES)
+    start = presets.index(qualidade) if qualidade in QUALITIES else 0
+    previsao = None
+    for candidate in presets[start:]:
+        previsao = _predict(engine, caminho_imagem, modulos, candidate, trabalhadores)
+        if previsao["estimado_s"] <= prazo:
+            return previsao
+    previsao["cabe_no_prazo"] = False
+    return previsao
+
+
+def _deadline_error(previsao: Dict[str, Any], prazo: float) -> Dict[str, str]:
+    return {
+        "message": f"Execução prevista em {previsao['estimado_s']:.2f}s não cabe no prazo de {prazo:g}s, "
+                   f"mesmo com qualidade '{previsao['qualidade']}'.",
+        "suggestion": "Aumente o prazo, selecione menos módulos ou use mais trabalhadores.",
+        "can_retry": "yes",
+    }
+
+
+def _record(historico: AnalysisHistory, engine: MotorDeAnalise, caminho_imagem: str,
+            result: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        result["hash"] = content_hash(caminho_imagem)
+        versions = {d.name: d.version for d in engine.descritores() if d.name in result["report"]}
+        historico.record(result["hash"], result["report"], versions, filename=os.path.basename(caminho_imagem))
+    except (OSError, sqlite3.Error) as e:
+        # The analysis itself succeeded: losing the history entry must not fail the request
+        logger.warning("Falha ao gravar o histórico de %s: %s", caminho_imagem, e)
+    return result
+
+
+def _run_analysis(caminho_imagem: str, modulos, qualidade, tamanho_bloco, tempo_limite, prazo,
+                  trabalhadores=None, modo_paralelo=None, formato_arrays=None, duplicatas=None,
+                  historico=None, roi=None, mascara=None) -> Dict[str, Any]:
     engine = MotorDeAnalise()
+    limits = {"tempo_limite": tempo_limite, "prazo": prazo, "trabalhadores": trabalhadores}
+    if modo_paralelo:
+        limits["modo_paralelo"] = modo_paralelo
+    if formato_arrays:
+        limits["formato_arrays"] = formato_arrays
+    region = {k: v for k, v in (("roi", roi), ("mascara", mascara)) if v is not None}
     try:
-        report = engine.executar_pipeline(caminho_imagem)
-        return {"success": True, "report": report}
+        extra = {}
+        if prazo is not None:
+            previsao = _fit_deadline(engine, caminho_imagem, modulos, qualidade, trabalhadores, prazo)
+            if previsao.get("cabe_no_prazo") is False:
+                return {"success": False, "error": _deadline_error(previsao, prazo), "previsao": previsao}
+            extra["previsao"] = previsao
+            if previsao["qualidade"] != (qualidade or "full"):
+                logger.info("Qualidade rebaixada de %s para %s para caber no prazo de %gs",
+                            qualidade or "full", previsao["qualidade"], prazo)
+                qualidade = extra["qualidade_ajustada"] = previsao["qualidade"]
+        if count_frames(caminho_imagem) > 1:
+            if region:
+                raise ValueError("ROI/máscara só são suportadas em imagens de um quadro.")
+            multi = engine.executar_multiquadro(caminho_imagem, modulos=modulos, qualidade=qualidade,
+                                                tamanho_bloco=tamanho_bloco, **limits)
+            result = dict({"success": True, "report": multi["agregado"], "frames": multi["quadros"],
+                           "num_frames": multi["num_quadros"]}, **extra)
+        elif duplicatas is not None:
+            report, duplicata = engine.executar_com_duplicatas(caminho_imagem, duplicatas, modulos=modulos,
+                                                               qualidade=qualidade, tamanho_bloco=tamanho_bloco,
+                                                               **limits, **region)
+            if duplicata is not None:
+                extra["duplicata"] = duplicata
+            result = dict({"success": True, "report": report}, **extra)
+        else:
+            report = engine.executar_pipeline(caminho_imagem, modulos=modulos, qualidade=qualidade,
+                                             tamanho_bloco=tamanho_bloco, **limits, **region)
+            result = dict({"success": True, "report": report}, **extra)
+        return _record(historico, engine, caminho_imagem, result) if historico is not None else result
     except Exception as e:
         err = format_exception(e)
         return {"success": False, "error": err}
+
+
+def stream_video_analysis(fonte_video: str, modulos: Optional[Union[str, Iterable[str]]] = None,
+                          qualidade: Optional[str] = None, limiar_diferenca: float = DEFAULT_DIFF_THRESHOLD,
+                          tamanho_bloco: Optional[int] = None, passo: int = 1) -> Iterator[Dict[str, Any]]:
+    """Analyze a video file or numbered image sequence, yielding one record per frame.
+
+    Frame records come from `MotorDeAnalise.executar_video`. The stream ends with a
+    summary record (`{"success": True, "fim": True, ...}`) or, if the run fails, with
+    `{"success": False, "error": ...}`.
+    """
+    engine = MotorDeAnalise()
+    quadros = reutilizados = 0
+    try:
+        for registro in engine.executar_video(fonte_video, modulos=modulos, qualidade=qualidade,
+                                              limiar_diferenca=limiar_diferenca,
+                                              tamanho_bloco=tamanho_bloco or DEFAULT_VIDEO_TILE_SIZE, passo=passo):
+            quadros += 1
+            reutilizados += registro["reutilizado"]
+            yield registro
+        yield {"success": True, "fim": True, "num_quadros": quadros, "reutilizados": reutilizados}
+    except Exception as e:
+        yield {"success": False, "error": format_exception(e)}
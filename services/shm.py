@@ -0,0 +1,121 @@
+"""Shared-memory handoff of decoded images and intermediates to worker processes.
+
+Arguments of a process-pool task are pickled through a pipe, so sending a
+multi-megabyte frame to every analyzer costs one copy (and one pickle) per
+task. `SharedArrays` instead copies each array once into a
+`multiprocessing.shared_memory` segment and hands workers a small
+`ArrayHandle`; `attached` maps the segments in the worker without copying.
+
+Segments are keyed by what they hold (e.g. ``("imagem", mode, factor)``) and
+reference-counted like `services.intermediates.IntermediateGraph`: `plan`
+records how many consumers will use each key, `publish` creates the segment
+on first use and `release` drops one reference, unlinking the segment as soon
+as its last consumer has finished. Keys that were not planned count one
+consumer per `publish`. `close()` unlinks whatever is left (errors, aborted
+runs).
+"""
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Dict, Hashable, Iterable, Iterator, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class ArrayHandle:
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedArrays:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refs: Counter = Counter()
+        self._planned = set()
+        self._segments: Dict[Hashable, Tuple[shared_memory.SharedMemory, ArrayHandle]] = {}
+        self.copied_bytes = 0
+
+    def plan(self, keys: Iterable[Hashable]) -> "SharedArrays":
+        """Count one future consumer per occurrence of each key."""
+        with self._lock:
+            for key in keys:
+                self._refs[key] += 1
+                self._planned.add(key)
+        return self
+
+    def publish(self, key: Hashable, array: np.ndarray) -> ArrayHandle:
+        """Handle to the shared copy of `array` under `key`, copying it only the first time."""
+        with self._lock:
+            if key not in self._planned:
+                self._refs[key] += 1
+            if key in self._segments:
+                return self._segments[key][1]
+            segment = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+            handle = ArrayHandle(segment.name, tuple(array.shape), array.dtype.str)
+            self._segments[key] = (segment, handle)
+            self.copied_bytes += array.nbytes
+            return handle
+
+    def release(self, key: Hashable) -> None:
+        with self._lock:
+            if self._refs[key] <= 0:
+                return
+            self._refs[key] -= 1
+            if self._refs[key] == 0:
+                self._unlink(key)
+
+    def _unlink(self, key: Hashable) -> None:
+        self._refs.pop(key, None)
+        self._planned.discard(key)
+        entry = self._segments.pop(key, None)
+        if entry is not None:
+            entry[0].close()
+            entry[0].unlink()
+
+    def alive(self) -> list:
+        with self._lock:
+            return list(self._segments)
+
+    def close(self) -> None:
+        with self._lock:
+            for key in list(self._refs) + list(self._segments):
+                self._unlink(key)
+
+
+@contextmanager
+def attached(handles: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """In a worker: `handles` with every `ArrayHandle` (also one level down in dicts) replaced by a read-only view.
+
+    The views are only valid inside the block; the segments are closed (never unlinked) on exit.
+    """
+    segments = []
+
+    def view(handle: ArrayHandle) -> np.ndarray:
+        segment = shared_memory.SharedMemory(name=handle.name)
+        segments.append(segment)
+        array = np.ndarray(handle.shape, np.dtype(handle.dtype), buffer=segment.buf)
+        array.flags.writeable = False
+        return array
+
+    def resolve(value):
+        if isinstance(value, ArrayHandle):
+            return view(value)
+        if isinstance(value, dict):
+            return {k: resolve(v) for k, v in value.items()}
+        return value
+
+    resolved = {k: resolve(v) for k, v in handles.items()}
+    try:
+        yield resolved
+    finally:
+        resolved.clear()
+        for segment in segments:
+            try:
+                segment.close()
+            except BufferError:
+                pass  # the result still references a view; the mapping goes away with it
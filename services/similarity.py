@@ -0,0 +1,224 @@
+"""Similarity index over the descriptors the pipeline already computes.
+
+`feature_vector` packs one report into a fixed-length ``float32`` vector:
+
+- the gray, R, G and B histograms (``Histograma 1..4``), each folded to
+  `HIST_BINS` bins, normalized to sum 1 and square-rooted, so the Euclidean
+  distance between two vectors is the Hellinger distance of the histograms;
+- the GLCM texture features of ``GLCM: Análise de Textura``, compressed with
+  ``sign(x) * log1p(|x|)`` (contrast goes to the thousands, energy stays below
+  1) and weighted by `GLCM_WEIGHT`.
+
+Missing parts (analyzer not run or failed) are zeros.
+
+`SimilarityIndex` keeps the vectors in one contiguous array, appends
+incrementally and answers k-nearest-neighbour queries with one matrix-vector
+product (exact). For large indexes `build_lists` trains a coarse k-means
+quantizer and `query(..., approximate=True)` only scans the `probes` closest
+lists (IVF). `save`/`open` persist it to a directory (``vectores.npy``,
+``entradas.json`` and, when trained, ``centroides.npy``); vectors are memory
+mapped on open, so a large index loads instantly.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from models.report import ConsolidatedReport
+
+HISTOGRAM_MODULES = (
+    "Histograma 1: Intensidade (Cinza/Luma)",
+    "Histograma 2: Canal Vermelho (R)",
+    "Histograma 3: Canal Verde (G)",
+    "Histograma 4: Canal Azul (B)",
+)
+GLCM_MODULE = "GLCM: Análise de Textura"
+GLCM_FEATURES = ("contraste", "dissimilaridade", "homogeneidade", "energia", "correlacao", "entropia")
+# Analyzers whose results make up the vector (pass as `modulos` to compute just these)
+DESCRIPTOR_MODULES = HISTOGRAM_MODULES + (GLCM_MODULE,)
+
+HIST_BINS = 32
+GLCM_WEIGHT = 0.25
+DIMENSION = len(HISTOGRAM_MODULES) * HIST_BINS + len(GLCM_FEATURES)
+
+_INITIAL_CAPACITY = 1024
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE = 50_000
+_ASSIGN_BLOCK = 16_384
+
+
+def _metrics(report: Union[ConsolidatedReport, Dict[str, Any]], module: str) -> Optional[Dict[str, Any]]:
+    if isinstance(report, ConsolidatedReport):
+        item = report.items.get(module)
+        return item.dados.metrics if item is not None and item.status == "OK" and item.dados is not None else None
+    info = report.get(module) or {}
+    return (info.get("dados") or {}).get("metrics") if info.get("status") == "OK" else None
+
+
+def feature_vector(report: Union[ConsolidatedReport, Dict[str, Any]]) -> np.ndarray:
+    """Fixed-length descriptor (`DIMENSION` floats) of one report (object or dict form)."""
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    for i, module in enumerate(HISTOGRAM_MODULES):
+        metrics = _metrics(report, module)
+        if not metrics or metrics.get("counts") is None:
+            continue
+        counts = np.asarray(metrics["counts"], dtype=np.float64)
+        folded = counts.reshape(HIST_BINS, -1).sum(axis=1)
+        total = folded.sum()
+        if total:
+            vector[i * HIST_BINS:(i + 1) * HIST_BINS] = np.sqrt(folded / total)
+    metrics = _metrics(report, GLCM_MODULE)
+    if metrics:
+        values = np.array([float(metrics.get(name, 0.0)) for name in GLCM_FEATURES])
+        vector[-len(GLCM_FEATURES):] = GLCM_WEIGHT * np.sign(values) * np.log1p(np.abs(values))
+    return vector
+
+
+class SimilarityIndex:
+    def __init__(self, dimension: int = DIMENSION):
+        self.dimension = dimension
+        self.entries: List[Dict[str, Any]] = []
+        self._vectors = np.empty((0, dimension), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Optional[np.ndarray] = None  # list (centroid) of each row
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:len(self.entries)]
+
+    # --- inserts -----------------------------------------------------------------------
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the backing arrays geometrically (amortized O(1) appends)."""
+        if rows <= len(self._vectors) and self._vectors.flags.writeable:
+            return
+        capacity = max(_INITIAL_CAPACITY, rows, 2 * len(self._vectors))
+        vectors = np.empty((capacity, self.dimension), dtype=np.float32)
+        norms = np.empty(capacity, dtype=np.float32)
+        count = len(self.entries)
+        vectors[:count] = self._vectors[:count]
+        norms[:count] = self._norms[:count]
+        self._vectors, self._norms = vectors, norms
+        if self._lists is not None:
+            lists = np.empty(capacity, dtype=np.int32)
+            lists[:count] = self._lists[:count]
+            self._lists = lists
+
+    def add(self, key: str, vector: np.ndarray, **meta) -> int:
+        """Insert one vector under `key` (extra keyword arguments are stored and returned with matches)."""
+        vector = np.asarray(vector, dtype=np.float32).reshape(self.dimension)
+        with self._lock:
+            row = len(self.entries)
+            self._reserve(row + 1)
+            self._vectors[row] = vector
+            self._norms[row] = vector @ vector
+            if self._lists is not None:
+                self._lists[row] = self._nearest_centroids(vector, 1)[0]
+            self.entries.append(dict(meta, chave=key))
+            return row
+
+    # --- queries -----------------------------------------------------------------------
+
+    def query(self, vector: np.ndarray, k: int = 5, approximate: bool = False,
+              probes: int = 4) -> List[Dict[str, Any]]:
+        """The `k` nearest entries as dicts (stored metadata + "chave" + "distancia"), closest first."""
+        q = np.asarray(vector, dtype=np.float32).reshape(self.dimension)
+        with self._lock:
+            count = len(self.entries)
+            if not count:
+                return []
+            rows = None
+            if approximate and self._centroids is not None:
+                chosen = self._nearest_centroids(q, probes)
+                rows = np.flatnonzero(np.isin(self._lists[:count], chosen))
+            vectors = self._vectors[:count] if rows is None else self._vectors[rows]
+            norms = self._norms[:count] if rows is None else self._norms[rows]
+            # |x - q|^2 = |x|^2 - 2 x.q + |q|^2: a single matrix-vector product
+            distances = norms - 2 * (vectors @ q) + q @ q
+            k = min(k, len(distances))
+            if not k:
+                return []
+            best = np.argpartition(distances, k - 1)[:k]
+            best = best[np.argsort(distances[best])]
+            positions = best if rows is None else rows[best]
+            return [dict(self.entries[p], distancia=float(np.sqrt(max(distances[b], 0.0))))
+                    for p, b in zip(positions, best)]
+
+    # --- approximate mode (IVF) ------------------------------------------------------------
+
+    def _nearest_centroids(self, vector: np.ndarray, n: int) -> np.ndarray:
+        distances = ((self._centroids - vector) ** 2).sum(axis=1)
+        n = min(n, len(distances))
+        return np.argpartition(distances, n - 1)[:n]
+
+    def build_lists(self, lists: Optional[int] = None, seed: int = 0) -> None:
+        """Train the coarse quantizer (k-means, `lists` centroids; default ~sqrt(n)) and assign every row."""
+        with self._lock:
+            vectors = self.vectors
+            if not len(vectors):
+                return
+            lists = max(1, min(lists or int(np.sqrt(len(vectors))), len(vectors)))
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(len(vectors), min(len(vectors), _KMEANS_SAMPLE), replace=False)]
+            centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+            for _ in range(_KMEANS_ITERATIONS):
+                assignment = self._assign(sample, centroids)
+                for c in range(lists):
+                    members = sample[assignment == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+            self._centroids = centroids
+            self._lists = np.zeros(len(self._vectors), dtype=np.int32)
+            self._lists[:len(vectors)] = self._assign(vectors, centroids)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid of every row, in blocks so the distance matrix stays small."""
+        squared = (centroids ** 2).sum(axis=1)
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _ASSIGN_BLOCK):
+            block = vectors[start:start + _ASSIGN_BLOCK]
+            assignment[start:start + len(block)] = (squared[None, :] - 2 * block @ centroids.T).argmin(axis=1)
+        return assignment
+
+    # --- persistence ---------------------------------------------------------------------
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            np.save(os.path.join(directory, "vectores.npy"), self.vectors)
+            if self._centroids is not None:
+                np.save(os.path.join(directory, "centroides.npy"), self._centroids)
+            temporary = os.path.join(directory, "entradas.json.tmp")
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"dimensao": self.dimension, "entradas": self.entries}, f, ensure_ascii=False)
+            os.replace(temporary, os.path.join(directory, "entradas.json"))
+
+    @classmethod
+    def open(cls, directory: str) -> "SimilarityIndex":
+        """Load a saved index (an empty one if `directory` has none yet); vectors are memory mapped."""
+        path = os.path.join(directory, "entradas.json")
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["dimensao"])
+        index.entries = data["entradas"]
+        # Read-only map: the first `add` copies it into an owned array (see `_reserve`)
+        index._vectors = np.load(os.path.join(directory, "vectores.npy"), mmap_mode="r")
+        index._norms = np.einsum("ij,ij->i", index._vectors, index._vectors).astype(np.float32)
+        centroids = os.path.join(directory, "centroides.npy")
+        if os.path.exists(centroids):
+            index._centroids = np.load(centroids)
+            index._lists = index._assign(index._vectors, index._centroids)
+        return index
+
+    def keys(self) -> Sequence[str]:
+        return [entry["chave"] for entry in self.entries]
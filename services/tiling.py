@@ -0,0 +1,58 @@
+"""Tile iteration helpers for the engine's memory-bounded (tiled) mode.
+
+An image is walked in square tiles. Each tile is handed to the analyzer with
+a halo of neighbouring pixels around its *core* so kernels that look at
+neighbours (Canny, adaptive threshold, GLCM offsets) see the same context they
+would on the full image. Analyzers only count pixels inside the core, so
+additive partial results (histograms, co-occurrence counts, edge-pixel
+counts) merge exactly.
+"""
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+
+# (y0, y1, x0, x1) rectangle; for cores it is relative to the tile array
+Rect = Tuple[int, int, int, int]
+
+DEFAULT_TILE_SIZE = 1024
+
+
+def iter_tiles(height: int, width: int, tile_size: int, halo: int = 0) -> Iterator[Tuple[Rect, Rect]]:
+    """Yield (tile rect in image coords, core rect in tile coords) pairs."""
+    if tile_size <= 0:
+        raise ValueError("O tamanho do bloco deve ser positivo.")
+    for y in range(0, height, tile_size):
+        cy1 = min(y + tile_size, height)
+        by0, by1 = max(0, y - halo), min(height, cy1 + halo)
+        for x in range(0, width, tile_size):
+            cx1 = min(x + tile_size, width)
+            bx0, bx1 = max(0, x - halo), min(width, cx1 + halo)
+            yield (by0, by1, bx0, bx1), (y - by0, cy1 - by0, x - bx0, cx1 - bx0)
+
+
+def shrink_halo(tile: np.ndarray, core: Rect, halo: int) -> Tuple[np.ndarray, Rect]:
+    """Return a view of `tile` keeping at most `halo` pixels around the core."""
+    y0, y1, x0, x1 = core
+    h, w = tile.shape[:2]
+    ty0, tx0 = max(0, y0 - halo), max(0, x0 - halo)
+    ty1, tx1 = min(h, y1 + halo), min(w, x1 + halo)
+    return tile[ty0:ty1, tx0:tx1], (y0 - ty0, y1 - ty0, x0 - tx0, x1 - tx0)
+
+
+def core_view(tile: np.ndarray, core: Rect) -> np.ndarray:
+    y0, y1, x0, x1 = core
+    return tile[y0:y1, x0:x1]
+
+
+def merge_partials(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Default merge for additive partials: element-wise sum of every key."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return {k: a[k] + b[k] for k in a}
+
+
+def subtract_partials(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of `merge_partials`, used to replace one tile's contribution incrementally."""
+    return {k: a[k] - b[k] for k in a}
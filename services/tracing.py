@@ -0,0 +1,141 @@
+"""Per-run trace ids and nested spans, enabled per request.
+
+Tracing is off unless a run is wrapped in `trace()`. While it is off, `span()`
+only reads one context variable and returns a shared no-op object, so the
+instrumentation left in the engine costs close to nothing.
+
+    with trace() as t:
+        with span("decode", mode="gray"):
+            ...
+    t.to_dict()  # {"trace_id": ..., "spans": [{"name", "span_id", "parent_id", "start_ms", "duration_ms", ...}]}
+
+State lives in `contextvars`, so concurrent requests (threads) keep separate
+traces and the log filter in `services.logging_setup` can stamp every record
+with the current trace/span id.
+"""
+import contextvars
+import itertools
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.metrics import now
+
+_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "end", "status")
+
+    def __init__(self, trace: "Trace", span_id: int, parent_id: Optional[int], name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = now()
+        self.end = None
+        self.status = "ok"
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": (self.start - self.trace.start) * 1000,
+            "duration_ms": ((self.end if self.end is not None else now()) - self.start) * 1000,
+            "status": self.status,
+        }
+        if self.attrs:
+            out["attrs"] = self.attrs
+        return out
+
+
+class _NoopSpan:
+    """Returned by `span()` when tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.start = now()
+        self.spans: List[Span] = []
+        self._ids = itertools.count(1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.trace_id, "spans": [s.to_dict() for s in self.spans]}
+
+
+class _ActiveSpan:
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end = now()
+        if exc_type is not None:
+            self.span.status = "error"
+            self.span.attrs["error"] = str(exc)
+        _span.reset(self._token)
+        return False
+
+
+def span(name: str, **attrs):
+    """Context manager timing a nested unit of work in the current trace (no-op when tracing is off)."""
+    active = _trace.get()
+    if active is None:
+        return _NOOP
+    parent = _span.get()
+    new = Span(active, next(active._ids), parent.span_id if parent is not None else None, name, attrs)
+    active.spans.append(new)
+    return _ActiveSpan(new)
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None) -> Iterator[Trace]:
+    """Enable tracing for the enclosed block; spans opened inside are collected on the yielded `Trace`."""
+    active = Trace(trace_id)
+    token_trace = _trace.set(active)
+    token_span = _span.set(None)
+    try:
+        yield active
+    finally:
+        _span.reset(token_span)
+        _trace.reset(token_trace)
+
+
+def tracing_enabled() -> bool:
+    return _trace.get() is not None
+
+
+def current_ids() -> Dict[str, Any]:
+    """{"trace_id", "span_id"} of the running span, empty when tracing is off."""
+    active = _trace.get()
+    if active is None:
+        return {}
+    current = _span.get()
+    return {"trace_id": active.trace_id, "span_id": current.span_id if current is not None else None}
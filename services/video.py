@@ -0,0 +1,203 @@
+"""Frame streams (video files, numbered image sequences) with incremental work.
+
+Consecutive frames of an inspection camera are mostly identical, so the video
+mode avoids recomputing what did not change:
+
+- `FrameChangeDetector` skips a whole frame when its content digest equals the
+  last analyzed frame or when a 32x32 grayscale thumbnail differs from it by
+  less than a threshold (mean absolute difference, in gray levels);
+- `IncrementalTiles` keeps the per-tile partial results of the tile contract
+  (`processar_bloco`/`combinar_blocos`) and only recomputes tiles whose pixels
+  (halo included) changed. Additive partials (histograms, co-occurrence and
+  pixel counts) are updated by subtracting the old tile contribution and
+  adding the new one.
+"""
+import hashlib
+import os
+import re
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from services.metrics import now
+from services.tiling import iter_tiles, merge_partials, shrink_halo, subtract_partials
+
+VIDEO_EXTENSIONS = {"mp4", "avi", "mov", "mkv", "webm", "m4v", "mpg", "mpeg", "wmv"}
+SEQUENCE_EXTENSIONS = {"png", "jpg", "jpeg", "bmp", "tif", "tiff"}
+
+DEFAULT_DIFF_THRESHOLD = 0.5
+DEFAULT_VIDEO_TILE_SIZE = 256
+THUMBNAIL_SIZE = 32
+
+
+def _extension(path: str) -> str:
+    return path.rsplit(".", 1)[1].lower() if "." in path else ""
+
+
+def is_video_source(source: str) -> bool:
+    """Video file, directory of numbered images or printf-style pattern (``frame_%04d.png``)."""
+    return _extension(source) in VIDEO_EXTENSIONS or os.path.isdir(source) or "%" in os.path.basename(source)
+
+
+def _natural_key(name: str):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def sequence_files(directory: str) -> List[str]:
+    """Image files of a directory in natural order (frame_2 before frame_10)."""
+    names = [n for n in os.listdir(directory) if _extension(n) in SEQUENCE_EXTENSIONS]
+    return [os.path.join(directory, n) for n in sorted(names, key=_natural_key)]
+
+
+def iter_video_frames(source: str, step: int = 1) -> Iterator[Tuple[int, Optional[float], np.ndarray]]:
+    """Yield (index, timestamp in seconds or None, BGR frame), decoding one frame at a time.
+
+    `step` > 1 keeps every n-th frame; skipped video frames are only grabbed, not decoded.
+    """
+    if step <= 0:
+        raise ValueError("O passo entre quadros deve ser positivo.")
+    if os.path.isdir(source):
+        for index, path in enumerate(sequence_files(source)):
+            if index % step:
+                continue
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield index, None, frame
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Não foi possível abrir o vídeo/sequência: {source}")
+    # Image-sequence backends report a made-up frame rate
+    fps = 0.0 if "%" in os.path.basename(source) else capture.get(cv2.CAP_PROP_FPS)
+    try:
+        index = 0
+        while True:
+            if index % step:
+                if not capture.grab():
+                    break
+            else:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield index, (index / fps if fps > 0 else None), frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def frame_digest(frame: np.ndarray) -> bytes:
+    digest = hashlib.blake2b(np.ascontiguousarray(frame).data, digest_size=16)
+    digest.update(repr(frame.shape).encode())
+    return digest.digest()
+
+
+def frame_thumbnail(frame: np.ndarray, size: int = THUMBNAIL_SIZE) -> np.ndarray:
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class FrameChangeDetector:
+    """Decides whether a frame can reuse the results of the last analyzed frame.
+
+    Frames are compared against the last frame that was actually analyzed (not
+    the previous one), so slow drifts still trigger a recomputation.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_DIFF_THRESHOLD):
+        self.threshold = threshold
+        self._digest = None
+        self._thumbnail = None
+        self._shape = None
+
+    def check(self, frame: np.ndarray) -> Optional[str]:
+        """Return why `frame` can be skipped ("digest" or "diferenca"), or None after adopting it as reference."""
+        digest = frame_digest(frame)
+        if digest == self._digest:
+            return "digest"
+        thumbnail = frame_thumbnail(frame)
+        if (self.threshold > 0 and self._thumbnail is not None and frame.shape == self._shape
+                and float(np.mean(np.abs(thumbnail - self._thumbnail))) < self.threshold):
+            return "diferenca"
+        self._digest, self._thumbnail, self._shape = digest, thumbnail, frame.shape
+        return None
+
+
+class IncrementalTiles:
+    """Per-tile partial cache for analyzers sharing one image representation.
+
+    `update(image)` recomputes only the tiles that differ from the previous
+    image and returns the up-to-date combined partial of every analyzer.
+    `additive[i]` says the i-th analyzer combines partials by plain summation,
+    so a changed tile is applied as ``total - old + new``; otherwise the total
+    is re-folded from the cached tile partials with `combinar_blocos`.
+    `seconds[i]` is the time spent on the i-th analyzer during the last update.
+    """
+
+    def __init__(self, analyzers: Sequence[Any], tile_size: int, additive: Sequence[bool]):
+        self.analyzers = list(analyzers)
+        self.additive = list(additive)
+        self.tile_size = tile_size
+        self.halo = max(a.halo for a in self.analyzers)
+        self.previous: Optional[np.ndarray] = None
+        self.tiles = []
+        self.partials: List[Optional[list]] = [None] * len(self.analyzers)
+        self.totals: List[Optional[dict]] = [None] * len(self.analyzers)
+        self.changed_tiles = 0
+        self.seconds = [0.0] * len(self.analyzers)
+
+    def _reset(self, shape) -> None:
+        self.previous = None
+        self.tiles = list(iter_tiles(shape[0], shape[1], self.tile_size, self.halo))
+        self.partials = [None] * len(self.analyzers)
+        self.totals = [None] * len(self.analyzers)
+
+    def update(self, image: np.ndarray) -> List[Any]:
+        """Return, per analyzer, its combined partial for `image` or the exception it raised."""
+        if self.previous is None or self.previous.shape != image.shape:
+            self._reset(image.shape)
+        results: List[Any] = [None] * len(self.analyzers)
+        stale = [self.partials[i] is None for i in range(len(self.analyzers))]
+        for i in range(len(self.analyzers)):
+            if stale[i]:
+                self.partials[i] = [None] * len(self.tiles)
+        self.changed_tiles = 0
+        self.seconds = [0.0] * len(self.analyzers)
+
+        for t, ((y0, y1, x0, x1), core) in enumerate(self.tiles):
+            tile = image[y0:y1, x0:x1]
+            changed = self.previous is None or not np.array_equal(tile, self.previous[y0:y1, x0:x1])
+            self.changed_tiles += changed
+            for i, analyzer in enumerate(self.analyzers):
+                if isinstance(results[i], Exception) or not (changed or stale[i]):
+                    continue
+                start = now()
+                try:
+                    sub, sub_core = shrink_halo(tile, core, analyzer.halo)
+                    partial = analyzer.processar_bloco(sub, sub_core)
+                except Exception as e:
+                    results[i] = e
+                    continue
+                old = self.partials[i][t]
+                self.partials[i][t] = partial
+                if self.additive[i] and not stale[i]:
+                    self.totals[i] = merge_partials(subtract_partials(self.totals[i], old), partial)
+                self.seconds[i] += now() - start
+
+        for i, analyzer in enumerate(self.analyzers):
+            if isinstance(results[i], Exception):
+                # Cache is now inconsistent: recompute every tile for this analyzer next time
+                self.partials[i] = None
+                self.totals[i] = None
+                continue
+            if stale[i] or (not self.additive[i] and self.changed_tiles):
+                start = now()
+                total = None
+                for partial in self.partials[i]:
+                    total = analyzer.combinar_blocos(total, partial)
+                self.totals[i] = total
+                self.seconds[i] += now() - start
+            results[i] = self.totals[i]
+        self.previous = image
+        return results
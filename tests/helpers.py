@@ -0,0 +1,52 @@
+"""Helpers shared by several test modules (not collected: the name does not start with test_)."""
+from gerenciador import AnalisadorBase, MotorDeAnalise
+from models.analysis import AnalysisResult
+
+
+class MotorDoProjeto(MotorDeAnalise):
+    """Só os analisadores do pacote (a descoberta também encontra os de outros testes)."""
+
+    def _descobrir_analisadores(self):
+        super()._descobrir_analisadores()
+        self.analisadores = [a for a in self.analisadores if type(a).__module__.startswith("analisadores.")]
+
+
+class SuccessAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "SuccessAnalyzer"
+
+    def processar(self, caminho_imagem: str) -> AnalysisResult:
+        # Simula processamento rápido
+        return AnalysisResult(detalhe="ok", metrics={"value": 1})
+
+
+class FailAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "FailAnalyzer"
+
+    def processar(self, caminho_imagem: str) -> AnalysisResult:
+        raise RuntimeError("simulated failure")
+
+
+class GrayPreviewAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "GrayPreviewAnalyzer"
+
+    @property
+    def modo_leitura(self):
+        return "gray"
+
+    @property
+    def reducao_maxima(self):
+        return 2
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem=None) -> AnalysisResult:
+        return AnalysisResult(metrics={"shape": list(imagem.shape)})
+
+
+class MetricsMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [SuccessAnalyzer(), FailAnalyzer(), GrayPreviewAnalyzer(), GrayPreviewAnalyzer()]
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+import pytest
+
+from models.analysis import AnalysisResult
+from models.report import ConsolidatedReport, ResultItem
+from services.aggregates import ReportAggregator, RunningStats
+from services.runner import run_batch
+from tests.helpers import MetricsMotor, MotorDoProjeto
+
+
+def _relatorio(contraste, formas, percentual):
+    relatorio = ConsolidatedReport()
+    relatorio.add(ResultItem("GLCM", "OK", AnalysisResult(metrics={"contraste": contraste})))
+    relatorio.add(ResultItem("Formas", "OK", AnalysisResult(metrics={"total_formas": formas, "triangulos": 1})))
+    relatorio.add(ResultItem("Canny", "OK", AnalysisResult(metrics={"percentual": percentual})))
+    relatorio.add(ResultItem("Hist", "OK", AnalysisResult(metrics={"bins": np.arange(4),
+                                                                   "counts": np.array([1, 2, 3, 4])})))
+    return relatorio
+
+
+def test_running_stats_merge_matches_single_pass():
+    valores = np.random.default_rng(0).normal(10, 3, 101)
+    a, b, tudo = RunningStats(), RunningStats(), RunningStats()
+    for v in valores[:40]:
+        a.add(v)
+    for v in valores[40:]:
+        b.add(v)
+    for v in valores:
+        tudo.add(v)
+    a.merge(b)
+    assert a.n == 101 and a.mean == pytest.approx(tudo.mean) and a.std == pytest.approx(np.std(valores))
+    assert (a.min, a.max) == (valores.min(), valores.max())
+
+
+def test_sharded_aggregation_merges_and_survives_checkpoint(tmp_path):
+    dados = [(float(i), i % 3, 4.0 * i) for i in range(10)]
+    unico = ReportAggregator("imagem")
+    fragmentos = [ReportAggregator("imagem"), ReportAggregator("imagem")]
+    for i, valores in enumerate(dados):
+        unico.add(_relatorio(*valores))
+        fragmentos[i % 2].add(_relatorio(*valores).to_dict())
+
+    fragmentos[0].save(str(tmp_path / "parcial.json"))
+    retomado = ReportAggregator.load(str(tmp_path / "parcial.json")).merge(fragmentos[1])
+
+    metricas = retomado.to_report()
+    assert metricas["GLCM"]["dados"]["metrics"]["contraste"] == pytest.approx(
+        unico.to_report()["GLCM"]["dados"]["metrics"]["contraste"])
+    assert metricas["GLCM"]["dados"]["metrics"]["contraste_std"] == pytest.approx(np.std(range(10)))
+    assert metricas["Formas"]["dados"]["metrics"]["total_formas_soma"] == sum(i % 3 for i in range(10))
+    assert metricas["Formas"]["dados"]["metrics"]["triangulos_soma"] == 10
+    distribuicao = metricas["Canny"]["dados"]["metrics"]["percentual_distribuicao"]
+    assert sum(distribuicao["contagens"]) == 10 and distribuicao["contagens"][:2] == [2, 1]
+    assert metricas["Hist"]["dados"]["metrics"]["counts"] == [10, 20, 30, 40]
+    assert retomado.reports == 10
+
+
+def test_batch_folds_reports_into_the_aggregator(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.runner.MotorDeAnalise", MetricsMotor)
+    caminhos = []
+    for nome in ("a.png", "b.png"):
+        caminho = str(tmp_path / nome)
+        cv2.imwrite(caminho, np.zeros((8, 8), dtype=np.uint8))
+        caminhos.append(caminho)
+
+    agregador = ReportAggregator("imagem")
+    run_batch(caminhos, simultaneas=2, agregador=agregador)
+    item = agregador.to_report()["SuccessAnalyzer"]
+    assert agregador.reports == 2 and item["dados"]["metrics"]["value"] == 1
+
+
+def test_edge_distribution_is_kept_apart_from_thresholding_percentual(tmp_path):
+    caminho = str(tmp_path / "formas.png")
+    img = np.zeros((60, 80), dtype=np.uint8)
+    img[10:40, 20:60] = 255
+    cv2.imwrite(caminho, img)
+    canny, limiar = "Canny 1: Detecção Padrão (50-150)", "Limiarização 1: Global Simples (T=127)"
+
+    agregador = ReportAggregator("imagem")
+    agregador.add(MotorDoProjeto().executar_pipeline(caminho, [canny, limiar]))
+    metricas = agregador.to_report()
+    assert "percentual" in metricas[limiar]["dados"]["metrics"]
+    assert "percentual_distribuicao" not in metricas[limiar]["dados"]["metrics"]
+    assert sum(metricas[canny]["dados"]["metrics"]["percentual_distribuicao"]["contagens"]) == 1
@@ -0,0 +1,55 @@
+import math
+
+import cv2
+import numpy as np
+
+from models.analysis import AnalysisResult
+from models.report import ConsolidatedReport, ResultItem
+from services.columnar import ColumnarReportStore
+from services.runner import run_batch
+from tests.helpers import MetricsMotor
+
+
+def _relatorio(i):
+    relatorio = ConsolidatedReport()
+    relatorio.add(ResultItem("GLCM", "OK", AnalysisResult(metrics={"contraste": float(i), "nome": "x"})))
+    if i % 2:
+        relatorio.add(ResultItem("Canny", "OK", AnalysisResult(metrics={"percentual": np.float64(i / 10)})))
+    else:
+        relatorio.add(ResultItem("Canny", "ERRO", msg="falhou"))
+    return relatorio
+
+
+def test_store_spills_compressed_chunks_and_queries_columns(tmp_path):
+    loja = ColumnarReportStore(str(tmp_path / "lote"), chunk_rows=4)
+    for i in range(10):
+        loja.append(f"img{i}", _relatorio(i) if i != 9 else _relatorio(i).to_dict())
+    assert len(sorted((tmp_path / "lote").glob("chunk-*.npz"))) == 2  # 8 linhas em disco, 2 em memória
+    loja.flush()
+
+    reaberta = ColumnarReportStore.open(str(tmp_path / "lote"))
+    assert len(reaberta) == 10 and reaberta.columns == ["GLCM/contraste", "Canny/percentual"]
+    assert reaberta.column("GLCM/contraste").tolist() == list(range(10))
+    assert math.isnan(reaberta.column("Canny/percentual")[0])
+
+    mascara = reaberta.where("GLCM/contraste", ">=", 5)
+    selecao = reaberta.select(["Canny/percentual"], mascara)
+    assert selecao["imagem"].tolist() == ["img5", "img6", "img7", "img8", "img9"]
+    resumo = reaberta.aggregate("Canny/percentual", mascara)
+    assert resumo["n"] == 3 and resumo["media"] == (0.5 + 0.7 + 0.9) / 3
+
+
+def test_batch_appends_reports_to_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.runner.MotorDeAnalise", MetricsMotor)
+    caminhos = []
+    for nome in ("a.png", "b.png", "c.png"):
+        caminho = str(tmp_path / nome)
+        cv2.imwrite(caminho, np.zeros((8, 8), dtype=np.uint8))
+        caminhos.append(caminho)
+
+    loja = ColumnarReportStore()
+    lote = run_batch(caminhos, simultaneas=2, colunas=loja)
+
+    assert lote["success"] and all("report" not in r for r in lote["results"].values())
+    assert sorted(loja.ids().tolist()) == caminhos
+    assert loja.aggregate("SuccessAnalyzer/value")["n"] == 3
@@ -0,0 +1,136 @@
+import io
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from gerenciador import MotorDeAnalise, AnalisadorBase
+from models.analysis import AnalysisResult
+from services.costs import CostModel, makespan
+from services.runner import run_analysis
+
+
+def test_cost_model_ewma_scales_with_megapixels():
+    modelo = CostModel(alpha=0.5)
+    assert modelo.predict("m", "1", 2.0) is None
+    modelo.observe("m", "1", 1.0, 1.0)
+    modelo.observe("m", "1", 3.0, 1.0)
+    assert modelo.rate("m", "1") == pytest.approx(2.0)
+    assert modelo.predict("m", "1", 4.0) == pytest.approx(8.0)
+    assert modelo.predict("m", "2", 4.0) is None  # nova versão começa do zero
+    assert modelo.snapshot()["m"]["amostras"] == 2
+
+
+def test_makespan_longest_first():
+    assert makespan([3, 1, 2], 1) == 6
+    assert makespan([3, 1, 2], 2) == 3
+    assert makespan([], 4) == 0
+
+
+inicios = []
+_trava = threading.Lock()
+
+
+class Dorminhoco(AnalisadorBase):
+    duracao = 0.0
+
+    @property
+    def nome_modulo(self):
+        return type(self).__name__
+
+    def processar(self, caminho_imagem: str) -> AnalysisResult:
+        with _trava:
+            inicios.append(self.nome_modulo)
+        time.sleep(self.duracao)
+        return AnalysisResult(metrics={"dormiu": self.duracao})
+
+
+class Longo(Dorminhoco):
+    duracao = 0.3
+
+
+class Curto(Dorminhoco):
+    duracao = 0.1
+
+
+class Medio(Dorminhoco):
+    duracao = 0.2
+
+
+def _motor(custos, *analisadores):
+    class Motor(MotorDeAnalise):
+        def __init__(self):
+            super().__init__()
+            self.custos = custos
+
+        def _descobrir_analisadores(self):
+            self.analisadores = list(analisadores)
+    return Motor
+
+
+def _imagem(tmp_path, lado=1000):
+    caminho = str(tmp_path / "img.png")
+    cv2.imwrite(caminho, np.zeros((lado, lado), dtype=np.uint8))
+    return caminho
+
+
+def test_parallel_run_schedules_longest_expected_first(tmp_path):
+    caminho = _imagem(tmp_path)
+    custos = CostModel()
+    motor = _motor(custos, Curto(), Longo(), Medio())()
+    motor.executar_pipeline(caminho)  # aprende os custos
+    assert custos.rate("Longo", "1") > custos.rate("Medio", "1") > custos.rate("Curto", "1")
+
+    previsao = motor.prever(caminho, trabalhadores=2)
+    assert previsao["megapixels"] == 1.0 and previsao["desconhecidos"] == []
+    assert previsao["estimado_s"] < previsao["sequencial_s"]
+
+    inicios.clear()
+    inicio = time.perf_counter()
+    relatorio = motor.executar_pipeline(caminho, trabalhadores=2)
+    decorrido = time.perf_counter() - inicio
+    assert list(relatorio) == ["Curto", "Longo", "Medio"]  # relatório na ordem original
+    assert inicios[-1] == "Curto" and set(inicios[:2]) == {"Longo", "Medio"}
+    assert decorrido < 0.55
+
+
+def test_runner_downgrades_or_rejects_to_meet_deadline(tmp_path, monkeypatch):
+    caminho = _imagem(tmp_path, 2000)  # 4 MP
+
+    class Reduzivel(Curto):
+        @property
+        def reducao_maxima(self):
+            return 8
+
+    custos = CostModel()
+    custos.observe("Reduzivel", "1", 1.0, 0.1)  # 10 s/MP -> 40 s em full, ~0.6 s em thumbnail
+    monkeypatch.setattr("services.runner.MotorDeAnalise", _motor(custos, Reduzivel()))
+
+    resultado = run_analysis(caminho, prazo=5)
+    assert resultado["success"]
+    assert resultado["qualidade_ajustada"] == "preview"  # 4 MP / 16 -> 2.5 s
+    assert resultado["previsao"]["estimado_s"] <= 5
+
+    rejeitado = run_analysis(caminho, prazo=0.1)
+    assert not rejeitado["success"] and "não cabe no prazo" in rejeitado["error"]["message"]
+    assert rejeitado["previsao"]["qualidade"] == "thumbnail"
+
+
+def test_api_predict(tmp_path, monkeypatch):
+    import ui.app as app_module
+
+    custos = CostModel()
+    custos.observe("Curto", "1", 0.5, 1.0)
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr("services.runner.MotorDeAnalise", _motor(custos, Curto(), Longo()))
+    ok, png = cv2.imencode(".png", np.zeros((500, 400), dtype=np.uint8))
+
+    resposta = app_module.app.test_client().post(
+        "/api/previsao", data={"file": (io.BytesIO(png.tobytes()), "img.png")}, content_type="multipart/form-data")
+
+    previsao = resposta.get_json()["previsao"]
+    assert resposta.status_code == 200
+    assert previsao["megapixels"] == 0.2 and previsao["por_modulo"]["Curto"] == pytest.approx(0.1)
+    assert previsao["desconhecidos"] == ["Longo"]
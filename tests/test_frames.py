@@ -0,0 +1,83 @@
+import numpy as np
+from PIL import Image
+
+from gerenciador import MotorDeAnalise
+from services.aggregates import ReportAggregator, RunningStats
+from services.frames import count_frames, frame_to_bgr, iter_frames
+from analisadores.histograma_module import AnalisadorHistogramaGray
+from analisadores.canny_module import AnalisadorCannyPadrao
+
+
+class FramesMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [AnalisadorHistogramaGray(), AnalisadorCannyPadrao()]
+
+
+def _salvar_pilha(caminho, valores):
+    paginas = [Image.fromarray(np.full((20, 30), v, dtype=np.uint8)) for v in valores]
+    paginas[0].save(caminho, save_all=True, append_images=paginas[1:])
+
+
+def test_iter_frames_is_lazy_and_complete(tmp_path):
+    caminho = str(tmp_path / "pilha.tif")
+    _salvar_pilha(caminho, [10, 20, 30])
+    assert count_frames(caminho) == 3
+    frames = iter_frames(caminho)
+    indice, quadro = next(frames)
+    assert indice == 0 and quadro.shape == (20, 30, 3) and quadro[0, 0, 0] == 10
+    assert [i for i, _ in frames] == [1, 2]
+
+
+def test_multiframe_report_has_per_frame_and_aggregate(tmp_path):
+    caminho = str(tmp_path / "pilha.tif")
+    _salvar_pilha(caminho, [10, 20, 30, 40])
+
+    resultado = FramesMotor().executar_multiquadro(caminho)
+
+    assert resultado["num_quadros"] == 4
+    assert len(resultado["quadros"]) == 4
+    hist = resultado["agregado"]["Histograma 1: Intensidade (Cinza/Luma)"]["dados"]["metrics"]
+    assert sum(hist["counts"]) == 4 * 20 * 30
+    assert [hist["counts"][v] for v in (10, 20, 30, 40)] == [600] * 4
+    canny = resultado["agregado"]["Canny 1: Detecção Padrão (50-150)"]["dados"]["metrics"]
+    assert canny["percentual"] == 0 and canny["percentual_std"] == 0
+    # imagens base64 só no primeiro quadro
+    assert "imagens_processadas" in resultado["quadros"][0]["Canny 1: Detecção Padrão (50-150)"]["dados"]["extra"]
+    assert "extra" not in resultado["quadros"][1]["Canny 1: Detecção Padrão (50-150)"]["dados"]
+
+
+def test_running_stats_and_aggregator():
+    stats = RunningStats()
+    for v in [1.0, 2.0, 3.0, 4.0]:
+        stats.add(v)
+    assert stats.mean == 2.5 and np.isclose(stats.std, np.std([1, 2, 3, 4]))
+
+    agg = ReportAggregator()
+    agg.add({"m": {"status": "OK", "dados": {"metrics": {"x": 1, "counts": [1, 0]}}}})
+    agg.add({"m": {"status": "ERRO", "msg": "falha"}})
+    item = agg.to_report()["m"]
+    assert item["dados"]["metrics"]["counts"] == [1, 0]
+    assert "1 quadro(s) com erro" in item["dados"]["detalhe"]
+
+
+def test_frame_to_bgr_scales_16_bit_content_in_mode_i():
+    dezesseis = Image.fromarray(np.array([[0, 0x1234, 0xFFFF]], dtype=np.int32), mode="I")
+    assert frame_to_bgr(dezesseis)[0, :, 0].tolist() == [0, 0x12, 0xFF]
+
+    negativos = Image.fromarray(np.array([[-5, 1 << 30, (1 << 31) - 1]], dtype=np.int32), mode="I")
+    assert frame_to_bgr(negativos)[0, :, 0].tolist() == [0, 128, 255]
+
+
+def test_multiframe_from_bytes_counts_the_content_size(tmp_path):
+    from services.metrics import PIPELINE_INPUT_BYTES, REGISTRY
+
+    caminho = tmp_path / "pilha.tif"
+    _salvar_pilha(str(caminho), [10, 20])
+    conteudo = caminho.read_bytes()
+    caminho.unlink()
+    REGISTRY.reset()
+
+    resultado = FramesMotor().executar_multiquadro("upload.tif", conteudo=conteudo)
+
+    assert resultado["num_quadros"] == 2
+    assert REGISTRY.snapshot()[PIPELINE_INPUT_BYTES][(("kind", "multiquadro"),)] == len(conteudo)
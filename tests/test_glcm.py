@@ -0,0 +1,150 @@
+import cv2
+import numpy as np
+import pytest
+
+from analisadores.glcm_analyzer import (caracteristicas_esparsas, contar_glcm, contar_glcm_esparsa,
+                                        extrair_caracteristicas_glcm, extrair_caracteristicas_lote,
+                                        normalizar_glcm, quantizar)
+from services.decoding import MODE_GRAY16, decode_image
+from tests.helpers import MotorDoProjeto
+
+
+def _haralick(glcm):
+    """Referência direta, matriz a matriz."""
+    p = glcm / glcm.sum()
+    niveis = len(p)
+    i, j = np.indices(p.shape)
+    px, py = p.sum(axis=1), p.sum(axis=0)
+    mi, mj = (i * p).sum(), (j * p).sum()
+    si, sj = np.sqrt((p * (i - mi) ** 2).sum()), np.sqrt((p * (j - mj) ** 2).sum())
+
+    def h(q):
+        q = q[q > 0]
+        return -(q * np.log2(q)).sum()
+
+    hxy1 = -sum(p[a, b] * np.log2(px[a] * py[b]) for a in range(niveis) for b in range(niveis) if p[a, b] > 0)
+    hxy2 = -sum(px[a] * py[b] * np.log(px[a] * py[b]) for a in range(niveis) for b in range(niveis)
+                if px[a] * py[b] > 0)
+    return {
+        "contraste": (p * (i - j) ** 2).sum(),
+        "dissimilaridade": (p * np.abs(i - j)).sum(),
+        "homogeneidade": (p / (1 + (i - j) ** 2)).sum(),
+        "energia": (p ** 2).sum(),
+        "correlacao": (p * (i - mi) * (j - mj)).sum() / (si * sj),
+        "entropia": h(p),
+        "soma_media": sum(k * p[(i + j) == k].sum() for k in range(2 * niveis - 1)),
+        "entropia_diferenca": h(np.array([p[np.abs(i - j) == k].sum() for k in range(niveis)])),
+        "imc1": (h(p) - hxy1) / max(h(px), h(py)),
+        "imc2": np.sqrt(1 - np.exp(-2 * (hxy2 - h(p) * np.log(2)))),
+    }
+
+
+def test_batched_features_match_matrix_by_matrix_reference():
+    rng = np.random.default_rng(3)
+    img = quantizar(rng.integers(0, 256, (40, 50), dtype=np.uint8), 8)
+    img[:, 25:] = img[:, :25]  # alguma correlação entre vizinhos
+    angulos = (0, np.pi / 4, np.pi / 2, 3 * np.pi / 4)
+    pilha = np.stack([[contar_glcm(img, d, a, 8) for a in angulos] for d in (1, 2)])  # distâncias x ângulos
+
+    lote = extrair_caracteristicas_lote(pilha)
+    for d in range(2):
+        for a in range(len(angulos)):
+            esperado = _haralick(pilha[d, a].astype(np.float64))
+            assert extrair_caracteristicas_glcm(normalizar_glcm(pilha[d, a])) == pytest.approx(
+                {k: float(lote[k][d, a]) for k in lote})
+            for nome, valor in esperado.items():
+                assert lote[nome].shape == (2, len(angulos))
+                assert lote[nome][d, a] == pytest.approx(valor, rel=1e-9, abs=1e-12), nome
+
+
+def test_degenerate_matrices():
+    constante = np.zeros((4, 4))
+    constante[2, 2] = 10
+    lote = extrair_caracteristicas_lote(np.stack([constante, np.zeros((4, 4))]))
+    for nome in ("contraste", "correlacao", "entropia", "imc1", "imc2"):
+        assert np.array_equal(lote[nome], [0.0, 0.0]), nome
+    assert lote["energia"][0] == 1 and lote["soma_media"][0] == 4
+    assert extrair_caracteristicas_glcm(np.zeros((4, 4))) == {}
+
+
+def test_sparse_glcm_matches_dense_and_combines_partials():
+    img = quantizar(np.random.default_rng(5).integers(0, 256, (30, 40), dtype=np.uint8), 16)
+    angulos = (0, np.pi / 4, np.pi / 2, 3 * np.pi / 4)
+    esparsa = contar_glcm_esparsa(img, 1, angulos, 16)
+    densa = extrair_caracteristicas_lote(np.stack([contar_glcm(img, 1, a, 16) for a in angulos]))
+    for nome, valores in caracteristicas_esparsas(esparsa, len(angulos)).items():
+        np.testing.assert_allclose(valores, densa[nome], rtol=1e-9, atol=1e-12, err_msg=nome)
+
+    # Metades somadas (como no modo em blocos) e subtraídas (vídeo) batem com a contagem inteira
+    cima = contar_glcm_esparsa(img, 1, angulos, 16, nucleo=(0, 15, 0, 40))
+    baixo = contar_glcm_esparsa(img, 1, angulos, 16, nucleo=(15, 30, 0, 40))
+    soma = cima + baixo
+    assert np.array_equal(soma.codigos, esparsa.codigos) and np.array_equal(soma.contagens, esparsa.contagens)
+    resto = esparsa - cima
+    assert np.array_equal(resto.codigos, baixo.codigos) and np.array_equal(resto.contagens, baixo.contagens)
+
+
+def test_high_level_glcm_keeps_16_bit_depth(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "profundidade.png")
+    img = np.zeros((64, 64), dtype=np.uint16)
+    img[:, 1::2] = 300  # alternância que some ao reduzir para 8 bits
+    cv2.imwrite(caminho, img)
+    assert decode_image(caminho, mode=MODE_GRAY16).dtype == np.uint16
+
+    nome = "GLCM: Alta Resolução (Esparsa)"
+    motor = MotorDoProjeto()
+    monkeypatch.setattr(next(a for a in motor.analisadores if a.nome_modulo == nome), "niveis", 65536, raising=False)
+    dados = motor.executar_pipeline(caminho, [nome])[nome]["dados"]
+    blocos = motor.executar_pipeline(caminho, [nome], tamanho_bloco=32)[nome]["dados"]
+    metrics = dados["metrics"]
+    assert metrics["bits_imagem"] == 16 and metrics["niveis_cinza"] == 65536
+    # 0°, 45° e 135°: pares (0, 300) e (300, 0); 90°: (0, 0) e (300, 300)
+    assert metrics["contraste"] == pytest.approx(0.75 * 300 ** 2) and metrics["celulas_nao_zero"] == 8
+    assert blocos["metrics"]["contraste"] == pytest.approx(metrics["contraste"])
+
+
+def test_weight_cache_survives_analyzer_reload():
+    import importlib
+
+    import analisadores.glcm_analyzer
+    from services.glcm import glcm_weights
+
+    antes = glcm_weights(8)
+    importlib.reload(analisadores.glcm_analyzer)  # como a descoberta faz com um arquivo editado
+    assert glcm_weights(8) is antes and not antes.weights.flags.writeable
+
+
+def test_high_level_glcm_reports_effective_levels_for_8_bit_input(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "oito_bits.png")
+    cv2.imwrite(caminho, np.random.default_rng(2).integers(0, 256, (32, 32), dtype=np.uint8))
+
+    nome = "GLCM: Alta Resolução (Esparsa)"
+    motor = MotorDoProjeto()
+    monkeypatch.setattr(next(a for a in motor.analisadores if a.nome_modulo == nome), "niveis", 4096, raising=False)
+    metrics = motor.executar_pipeline(caminho, [nome])[nome]["dados"]["metrics"]
+    blocos = motor.executar_pipeline(caminho, [nome], tamanho_bloco=16)[nome]["dados"]["metrics"]
+    assert metrics["niveis_cinza"] == blocos["niveis_cinza"] == 256 and metrics["bits_imagem"] == 8
+    assert blocos["contraste"] == pytest.approx(metrics["contraste"])
+    assert metrics["soma_media"] < 2 * 255  # índices na escala de 256 níveis
+
+
+def test_high_level_glcm_derives_levels_from_depth_and_keeps_bits_in_tiles(tmp_path):
+    caminho = str(tmp_path / "dezesseis.png")
+    img = np.zeros((64, 64), dtype=np.uint16)
+    img[:, 1::2] = 300  # some com 256 níveis (300 * 256 >> 16 == 1), aparece com 4096
+    cv2.imwrite(caminho, img)
+
+    nome = "GLCM: Alta Resolução (Esparsa)"
+    motor = MotorDoProjeto()
+    metrics = motor.executar_pipeline(caminho, [nome])[nome]["dados"]["metrics"]
+    blocos = motor.executar_pipeline(caminho, [nome], tamanho_bloco=32)[nome]["dados"]["metrics"]
+    assert metrics["niveis_cinza"] == blocos["niveis_cinza"] == 4096
+    assert metrics["bits_imagem"] == blocos["bits_imagem"] == 16
+    assert metrics["contraste"] == pytest.approx(0.75 * 18 ** 2) and blocos["contraste"] == metrics["contraste"]
+
+
+def test_quantize_rescales_float_images_by_their_range():
+    img = np.array([[-1.5, 0.0], [0.5, 2.5]], dtype=np.float32)
+    assert np.array_equal(quantizar(img, 8), [[0, 3], [4, 7]])
+    assert quantizar(np.full((2, 2), 1e6, dtype=np.float32), 8).max() == 0
+    assert np.array_equal(quantizar(np.array([[0, 70000]], dtype=np.int32), 4), [[0, 3]])
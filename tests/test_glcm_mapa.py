@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+import pytest
+
+from analisadores.glcm_analyzer import contar_glcm, extrair_caracteristicas_glcm, normalizar_glcm, quantizar
+from analisadores.glcm_mapa_module import mapas_glcm
+from tests.helpers import MotorDoProjeto
+
+MAPA = "GLCM: Mapa de Textura Local"
+ANGULOS = (0, np.pi / 4, np.pi / 2, 3 * np.pi / 4)
+
+
+def _janela_a_janela(img, janela, passo, niveis, angulos):
+    """Referência: GLCM refeita do zero em cada janela."""
+    q = quantizar(img, niveis)
+    topos = range(0, img.shape[0] - janela + 1, passo)
+    lefts = range(0, img.shape[1] - janela + 1, passo)
+    mapas = {nome: np.zeros((len(topos), len(lefts))) for nome in ("contraste", "energia", "homogeneidade", "entropia")}
+    for i, y in enumerate(topos):
+        for j, x in enumerate(lefts):
+            recorte = q[y:y + janela, x:x + janela]
+            contagens = sum(contar_glcm(recorte, 1, a, niveis) for a in angulos)
+            valores = extrair_caracteristicas_glcm(normalizar_glcm(contagens))
+            for nome in mapas:
+                mapas[nome][i, j] = valores[nome]
+    return mapas
+
+
+@pytest.mark.parametrize("passo,bandas", [(1, 1), (3, 2), (9, 3)])
+def test_incremental_maps_match_window_by_window(passo, bandas):
+    img = np.random.default_rng(7).integers(0, 256, (37, 29), dtype=np.uint8)
+    mapas = mapas_glcm(img, janela=7, passo=passo, niveis=8, angulos=ANGULOS, bandas=bandas)
+    referencia = _janela_a_janela(img, 7, passo, 8, ANGULOS)
+    for nome, esperado in referencia.items():
+        assert mapas[nome].shape == esperado.shape
+        np.testing.assert_allclose(mapas[nome], esperado, rtol=1e-5, atol=1e-6)
+
+
+def test_texture_map_analyzer_reports_map_summary(tmp_path):
+    img = np.zeros((120, 160), dtype=np.uint8)
+    img[:, 80:] = np.random.default_rng(1).integers(0, 256, (120, 80), dtype=np.uint8)
+    caminho = str(tmp_path / "metade.png")
+    cv2.imwrite(caminho, img)
+
+    dados = MotorDoProjeto().executar_pipeline(caminho, [MAPA])[MAPA]["dados"]
+    metrics = dados["metrics"]
+    assert metrics["linhas_mapa"] == (120 - 15) // 8 + 1 and metrics["colunas_mapa"] == (160 - 15) // 8 + 1
+    contraste = np.asarray(dados["extra"]["mapas"]["contraste"])
+    # Metade lisa: contraste zero; metade ruidosa: alto
+    assert contraste[:, 0].max() == 0 and contraste[:, -1].min() > 1
+    assert metrics["contraste_min"] == 0 and metrics["energia_max"] == pytest.approx(1.0)
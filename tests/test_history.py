@@ -0,0 +1,64 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from services.history import AnalysisHistory, parse_filter
+
+TEXTURA = "GLCM: Análise de Textura"
+
+
+def _relatorio(contraste, energia):
+    return {TEXTURA: {"status": "OK", "dados": {"metrics": {"contraste": contraste, "energia": np.float32(energia),
+                                                            "bins": np.arange(4)}}},
+            "Canny 1": {"status": "ERRO", "msg": "falhou"}}
+
+
+def test_batched_records_and_range_queries(tmp_path):
+    historico = AnalysisHistory(str(tmp_path / "h.sqlite3"), batch_size=2)
+    historico.record("a" * 64, _relatorio(10.0, 0.5), {TEXTURA: "1.0"}, "a.png", timestamp=1)
+    assert len(historico) == 0  # still buffered
+    historico.record("b" * 64, _relatorio(80.0, 0.1), {TEXTURA: "1.0"}, "b.png", timestamp=2)
+    historico.record("a" * 64, _relatorio(12.0, 0.4), {TEXTURA: "2.0"}, "a.png", timestamp=3)
+    historico.flush()
+    assert len(historico) == 3
+
+    assert [e["arquivo"] for e in historico.query([parse_filter("contraste > 11")])] == ["a.png", "b.png"]
+    assert [e["hash"][0] for e in historico.query([parse_filter(f"{TEXTURA}/contraste>=10"),
+                                                   parse_filter("energia<0.45")])] == ["a", "b"]
+    assert historico.query([("contraste", "<", 0)]) == []
+
+    ultimo = historico.get("a" * 64)
+    assert ultimo["versoes"] == {TEXTURA: "2.0"} and ultimo["report"][TEXTURA]["dados"]["metrics"]["contraste"] == 12.0
+    assert historico.get("a" * 64, {TEXTURA: "1.0"})["criado_em"] == 1
+    assert historico.get("c" * 64) is None
+
+    with pytest.raises(ValueError, match="Filtro inválido"):
+        parse_filter("contraste")
+
+
+def test_history_endpoints(tmp_path, monkeypatch):
+    import ui.app as app_module
+    from tests.helpers import MotorDoProjeto
+
+    historico = AnalysisHistory(str(tmp_path / "h.sqlite3"))
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app_module, "HISTORY", historico)
+    monkeypatch.setattr("services.runner.MotorDeAnalise", MotorDoProjeto)
+    client = app_module.app.test_client()
+    img = np.zeros((32, 32), dtype=np.uint8)
+    img[:, ::2] = 255
+    ok, png = cv2.imencode(".png", img)
+
+    analise = client.post("/api/analyze", data={"file": (io.BytesIO(png.tobytes()), "listras.png"),
+                                                "modulos": TEXTURA}, content_type="multipart/form-data").get_json()
+    contraste = analise["report"][TEXTURA]["dados"]["metrics"]["contraste"]
+
+    guardado = client.get(f"/api/historico/{analise['hash']}").get_json()
+    assert guardado["report"] == analise["report"] and guardado["arquivo"].endswith("listras.png")
+    achados = client.get("/api/historico", query_string={"filtro": f"contraste>={contraste}"}).get_json()
+    assert [a["hash"] for a in achados["analises"]] == [analise["hash"]]
+    assert client.get("/api/historico", query_string={"filtro": f"contraste>{contraste}"}).get_json()["analises"] == []
+    assert client.get("/api/historico/" + "0" * 64).status_code == 404
+    assert client.get("/api/historico", query_string={"filtro": "contraste"}).status_code == 400
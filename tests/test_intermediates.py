@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+import pytest
+
+from gerenciador import MotorDeAnalise, AnalisadorBase
+from models.analysis import AnalysisResult
+from services.decoding import ImageSource
+from services.intermediates import IntermediateGraph, canonical, compute, dependency
+from analisadores.canny_module import AnalisadorCannyPadrao
+from analisadores.deteccao_formas import AnalisadorDeteccaoFormas
+from analisadores.limiarizacao_module import AnalisadorLimiarizacaoSimples
+
+
+def _imagem():
+    imagem = np.zeros((80, 120, 3), dtype=np.uint8)
+    cv2.rectangle(imagem, (10, 10), (50, 60), (255, 255, 255), -1)
+    cv2.circle(imagem, (90, 40), 20, (200, 200, 200), -1)
+    return imagem
+
+
+def test_names_are_canonical_chains():
+    assert canonical("blur5") == canonical("blur@5") == "blur@5:gray"
+    assert canonical("canny@50,150:binary@127") == "canny@50,150:binary@127:gray"
+    assert dependency("canny@50,150:binary@127") == "binary@127:gray"
+    assert dependency("gray") is None
+    for invalido in ("sharpen@3", "binary@x", "gray:binary@127:color"):
+        with pytest.raises(ValueError):
+            canonical(invalido)
+
+
+def test_graph_computes_once_and_frees_after_last_consumer():
+    fonte = ImageSource(None, image=_imagem())
+    grafo = IntermediateGraph(fonte).plan([
+        (("binary@127",), 1),
+        (("canny@50,150:binary@127",), 1),
+        (("binary@127", "canny@50,150"), 1),
+    ])
+
+    primeiro = grafo.acquire(("binary@127",), 1)["binary@127"]
+    grafo.release(("binary@127",), 1)
+    assert ("binary@127:gray", 1) in grafo.alive  # ainda há consumidores
+
+    bordas = grafo.acquire(("canny@50,150:binary@127",), 1)["canny@50,150:binary@127"]
+    grafo.release(("canny@50,150:binary@127",), 1)
+    assert ("canny@50,150:binary@127:gray", 1) not in grafo.alive
+
+    ultimo = grafo.acquire(("binary@127", "canny@50,150"), 1)
+    assert ultimo["binary@127"] is primeiro
+    grafo.release(("binary@127", "canny@50,150"), 1)
+
+    assert grafo.computed == 3  # binary, canny(binary), canny(gray)
+    assert grafo.alive == []
+    esperado = compute(["canny@50,150:binary@127"], fonte.image)["canny@50,150:binary@127"]
+    assert np.array_equal(bordas, esperado)
+
+
+def test_unused_products_release_their_inputs():
+    grafo = IntermediateGraph(ImageSource(None, image=_imagem())).plan([(("canny@50,150:binary@127",), 1)])
+    grafo.release(("canny@50,150:binary@127",), 1)
+    assert grafo.computed == 0 and grafo.alive == [] and grafo._refs == {}
+
+
+class ContadorAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "ContadorAnalyzer"
+
+    @property
+    def insumos(self):
+        return ("binary@127",)
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, insumos: dict = None) -> AnalysisResult:
+        return AnalysisResult(metrics={"brancos": int(np.count_nonzero(insumos["binary@127"]))})
+
+
+def test_engine_shares_products_between_analyzers(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "img.png")
+    cv2.imwrite(caminho, _imagem())
+    analisadores = [AnalisadorLimiarizacaoSimples(), AnalisadorDeteccaoFormas(), AnalisadorCannyPadrao(),
+                    ContadorAnalyzer()]
+
+    class Motor(MotorDeAnalise):
+        def _descobrir_analisadores(self):
+            self.analisadores = analisadores
+
+    calculados = []
+    original = IntermediateGraph._get
+
+    def espiao(self, chave):
+        if chave not in self._values:
+            calculados.append(chave[0])
+        return original(self, chave)
+
+    monkeypatch.setattr(IntermediateGraph, "_get", espiao)
+    relatorio = Motor().executar_pipeline(caminho)
+
+    assert all(item["status"] == "OK" for item in relatorio.values())
+    assert calculados.count("binary@127:gray") == 1
+    assert calculados.count("gray") == 1
+    # mesmos resultados que os analisadores calculando sozinhos
+    for analisador in analisadores[:3]:
+        sozinho = analisador.processar(caminho)
+        assert relatorio[analisador.nome_modulo]["dados"]["metrics"] == sozinho.metrics
+    assert relatorio["ContadorAnalyzer"]["dados"]["metrics"]["brancos"] > 0
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from gerenciador import MotorDeAnalise, AnalisadorBase
+from models.analysis import AnalysisResult
+from services.isolation import RunLimits
+from tests.helpers import SuccessAnalyzer, FailAnalyzer
+
+
+class LentoAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "LentoAnalyzer"
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+        time.sleep(30)
+        return AnalysisResult(detalhe="nunca")
+
+
+class OrcamentoProprioAnalyzer(LentoAnalyzer):
+    @property
+    def nome_modulo(self):
+        return "OrcamentoProprioAnalyzer"
+
+    @property
+    def tempo_limite(self):
+        return 0.2
+
+
+class DemoradoAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "DemoradoAnalyzer"
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+        time.sleep(1.0)
+        return AnalysisResult(metrics={"pid": os.getpid()})
+
+
+class ImagemAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "ImagemAnalyzer"
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None, imagem: np.ndarray = None) -> AnalysisResult:
+        return AnalysisResult(metrics={"forma": list(imagem.shape)})
+
+
+class BlocosLentosAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "BlocosLentosAnalyzer"
+
+    @property
+    def suporta_blocos(self):
+        return True
+
+    @property
+    def tempo_limite(self):
+        return 0.05
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+        return AnalysisResult()
+
+    def processar_bloco(self, bloco, nucleo):
+        time.sleep(0.03)
+        return {"n": 1}
+
+    def finalizar_blocos(self, acumulado, forma):
+        return AnalysisResult(metrics=acumulado)
+
+
+def _motor(*analisadores):
+    class Motor(MotorDeAnalise):
+        def _descobrir_analisadores(self):
+            self.analisadores = list(analisadores)
+    return Motor()
+
+
+def _imagem(tmp_path):
+    caminho = str(tmp_path / "img.png")
+    cv2.imwrite(caminho, np.zeros((64, 64, 3), dtype=np.uint8))
+    return caminho
+
+
+def test_timeout_stops_runaway_analyzer_and_keeps_report(tmp_path):
+    motor = _motor(SuccessAnalyzer(), LentoAnalyzer(), FailAnalyzer(), ImagemAnalyzer())
+    inicio = time.perf_counter()
+    relatorio = motor.executar_pipeline(_imagem(tmp_path), tempo_limite=0.5)
+    assert time.perf_counter() - inicio < 10
+    assert relatorio["LentoAnalyzer"]["status"] == "TIMEOUT"
+    assert "0.5s" in relatorio["LentoAnalyzer"]["msg"]
+    assert relatorio["SuccessAnalyzer"]["status"] == "OK"
+    # exceções e resultados atravessam o processo filho
+    assert relatorio["FailAnalyzer"]["status"] == "ERRO" and "simulated failure" in relatorio["FailAnalyzer"]["msg"]
+    assert relatorio["ImagemAnalyzer"]["dados"]["metrics"]["forma"] == [64, 64, 3]
+
+
+def test_analyzer_budget_and_run_deadline(tmp_path):
+    motor = _motor(OrcamentoProprioAnalyzer(), DemoradoAnalyzer(), SuccessAnalyzer())
+    relatorio = motor.executar_pipeline(_imagem(tmp_path), prazo=0.8)
+    assert relatorio["OrcamentoProprioAnalyzer"]["status"] == "TIMEOUT"
+    assert relatorio["OrcamentoProprioAnalyzer"]["time_taken"] < 0.7
+    # só o prazo: roda no próprio processo, sem filho, e termina mesmo passando dele
+    assert relatorio["DemoradoAnalyzer"]["status"] == "OK"
+    assert relatorio["DemoradoAnalyzer"]["dados"]["metrics"]["pid"] == os.getpid()
+    # depois do prazo os demais nem começam
+    assert relatorio["SuccessAnalyzer"]["status"] == "TIMEOUT"
+    assert "Prazo" in relatorio["SuccessAnalyzer"]["msg"]
+
+
+def test_cancellation(tmp_path):
+    cancelar = threading.Event()
+    threading.Timer(0.3, cancelar.set).start()
+    relatorio = _motor(LentoAnalyzer(), SuccessAnalyzer()).executar_pipeline(_imagem(tmp_path), cancelar=cancelar)
+    assert relatorio["LentoAnalyzer"]["status"] == "CANCELADO"
+    assert relatorio["SuccessAnalyzer"]["status"] == "CANCELADO"
+
+
+def test_tiled_mode_checks_budget_between_tiles(tmp_path):
+    relatorio = _motor(BlocosLentosAnalyzer()).executar_pipeline(_imagem(tmp_path), tamanho_bloco=8)
+    assert relatorio["BlocosLentosAnalyzer"]["status"] == "TIMEOUT"
+
+
+def test_run_limits_budget():
+    assert RunLimits().budget() is None
+    assert RunLimits(timeout=5).budget(2) == 2
+    limites = RunLimits(timeout=5, deadline=1).start()
+    assert limites.budget() <= 1
+
+
+def test_isolated_children_are_not_forked_from_the_engine():
+    from services.isolation import START_METHOD
+
+    assert START_METHOD in ("forkserver", "spawn") or "ISOLATION_START_METHOD" in os.environ
+    assert not RunLimits(deadline=5).interrupts() and RunLimits(deadline=5).interrupts(0.5)
+    assert RunLimits(timeout=1).interrupts() and RunLimits(cancel=threading.Event()).interrupts()
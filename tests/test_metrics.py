@@ -0,0 +1,62 @@
+import io
+
+import cv2
+import numpy as np
+
+from services.metrics import (REGISTRY, MetricsRegistry, Summary, ANALYZER_CALLS, ANALYZER_ERRORS,
+                              ANALYZER_LATENCY, DECODE_CACHE_HITS, DECODE_CACHE_MISSES)
+from tests.helpers import MetricsMotor
+
+
+def test_summary_quantiles_use_recent_window():
+    summary = Summary(window=100)
+    for value in range(1000):
+        summary.observe(float(value))
+    assert summary.count == 1000 and summary.total == sum(range(1000))
+    assert summary.quantile(0.5) == 950.0
+    assert summary.quantile(0.99) == 999.0
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.inc(ANALYZER_CALLS, module='GLCM "x"', status="OK")
+    registry.observe(ANALYZER_LATENCY, 0.25, module="GLCM")
+    texto = registry.render()
+    assert "# TYPE analyzer_calls_total counter" in texto
+    assert 'analyzer_calls_total{module="GLCM \\"x\\"",status="OK"} 1' in texto
+    assert 'analyzer_latency_seconds{module="GLCM",quantile="0.95"} 0.25' in texto
+    assert 'analyzer_latency_seconds_count{module="GLCM"} 1' in texto
+
+
+def test_engine_records_calls_errors_and_decode_cache(tmp_path):
+    caminho = str(tmp_path / "img.png")
+    cv2.imwrite(caminho, np.zeros((64, 96, 3), dtype=np.uint8))
+    REGISTRY.reset()
+
+    MetricsMotor().executar_pipeline(caminho)
+
+    snap = REGISTRY.snapshot()
+    assert snap[ANALYZER_CALLS][(("module", "SuccessAnalyzer"), ("status", "OK"))] == 1
+    assert snap[ANALYZER_ERRORS][(("module", "FailAnalyzer"),)] == 1
+    assert snap[ANALYZER_LATENCY][(("module", "GrayPreviewAnalyzer"),)]["count"] == 2
+    # o segundo analisador em cinza reaproveita a decodificação do primeiro
+    assert snap[DECODE_CACHE_MISSES][(("factor", "1"), ("mode", "gray"))] == 1
+    assert snap[DECODE_CACHE_HITS][(("factor", "1"), ("mode", "gray"))] == 1
+
+
+def test_metrics_endpoint(tmp_path, monkeypatch):
+    import ui.app as app_module
+
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    REGISTRY.reset()
+    client = app_module.app.test_client()
+    ok, png = cv2.imencode(".png", np.zeros((16, 16, 3), dtype=np.uint8))
+    client.post("/api/analyze", data={"file": (io.BytesIO(png.tobytes()), "img.png"), "perfil": "histograms"},
+                content_type="multipart/form-data")
+
+    resposta = client.get("/metrics")
+    texto = resposta.get_data(as_text=True)
+    assert resposta.status_code == 200 and resposta.mimetype == "text/plain"
+    assert 'analyzer_latency_seconds{module="Histograma 1: Intensidade (Cinza/Luma)",quantile="0.5"}' in texto
+    assert 'http_request_bytes_total{endpoint="api_analyze"}' in texto
+    assert 'http_response_bytes_total{endpoint="api_analyze"}' in texto
@@ -23,3 +23,39 @@ def test_result_item_serialization_and_consolidation():
     cr = ConsolidatedReport()
     cr.add(item)
     assert "mod1" in cr.to_dict()
+
+
+def test_results_keep_arrays_until_serialization():
+    import numpy as np
+    import pytest
+    from models.encoding import decode_array, dumps
+
+    counts = np.arange(256, dtype=np.int64)
+    ar = AnalysisResult(metrics={"counts": counts, "media": np.float32(1.5), "n": [np.int64(2)]})
+    assert not hasattr(ar, "__dict__")  # slots
+    assert ar.metrics["counts"] is counts
+
+    item = ResultItem(module="hist", status="OK", dados=ar)
+    lista = item.to_dict()["dados"]["metrics"]
+    assert lista["counts"] == list(range(256)) and type(lista["counts"][0]) is int
+    assert lista["media"] == 1.5 and lista["n"] == [2]
+
+    binario = item.to_dict("binary")["dados"]["metrics"]["counts"]
+    assert np.array_equal(decode_array(binario), counts)
+    assert len(dumps(binario)) < len(dumps(lista["counts"]))
+
+    assert item.to_dict("raw")["dados"]["metrics"]["counts"] is counts
+    assert '"counts": [0, 1' in dumps(ar.metrics)
+    with pytest.raises(ValueError):
+        ConsolidatedReport().to_dict("xml")
+
+
+def test_api_rejects_raw_arrays(tmp_path, monkeypatch):
+    import io
+    import ui.app as app_module
+
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    resposta = app_module.app.test_client().post(
+        "/api/analyze", data={"file": (io.BytesIO(b"\x89PNG"), "img.png"), "formato_arrays": "raw"},
+        content_type="multipart/form-data")
+    assert resposta.status_code == 400 and "raw" in str(resposta.get_json()["error"])
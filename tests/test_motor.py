@@ -2,25 +2,7 @@ import os
 import time
 from gerenciador import MotorDeAnalise, AnalisadorBase
 from models.analysis import AnalysisResult
-
-
-class SuccessAnalyzer(AnalisadorBase):
-    @property
-    def nome_modulo(self):
-        return "SuccessAnalyzer"
-
-    def processar(self, caminho_imagem: str) -> AnalysisResult:
-        # Simula processamento rápido
-        return AnalysisResult(detalhe="ok", metrics={"value": 1})
-
-
-class FailAnalyzer(AnalisadorBase):
-    @property
-    def nome_modulo(self):
-        return "FailAnalyzer"
-
-    def processar(self, caminho_imagem: str) -> AnalysisResult:
-        raise RuntimeError("simulated failure")
+from tests.helpers import FailAnalyzer, GrayPreviewAnalyzer, SuccessAnalyzer
 
 
 class TestMotor(MotorDeAnalise):
@@ -43,3 +25,124 @@ def test_motor_runs_and_reports_ok_and_error(tmp_path):
     assert report["SuccessAnalyzer"]["status"] == "OK"
     assert report["FailAnalyzer"]["status"] == "ERRO"
     assert "simulated failure" in report["FailAnalyzer"]["msg"]
+
+
+class TaggedAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "TaggedAnalyzer"
+
+    @property
+    def tags(self):
+        return ("histograma", "rapido")
+
+    def processar(self, caminho_imagem: str) -> AnalysisResult:
+        return AnalysisResult(detalhe="tagged")
+
+
+class SelectionMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [SuccessAnalyzer(), FailAnalyzer(), TaggedAnalyzer()]
+
+
+def test_motor_runs_only_selected_modules(tmp_path):
+    dummy = tmp_path / "img.jpg"
+    dummy.write_text("x")
+
+    m = SelectionMotor()
+    # por nome
+    report = m.executar_pipeline(str(dummy), modulos="SuccessAnalyzer")
+    assert list(report) == ["SuccessAnalyzer"]
+    # por tag e por perfil
+    assert list(m.executar_pipeline(str(dummy), modulos=["histograma"])) == ["TaggedAnalyzer"]
+    assert list(m.executar_pipeline(str(dummy), modulos="fast")) == ["TaggedAnalyzer"]
+    # sem seleção: todos
+    assert len(m.executar_pipeline(str(dummy))) == 3
+
+
+def test_motor_rejects_unknown_selector():
+    m = SelectionMotor()
+    try:
+        m.selecionar_analisadores("nao-existe")
+    except ValueError as e:
+        assert "nao-existe" in str(e)
+    else:
+        raise AssertionError("ValueError esperado")
+    # "full" seleciona todos, mas não engole nomes inválidos
+    assert len(m.selecionar_analisadores("full, SuccessAnalyzer")) == 3
+    try:
+        m.selecionar_analisadores(["full", "nao-existe"])
+    except ValueError as e:
+        assert "nao-existe" in str(e)
+    else:
+        raise AssertionError("ValueError esperado")
+
+
+class DecodeMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [GrayPreviewAnalyzer()]
+
+
+def test_motor_decodes_in_declared_mode_and_scale(tmp_path):
+    import cv2
+    import numpy as np
+
+    caminho = tmp_path / "img.png"
+    cv2.imwrite(str(caminho), np.zeros((64, 96, 3), dtype=np.uint8))
+
+    m = DecodeMotor()
+    full = m.executar_pipeline(str(caminho))
+    assert full["GrayPreviewAnalyzer"]["dados"]["metrics"]["shape"] == [64, 96]
+    # "preview" pede 1/4, mas o analisador só aceita até 1/2
+    preview = m.executar_pipeline(str(caminho), qualidade="preview")
+    assert preview["GrayPreviewAnalyzer"]["dados"]["metrics"]["shape"] == [32, 48]
+    assert preview["GrayPreviewAnalyzer"]["dados"]["extra"]["decodificacao"]["fator"] == 2
+
+
+recebidos = []
+
+
+class ConteudoAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return type(self).__name__
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+        recebidos.append(conteudo)
+        return AnalysisResult(metrics={"bytes": len(conteudo), "inicio": bytes(conteudo[:4]).hex()})
+
+
+class OutroConteudoAnalyzer(ConteudoAnalyzer):
+    pass
+
+
+def test_local_file_is_mapped_once_and_shared(tmp_path):
+    import mmap
+    import cv2
+    import numpy as np
+    from services.decoding import ImageSource, MODE_GRAY
+
+    caminho = str(tmp_path / "img.png")
+    cv2.imwrite(caminho, np.arange(64 * 48, dtype=np.uint8).reshape(48, 64))
+    with open(caminho, "rb") as f:
+        original = f.read()
+
+    class Motor(MotorDeAnalise):
+        def _descobrir_analisadores(self):
+            self.analisadores = [ConteudoAnalyzer(), OutroConteudoAnalyzer()]
+
+    recebidos.clear()
+    report = Motor().executar_pipeline(caminho, trabalhadores=2)
+    assert report["ConteudoAnalyzer"]["dados"]["metrics"]["bytes"] == len(original)
+    assert report["OutroConteudoAnalyzer"]["dados"]["metrics"]["inicio"] == original[:4].hex()
+    assert isinstance(recebidos[0], mmap.mmap) and recebidos[0] is recebidos[1]
+    assert recebidos[0].closed  # desmapeado ao fim da execução
+
+    recebidos.clear()
+    Motor().executar_pipeline(caminho, mapear_arquivo=False)
+    assert recebidos == [original, original]
+
+    fonte = ImageSource(caminho, mapped=True)
+    assert np.array_equal(fonte.get(MODE_GRAY), cv2.imread(caminho, cv2.IMREAD_GRAYSCALE))
+    assert fonte.buffer() is fonte.buffer()
+    fonte.release()
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+import pytest
+
+from services.phash import HASH_METHODS, DuplicateIndex, hamming, hash_array
+from services.runner import run_analysis
+from tests.helpers import MotorDoProjeto
+
+
+def _cena(semente):
+    rng = np.random.default_rng(semente)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8), (0, 0), 2)
+    return cv2.resize(img, (640, 480), interpolation=cv2.INTER_CUBIC)
+
+
+@pytest.mark.parametrize("metodo", HASH_METHODS)
+def test_hash_survives_resize_and_recompression(metodo):
+    original = cv2.cvtColor(_cena(1), cv2.COLOR_BGR2GRAY)
+    ok, jpeg = cv2.imencode(".jpg", cv2.resize(original, (320, 240)), [cv2.IMWRITE_JPEG_QUALITY, 60])
+    copia = cv2.imdecode(jpeg, cv2.IMREAD_GRAYSCALE)
+    outra = cv2.cvtColor(_cena(2), cv2.COLOR_BGR2GRAY)
+
+    assert hamming(hash_array(original, metodo), hash_array(copia, metodo)) <= 6
+    assert hamming(hash_array(original, metodo), hash_array(outra, metodo)) > 12
+
+
+class MotorContador(MotorDoProjeto):
+    execucoes = 0
+
+    def executar_pipeline(self, *args, **kwargs):
+        MotorContador.execucoes += 1
+        return super().executar_pipeline(*args, **kwargs)
+
+
+def test_near_duplicate_reuses_previous_report(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.runner.MotorDeAnalise", MotorContador)
+    MotorContador.execucoes = 0
+    original, copia, outra = (str(tmp_path / n) for n in ("original.png", "copia.jpg", "outra.png"))
+    cv2.imwrite(original, _cena(1))
+    cv2.imwrite(copia, cv2.resize(_cena(1), (320, 240)), [cv2.IMWRITE_JPEG_QUALITY, 70])
+    cv2.imwrite(outra, _cena(2))
+    indice = DuplicateIndex()
+    modulos = ["Histograma 1: Intensidade (Cinza/Luma)"]
+
+    primeiro = run_analysis(original, modulos=modulos, duplicatas=indice)
+    repetido = run_analysis(copia, modulos=modulos, duplicatas=indice)
+    assert "duplicata" not in primeiro and repetido["duplicata"]["chave"] == original
+    assert repetido["report"] == primeiro["report"] and MotorContador.execucoes == 1
+
+    # Another image, or the same one with other analyzers, still runs the pipeline
+    assert "duplicata" not in run_analysis(outra, modulos=modulos, duplicatas=indice)
+    assert "duplicata" not in run_analysis(copia, modulos=["Canny 1: Detecção Padrão (50-150)"], duplicatas=indice)
+    assert MotorContador.execucoes == 3 and len(indice) == 3
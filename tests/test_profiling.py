@@ -0,0 +1,82 @@
+import os
+import pstats
+
+import cv2
+import numpy as np
+
+from gerenciador import MotorDeAnalise, AnalisadorBase
+from models.analysis import AnalysisResult
+from services.profiling import profiling
+from services.runner import run_batch
+from analisadores.histograma_module import AnalisadorHistogramaGray
+
+
+def alocar_bastante():
+    return np.ones(2_000_000, dtype=np.float32).sum()  # ~8 MB
+
+
+class PesadoAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "PesadoAnalyzer"
+
+    def processar(self, caminho_imagem: str, conteudo: bytes = None) -> AnalysisResult:
+        return AnalysisResult(metrics={"soma": float(alocar_bastante())})
+
+
+class PerfilMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [PesadoAnalyzer(), AnalisadorHistogramaGray()]
+
+
+def _imagem(tmp_path, nome="img.png"):
+    caminho = str(tmp_path / nome)
+    cv2.imwrite(caminho, np.zeros((40, 60, 3), dtype=np.uint8))
+    return caminho
+
+
+def test_batch_profiling_attaches_summary_and_writes_files(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.runner.MotorDeAnalise", PerfilMotor)
+    caminhos = [_imagem(tmp_path, "a.png"), _imagem(tmp_path, "b.png")]
+    destino = str(tmp_path / "perfis")
+
+    lote = run_batch(caminhos, perfilar=True, diretorio_perfis=destino)
+
+    assert lote["success"]
+    perfil = lote["results"][caminhos[0]]["report"]["PesadoAnalyzer"]["profile"]
+    assert perfil["calls"] == 1
+    assert perfil["peak_bytes"] >= 8_000_000
+    assert any("alocar_bastante" in f["function"] for f in perfil["top"])
+    assert os.path.dirname(perfil["file"]) == destino
+    assert pstats.Stats(perfil["file"]).total_calls > 0
+    assert len(os.listdir(destino)) == 4  # 2 imagens x 2 analisadores
+
+
+def test_profiling_is_off_by_default_and_covers_tiled_mode(tmp_path):
+    caminho = _imagem(tmp_path)
+    relatorio = PerfilMotor().executar_pipeline(caminho)
+    assert all("profile" not in item for item in relatorio.values())
+
+    with profiling(directory=None):
+        relatorio = PerfilMotor().executar_pipeline(caminho, tamanho_bloco=32)
+    perfil = relatorio["Histograma 1: Intensidade (Cinza/Luma)"]["profile"]
+    assert perfil["calls"] == 4 and "file" not in perfil
+
+
+def test_parallel_run_profiles_every_analyzer(tmp_path):
+    with profiling(directory=None):
+        relatorio = PerfilMotor().executar_pipeline(_imagem(tmp_path), trabalhadores=2)
+    for nome, item in relatorio.items():
+        assert item["status"] == "OK" and item["profile"]["calls"] == 1, nome
+    assert relatorio["PesadoAnalyzer"]["profile"]["peak_bytes"] >= 8_000_000
+
+
+def test_peak_falls_back_to_snapshot_growth_without_reset_peak(monkeypatch):
+    import tracemalloc
+    from services.profiling import AnalyzerProfiler, ProfilingOptions
+
+    monkeypatch.delattr(tracemalloc, "reset_peak")
+    perfilador = AnalyzerProfiler("retido", ProfilingOptions(directory=None))
+    with profiling(directory=None):
+        retido = perfilador.run(np.ones, 1_000_000)  # ~8 MB ainda vivos ao final
+    assert retido.nbytes == 8_000_000 and perfilador.peak_bytes >= 8_000_000
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+import pytest
+
+from analisadores.glcm_analyzer import contar_glcm
+from services.decoding import ImageSource
+from services.region import parse_roi, region_source, resolve_region
+from tests.helpers import MotorDoProjeto
+
+CINZA = "Histograma 1: Intensidade (Cinza/Luma)"
+TEXTURA = "GLCM: Análise de Textura"
+CANNY = "Canny 1: Detecção Padrão (50-150)"
+
+
+def test_resolve_region_clips_and_follows_the_mask():
+    assert parse_roi("10, 20,30,40") == (10, 20, 30, 40)
+    assert resolve_region((100, 200), (-5, 90, 50, 50)) == ((0, 90, 45, 10), None)
+
+    mascara = np.zeros((100, 200), dtype=np.uint8)
+    mascara[30:40, 50:80] = 255
+    regiao, recorte = resolve_region((100, 200), None, mascara)
+    assert regiao == (50, 30, 30, 10) and recorte.shape == (10, 30) and recorte.all()
+
+    with pytest.raises(ValueError, match="fora da imagem"):
+        resolve_region((100, 200), (300, 0, 10, 10))
+    with pytest.raises(ValueError, match="não tem pixels"):
+        resolve_region((100, 200), (0, 0, 10, 10), mascara)
+    with pytest.raises(ValueError, match="não corresponde"):
+        resolve_region((100, 200), None, mascara[:50])
+
+
+def test_glcm_mask_only_counts_pairs_inside():
+    img = np.arange(36, dtype=np.uint8).reshape(6, 6) % 4
+    cheia = np.full(img.shape, 255, dtype=np.uint8)
+    assert np.array_equal(contar_glcm(img, 1, 0, 4, mascara=cheia), contar_glcm(img, 1, 0, 4))
+
+    mascara = np.zeros(img.shape, dtype=np.uint8)
+    mascara[:, :3] = 255
+    assert contar_glcm(img, 1, 0, 4, mascara=mascara).sum() == 6 * 2  # 2 horizontal pairs per row
+
+
+@pytest.fixture
+def imagem(tmp_path):
+    caminho = str(tmp_path / "cena.png")
+    img = np.zeros((120, 160, 3), dtype=np.uint8)
+    cv2.rectangle(img, (20, 20), (70, 90), (255, 255, 255), -1)
+    cv2.circle(img, (120, 60), 25, (0, 0, 200), -1)
+    cv2.imwrite(caminho, img)
+    return caminho
+
+
+def test_pipeline_restricted_to_roi_and_mask(imagem):
+    motor = MotorDoProjeto()
+    mascara = np.zeros((120, 160), dtype=np.uint8)
+    cv2.circle(mascara, (120, 60), 30, 255, -1)
+    modulos = [CINZA, TEXTURA, CANNY]
+
+    por_roi = motor.executar_pipeline(imagem, modulos, roi=(90, 30, 60, 60))
+    assert por_roi[CANNY]["dados"]["metrics"]["total_pixels"] == 60 * 60
+    assert sum(por_roi[CINZA]["dados"]["metrics"]["counts"]) == 60 * 60
+    assert por_roi[CINZA]["dados"]["extra"]["regiao"] == {"x": 90, "y": 30, "largura": 60, "altura": 60,
+                                                          "mascara": False}
+
+    por_mascara = motor.executar_pipeline(imagem, modulos, mascara=mascara)
+    histograma = por_mascara[CINZA]["dados"]["metrics"]["counts"]
+    assert sum(histograma) == np.count_nonzero(mascara)
+    # Só o círculo vermelho e o fundo preto em volta: nada do retângulo branco
+    assert histograma[255] == 0
+    regiao = por_mascara[TEXTURA]["dados"]["extra"]["regiao"]
+    assert regiao["mascara"] and (regiao["largura"], regiao["altura"]) == (61, 61)
+    assert not por_mascara[CANNY]["dados"]["extra"]["regiao"]["mascara"]
+
+    with pytest.raises(ValueError, match="blocos"):
+        motor.executar_pipeline(imagem, modulos, mascara=mascara, tamanho_bloco=64)
+
+
+def test_region_source_does_not_keep_the_full_decode(tmp_path):
+    caminho = str(tmp_path / "grande.png")
+    cv2.imwrite(caminho, np.zeros((200, 300, 3), dtype=np.uint8))
+    mascara = np.zeros((200, 300), dtype=np.uint8)
+    mascara[50:60, 100:140] = 255
+
+    fonte = region_source(ImageSource(caminho), (90, 40, 100, 100), mascara)
+    assert fonte.image.shape == (10, 40, 3) and fonte.mask.shape == (10, 40)
+    assert fonte.image.base is None and fonte.mask.base is None
@@ -0,0 +1,114 @@
+import importlib
+import inspect
+import sys
+
+import cv2
+import numpy as np
+
+from gerenciador import MotorDeAnalise, AnalisadorBase
+from models.analysis import AnalysisResult
+from services.registry import AnalyzerRegistry
+from tests.helpers import SuccessAnalyzer
+
+
+class Plugin:
+    """Base própria para o teste de recarga (não interfere na descoberta real)."""
+
+
+def test_reload_leaves_a_single_class_per_module(tmp_path, monkeypatch):
+    (tmp_path / "plugin_recarregado.py").write_text(
+        f"from {__name__} import Plugin\n\nclass MeuPlugin(Plugin):\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    modulo = importlib.import_module("plugin_recarregado")
+    try:
+        antigas = [modulo.MeuPlugin]
+        for _ in range(2):
+            modulo = importlib.reload(modulo)
+            antigas.append(modulo.MeuPlugin)
+        assert len(Plugin.__subclasses__()) == 3  # as versões antigas continuam vivas
+
+        classes = AnalyzerRegistry(Plugin).discover_classes()
+        assert classes == [modulo.MeuPlugin]
+    finally:
+        sys.modules.pop("plugin_recarregado", None)
+
+
+class LegadoAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "LegadoAnalyzer"
+
+    @property
+    def versao(self):
+        return "2.1"
+
+    def processar(self, caminho_imagem, conteudo=None):
+        return {"detalhe": "legado", "bytes": len(conteudo or b"")}
+
+
+class BrutoAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "BrutoAnalyzer"
+
+    def processar(self, caminho_imagem: str) -> AnalysisResult:
+        return 42  # anotação errada: ainda assim é normalizado
+
+
+class SemConteudoAnalyzer(AnalisadorBase):
+    @property
+    def nome_modulo(self):
+        return "SemConteudoAnalyzer"
+
+    def processar(self, caminho_imagem: str, imagem=None) -> AnalysisResult:
+        return AnalysisResult(metrics={"forma": list(imagem.shape)})
+
+
+class RegistroMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [SuccessAnalyzer(), LegadoAnalyzer(), BrutoAnalyzer()]
+
+
+def test_descriptors_drive_dispatch_without_per_call_introspection(tmp_path, monkeypatch):
+    caminho = tmp_path / "img.bin"
+    caminho.write_bytes(b"12345")
+    motor = RegistroMotor()
+    descritores = {d.name: d for d in motor.descritores()}
+    assert not descritores["SuccessAnalyzer"].passes_content
+    assert descritores["LegadoAnalyzer"].passes_content and descritores["LegadoAnalyzer"].version == "2.1"
+    assert descritores["LegadoAnalyzer"].to_dict()["capacidades"] == ["conteudo"]
+
+    def proibido(*args, **kwargs):
+        raise AssertionError("inspect.signature chamado no laço quente")
+
+    monkeypatch.setattr(inspect, "signature", proibido)
+    for _ in range(2):
+        relatorio = motor.executar_pipeline(str(caminho))
+
+    assert relatorio["SuccessAnalyzer"]["dados"]["metrics"] == {"value": 1}
+    assert relatorio["LegadoAnalyzer"]["dados"] == {"detalhe": "legado", "extra": {"bytes": 5}}
+    assert relatorio["BrutoAnalyzer"]["dados"]["extra"] == {"value": 42}
+
+
+def test_discovery_registers_each_analyzer_once():
+    motor = MotorDeAnalise()
+    motor = MotorDeAnalise()  # segunda descoberta recarrega os módulos de analisadores
+    nomes = [d.name for d in motor.descritores()]
+    assert len(nomes) == len(set(nomes))
+    assert "Detector de Formas" in nomes
+    assert [d.order for d in motor.descritores()] == sorted(d.order for d in motor.descritores())
+
+
+def test_content_is_passed_only_to_a_second_parameter_named_conteudo(tmp_path):
+    caminho = str(tmp_path / "img.png")
+    cv2.imwrite(caminho, np.zeros((8, 12, 3), dtype=np.uint8))
+    registro = AnalyzerRegistry(AnalisadorBase)
+    descritor = registro.describe(SemConteudoAnalyzer())
+    assert not descritor.passes_content and descritor.takes_image
+
+    class Motor(MotorDeAnalise):
+        def _descobrir_analisadores(self):
+            self.analisadores = [SemConteudoAnalyzer()]
+
+    relatorio = Motor().executar_pipeline(caminho)
+    assert relatorio["SemConteudoAnalyzer"]["dados"]["metrics"] == {"forma": [8, 12, 3]}
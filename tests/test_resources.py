@@ -0,0 +1,72 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from services.resources import ResourceManager, current_lease
+from services.runner import run_batch
+from tests.helpers import MetricsMotor
+
+
+def _manager(cores=8):
+    manager = ResourceManager()
+    manager.cpus = list(range(cores))
+    manager.cores = cores
+    return manager
+
+
+def test_leases_split_the_core_budget_and_size_opencv_threads():
+    manager = _manager(8)
+    padrao = cv2.getNumThreads()
+    with manager.lease(4) as externo:
+        assert current_lease() is externo
+        assert manager.cores_per_worker == 2 and cv2.getNumThreads() == 2
+        assert os.environ["OMP_NUM_THREADS"] == "2"
+        with manager.lease(1):
+            assert manager.active_workers == 4  # reaproveita a vaga do chamador
+        with manager.lease(3):
+            assert manager.active_workers == 6 and cv2.getNumThreads() == 1
+        assert manager.report()["paralelismo_efetivo"] == 8
+    assert manager.active_workers == 0 and current_lease() is None
+    assert cv2.getNumThreads() == padrao
+
+
+def test_oversubscription_is_capped_in_the_report():
+    manager = _manager(4)
+    with manager.lease(16):
+        relatorio = manager.report()
+    assert relatorio["nucleos_por_trabalhador"] == 1
+    assert relatorio["paralelismo_efetivo"] == 4
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="afinidade só no Linux")
+def test_pool_threads_are_pinned_to_their_slice():
+    manager = ResourceManager(pin=True)
+    resultado = {}
+
+    def trabalho():
+        with manager.lease(1) as reserva:
+            reserva.initializer()
+            resultado["cpus"] = os.sched_getaffinity(0)
+
+    thread = threading.Thread(target=trabalho)
+    thread.start()
+    thread.join()
+    assert resultado["cpus"] <= set(manager.cpus) and len(resultado["cpus"]) == manager.cores_per_worker
+
+
+def test_batch_runs_images_concurrently_under_one_lease(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.runner.MotorDeAnalise", MetricsMotor)
+    caminhos = []
+    for nome in ("a.png", "b.png", "c.png"):
+        caminho = str(tmp_path / nome)
+        cv2.imwrite(caminho, np.zeros((16, 16, 3), dtype=np.uint8))
+        caminhos.append(caminho)
+
+    lote = run_batch(caminhos, simultaneas=2)
+
+    assert list(lote["results"]) == caminhos
+    assert all(r["report"]["SuccessAnalyzer"]["status"] == "OK" for r in lote["results"].values())
+    assert lote["recursos"]["trabalhadores_ativos"] >= 2
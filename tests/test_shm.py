@@ -0,0 +1,63 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from gerenciador import MotorDeAnalise
+from services.shm import SharedArrays, attached
+from tests.helpers import MotorDoProjeto
+
+
+def test_segments_are_shared_and_freed_with_the_last_consumer():
+    compartilhados = SharedArrays().plan([("imagem", "gray", 1)] * 3)
+    imagem = np.arange(12, dtype=np.uint8).reshape(3, 4)
+
+    handles = [compartilhados.publish(("imagem", "gray", 1), imagem) for _ in range(3)]
+    assert len({h.name for h in handles}) == 1 and compartilhados.copied_bytes == imagem.nbytes
+
+    with attached({"imagem": handles[0], "insumos": {"x": handles[1], "y": None}}) as kwargs:
+        assert np.array_equal(kwargs["imagem"], imagem) and kwargs["insumos"]["y"] is None
+        assert not kwargs["imagem"].flags.writeable
+
+    compartilhados.release(("imagem", "gray", 1))
+    compartilhados.release(("imagem", "gray", 1))
+    assert compartilhados.alive() == [("imagem", "gray", 1)]
+    compartilhados.release(("imagem", "gray", 1))
+    assert compartilhados.alive() == []
+    if os.path.isdir("/dev/shm"):
+        assert not os.path.exists(os.path.join("/dev/shm", handles[0].name.lstrip("/")))
+
+
+@pytest.fixture
+def imagem(tmp_path):
+    caminho = str(tmp_path / "formas.png")
+    img = np.zeros((120, 160, 3), dtype=np.uint8)
+    cv2.rectangle(img, (20, 20), (70, 90), (255, 255, 255), -1)
+    cv2.circle(img, (120, 60), 25, (200, 200, 200), -1)
+    cv2.imwrite(caminho, img)
+    return caminho
+
+
+def test_process_mode_matches_sequential_report(imagem):
+    motor = MotorDoProjeto()
+    sequencial = motor.executar_pipeline(imagem)
+    processos = motor.executar_pipeline(imagem, trabalhadores=2, modo_paralelo="processos")
+
+    assert list(processos) == list(sequencial)
+    for nome, info in sequencial.items():
+        assert processos[nome]["status"] == info["status"] == "OK", processos[nome]
+        assert processos[nome]["dados"]["metrics"] == info["dados"]["metrics"]
+
+
+def test_process_mode_works_for_an_engine_that_is_not_the_latest(imagem):
+    primeiro = MotorDoProjeto()
+    MotorDoProjeto()  # runner/ui criam um motor por requisição
+    relatorio = primeiro.executar_pipeline(imagem, ["histograma", "GLCM: Análise de Textura"], trabalhadores=2,
+                                           modo_paralelo="processos")
+    assert relatorio and all(info["status"] == "OK" for info in relatorio.values()), relatorio
+
+
+def test_unknown_parallel_mode_is_rejected(imagem):
+    with pytest.raises(ValueError, match="Modo paralelo"):
+        MotorDeAnalise().executar_pipeline(imagem, modo_paralelo="gpu")
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import pytest
+
+from services.runner import find_similar, run_batch
+from services.similarity import DIMENSION, HIST_BINS, SimilarityIndex, feature_vector
+from tests.helpers import MotorDoProjeto
+
+
+def _index(n=500, dimension=8, seed=1):
+    rng = np.random.default_rng(seed)
+    vectors = rng.random((n, dimension), dtype=np.float32)
+    index = SimilarityIndex(dimension)
+    for i, vector in enumerate(vectors):
+        index.add(f"img{i}", vector, lote="a")
+    return index, vectors, rng
+
+
+def test_exact_query_matches_brute_force():
+    index, vectors, rng = _index()
+    query = rng.random(8, dtype=np.float32)
+
+    matches = index.query(query, k=5)
+
+    expected = np.argsort(np.linalg.norm(vectors - query, axis=1))[:5]
+    assert [m["chave"] for m in matches] == [f"img{i}" for i in expected]
+    assert matches[0]["lote"] == "a"
+    assert matches[0]["distancia"] == pytest.approx(np.linalg.norm(vectors[expected[0]] - query), abs=1e-4)
+
+
+def test_approximate_query_finds_indexed_vector_and_survives_reopen(tmp_path):
+    index, vectors, _ = _index()
+    index.build_lists(lists=16)
+    assert index.query(vectors[42], k=1, approximate=True)[0]["chave"] == "img42"
+
+    index.save(str(tmp_path))
+    reopened = SimilarityIndex.open(str(tmp_path))
+    assert len(reopened) == 500 and reopened.query(vectors[7], k=1, approximate=True)[0]["chave"] == "img7"
+
+    reopened.add("novo", np.full(8, 5.0))  # the memory map is read-only: the insert copies it first
+    assert reopened.query(np.full(8, 5.0), k=1)[0]["chave"] == "novo"
+    assert SimilarityIndex.open(str(tmp_path / "vazio")).query(np.zeros(DIMENSION)) == []
+
+
+def test_feature_vector_uses_normalized_histograms():
+    counts = np.zeros(256, dtype=np.int64)
+    counts[:8] = 10
+    report = {"Histograma 1: Intensidade (Cinza/Luma)": {"status": "OK", "dados": {"metrics": {"counts": counts}}},
+              "Histograma 2: Canal Vermelho (R)": {"status": "ERRO", "msg": "falhou"}}
+
+    vector = feature_vector(report)
+
+    assert vector.shape == (DIMENSION,)
+    assert vector[0] == pytest.approx(1.0) and not vector[1:].any()
+    assert np.sum(vector[:HIST_BINS] ** 2) == pytest.approx(1.0)
+
+
+def test_find_similar_returns_the_indexed_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.runner.MotorDeAnalise", MotorDoProjeto)
+    caminhos = []
+    for i, cor in enumerate([(30, 60, 200), (200, 200, 200), (10, 180, 20)]):
+        img = np.zeros((64, 64, 3), dtype=np.uint8)
+        img[::4] = cor
+        caminhos.append(str(tmp_path / f"img{i}.png"))
+        cv2.imwrite(caminhos[-1], img)
+
+    index = SimilarityIndex()
+    run_batch(caminhos, indice=index, modulos=["Histograma", "GLCM: Análise de Textura"])
+    assert sorted(index.keys()) == sorted(caminhos)
+
+    result = find_similar(caminhos[1], index, k=2, chave="consulta")
+    assert result["success"] and result["similares"][0]["chave"] == caminhos[1]
+    assert result["similares"][0]["distancia"] == pytest.approx(0.0, abs=1e-3)
+    assert len(index) == 4
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+from gerenciador import MotorDeAnalise
+from services.tiling import iter_tiles, merge_partials
+from analisadores.histograma_module import AnalisadorHistogramaGray, AnalisadorHistogramaRed
+from analisadores.limiarizacao_module import AnalisadorLimiarizacaoOtsu, AnalisadorLimiarizacaoAdaptativaMedia
+from analisadores.glcm_analyzer import AnalisadorGLCM
+from analisadores.equalizacao_histograma import AnalisadorEqualizacaoHistograma
+
+
+class TiledMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [
+            AnalisadorLimiarizacaoOtsu(), AnalisadorLimiarizacaoAdaptativaMedia(),
+            AnalisadorHistogramaGray(), AnalisadorHistogramaRed(), AnalisadorGLCM(),
+            AnalisadorEqualizacaoHistograma(),
+        ]
+
+
+def test_iter_tiles_cores_cover_image_exactly_once():
+    visitas = np.zeros((37, 53), dtype=int)
+    for (y0, y1, x0, x1), (cy0, cy1, cx0, cx1) in iter_tiles(37, 53, 16, halo=3):
+        assert y1 - y0 <= 16 + 6 and x1 - x0 <= 16 + 6
+        visitas[y0 + cy0:y0 + cy1, x0 + cx0:x0 + cx1] += 1
+    assert (visitas == 1).all()
+
+
+def test_merge_partials_sums_arrays_and_scalars():
+    a = {"counts": np.array([1, 2]), "n": 3}
+    assert merge_partials(None, a) is a
+    merged = merge_partials(a, {"counts": np.array([4, 5]), "n": 1})
+    assert merged["counts"].tolist() == [5, 7] and merged["n"] == 4
+
+
+def test_tiled_run_matches_full_image(tmp_path):
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur((rng.random((150, 210, 3)) * 255).astype(np.uint8), (5, 5), 2)
+    cv2.circle(img, (100, 70), 40, (250, 30, 90), -1)
+    caminho = tmp_path / "grande.png"
+    cv2.imwrite(str(caminho), img)
+
+    m = TiledMotor()
+    completo = m.executar_pipeline(str(caminho))
+    blocos = m.executar_pipeline(str(caminho), tamanho_bloco=64)
+
+    for nome in ["Limiarização 2: Otsu (Automática)", "Limiarização 3: Adaptativa Média",
+                 "Histograma 1: Intensidade (Cinza/Luma)", "Histograma 2: Canal Vermelho (R)"]:
+        assert blocos[nome]["status"] == "OK"
+        assert blocos[nome]["dados"]["metrics"] == completo[nome]["dados"]["metrics"]
+
+    glcm_a = completo["GLCM: Análise de Textura"]["dados"]["metrics"]
+    glcm_b = blocos["GLCM: Análise de Textura"]["dados"]["metrics"]
+    for chave in ["contraste", "energia", "entropia", "correlacao"]:
+        assert np.isclose(glcm_a[chave], glcm_b[chave])
+    assert blocos["GLCM: Análise de Textura"]["dados"]["extra"]["blocos"]["quantidade"] == 12
+
+    assert blocos["Equalizador de Histograma"]["status"] == "IGNORADO"
@@ -0,0 +1,67 @@
+import json
+import logging
+
+import cv2
+import numpy as np
+
+from services.logging_setup import JsonFormatter, TraceContextFilter
+from services.runner import run_analysis
+from services.tracing import span, trace, tracing_enabled
+from tests.helpers import MetricsMotor
+
+
+def test_span_is_noop_without_trace():
+    assert not tracing_enabled()
+    with span("qualquer") as primeiro, span("outro") as segundo:
+        primeiro.set(x=1)
+    assert primeiro is segundo
+
+
+def test_nested_spans_record_parents_and_errors():
+    with trace("abc") as t:
+        with span("pai"):
+            with span("filho", modulo="m"):
+                pass
+            try:
+                with span("falha"):
+                    raise RuntimeError("boom")
+            except RuntimeError:
+                pass
+    spans = t.to_dict()["spans"]
+    assert t.trace_id == "abc"
+    assert [s["name"] for s in spans] == ["pai", "filho", "falha"]
+    assert spans[1]["parent_id"] == spans[0]["span_id"] == spans[2]["parent_id"]
+    assert spans[1]["attrs"] == {"modulo": "m"}
+    assert spans[2]["status"] == "error" and spans[2]["attrs"]["error"] == "boom"
+    assert not tracing_enabled()
+
+
+def test_run_analysis_trace_covers_decode_analyzers_and_serialization(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("services.runner.MotorDeAnalise", MetricsMotor)
+    caminho = str(tmp_path / "img.png")
+    cv2.imwrite(caminho, np.zeros((64, 96, 3), dtype=np.uint8))
+
+    sem_trace = run_analysis(caminho)
+    resultado = run_analysis(caminho, rastrear=True)
+
+    assert "trace" not in sem_trace
+    spans = resultado["trace"]["spans"]
+    nomes = [s["name"] for s in spans]
+    assert nomes[0] == "pipeline" and nomes[-1] == "serializacao"
+    analisadores = [s for s in spans if s["name"] == "analisador"]
+    assert [s["attrs"]["status"] for s in analisadores] == ["OK", "ERRO", "OK", "OK"]
+    decodificacao = [s for s in spans if s["name"] == "decodificacao"]
+    assert len(decodificacao) == 1 and decodificacao[0]["parent_id"] == analisadores[2]["span_id"]
+    # nada é escrito em stdout
+    assert capsys.readouterr().out == ""
+
+
+def test_json_log_records_carry_trace_ids():
+    registro = logging.LogRecord("gerenciador", logging.INFO, __file__, 1, "olá %s", ("mundo",), None)
+    registro.modulo = "GLCM"
+    with trace("t1"):
+        with span("analisador"):
+            TraceContextFilter().filter(registro)
+    saida = json.loads(JsonFormatter().format(registro))
+    assert saida["msg"] == "olá mundo" and saida["level"] == "INFO"
+    assert saida["trace_id"] == "t1" and saida["span_id"] == 1 and saida["modulo"] == "GLCM"
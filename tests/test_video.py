@@ -0,0 +1,110 @@
+import io
+import json
+
+import cv2
+import numpy as np
+
+from gerenciador import MotorDeAnalise
+from services.video import FrameChangeDetector, IncrementalTiles, iter_video_frames
+from analisadores.histograma_module import AnalisadorHistogramaGray
+from analisadores.limiarizacao_module import AnalisadorLimiarizacaoOtsu
+from analisadores.glcm_analyzer import AnalisadorGLCM
+from analisadores.canny_module import AnalisadorCannyPadrao
+
+
+class VideoMotor(MotorDeAnalise):
+    def _descobrir_analisadores(self):
+        self.analisadores = [AnalisadorHistogramaGray(), AnalisadorLimiarizacaoOtsu(), AnalisadorGLCM(),
+                             AnalisadorCannyPadrao()]
+
+
+def _quadros():
+    rng = np.random.default_rng(3)
+    base = rng.integers(0, 256, (150, 210, 3), dtype=np.uint8)
+    alterado = base.copy()
+    alterado[20:50, 30:60] = 0
+    return [base, base.copy(), alterado, 255 - base]
+
+
+def _salvar_sequencia(pasta, quadros):
+    for i, quadro in enumerate(quadros):
+        cv2.imwrite(str(pasta / f"quadro_{i}.png"), quadro)
+
+
+def test_sequence_is_read_in_natural_order(tmp_path):
+    for i in (10, 2, 1):
+        cv2.imwrite(str(tmp_path / f"q{i}.png"), np.full((4, 4, 3), i, dtype=np.uint8))
+    assert [int(q[0, 0, 0]) for _, _, q in iter_video_frames(str(tmp_path))] == [1, 2, 10]
+    assert [i for i, _, _ in iter_video_frames(str(tmp_path), step=2)] == [0, 2]
+
+
+def test_change_detector_digest_and_threshold():
+    detector = FrameChangeDetector(threshold=1.0)
+    quadro = np.full((64, 64, 3), 100, dtype=np.uint8)
+    assert detector.check(quadro) is None
+    assert detector.check(quadro.copy()) == "digest"
+    quase = quadro.copy()
+    quase[0, 0] = 0
+    assert detector.check(quase) == "diferenca"
+    assert detector.check(quadro + 20) is None
+
+
+def test_incremental_tiles_match_fresh_computation():
+    quadros = [cv2.cvtColor(q, cv2.COLOR_BGR2GRAY) for q in _quadros()]
+    analisadores = [AnalisadorHistogramaGray(), AnalisadorGLCM()]
+    incremental = IncrementalTiles(analisadores, 64, [True, True])
+    for quadro in quadros:
+        totais = incremental.update(quadro)
+        novos = IncrementalTiles(analisadores, 64, [True, True]).update(quadro)
+        for total, novo in zip(totais, novos):
+            for chave in novo:
+                assert np.array_equal(total[chave], novo[chave])
+    # só os blocos que cobrem a região alterada (com halo) foram recalculados no 3º quadro
+    incremental = IncrementalTiles(analisadores, 64, [True, True])
+    incremental.update(quadros[1])
+    incremental.update(quadros[2])
+    assert 0 < incremental.changed_tiles < len(incremental.tiles)
+
+
+def test_executar_video_reuses_and_streams_metrics(tmp_path):
+    quadros = _quadros()
+    _salvar_sequencia(tmp_path, quadros)
+
+    registros = list(VideoMotor().executar_video(str(tmp_path), tamanho_bloco=64))
+
+    assert [r["quadro"] for r in registros] == [0, 1, 2, 3]
+    assert [r["reutilizado"] for r in registros] == [False, True, False, False]
+    assert registros[1]["motivo"] == "digest"
+    assert registros[1]["metricas"] == registros[0]["metricas"]
+    assert 0 < registros[2]["blocos"]["recalculados"] < registros[2]["blocos"]["total"]
+    assert not any(r["erros"] for r in registros)
+    # métricas incrementais iguais às do modo em blocos sobre o mesmo quadro
+    unico = tmp_path / "unico"
+    unico.mkdir()
+    cv2.imwrite(str(unico / "q.png"), quadros[2])
+    esperado = list(VideoMotor().executar_video(str(unico), tamanho_bloco=64))[0]["metricas"]
+    assert registros[2]["metricas"] == esperado
+    assert "counts" not in registros[0]["metricas"]["Histograma 1: Intensidade (Cinza/Luma)"]
+
+
+def test_api_video_streams_ndjson(tmp_path, monkeypatch):
+    import ui.app as app_module
+
+    caminho = str(tmp_path / "clipe.avi")
+    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for valor in (0, 0, 200):
+        escritor.write(np.full((48, 64, 3), valor, dtype=np.uint8))
+    escritor.release()
+
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    client = app_module.app.test_client()
+    with open(caminho, "rb") as f:
+        resposta = client.post("/api/video", data={"file": (io.BytesIO(f.read()), "clipe.avi"), "perfil": "histograms"},
+                               content_type="multipart/form-data")
+    assert resposta.status_code == 200
+    linhas = [json.loads(l) for l in resposta.get_data(as_text=True).splitlines()]
+    assert [l["quadro"] for l in linhas[:-1]] == [0, 1, 2]
+    assert linhas[1]["reutilizado"] and not linhas[2]["reutilizado"]
+    assert linhas[0]["tempo_s"] == 0 and abs(linhas[2]["tempo_s"] - 0.2) < 1e-9
+    assert linhas[-1] == {"success": True, "fim": True, "num_quadros": 3, "reutilizados": 1}
+    assert [p.name for p in tmp_path.iterdir()] == ["clipe.avi"]
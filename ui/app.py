@@ -1,25 +1,219 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
-from services.runner import run_analysis
+from flask import Flask, Response, render_template, request, redirect, url_for, send_from_directory, jsonify, stream_with_context
+from services.runner import find_similar, list_analyzers, predict_analysis, run_analysis, stream_video_analysis
+from gerenciador import PERFIS
+from services.decoding import QUALITIES
+from services.video import DEFAULT_DIFF_THRESHOLD, SEQUENCE_EXTENSIONS, VIDEO_EXTENSIONS
+from services.metrics import REGISTRY, HTTP_REQUEST_BYTES, HTTP_RESPONSE_BYTES
+from services.resources import RESOURCES
+from services.similarity import SimilarityIndex
+from services.phash import DuplicateIndex
+from services.history import DEFAULT_LIMIT, AnalysisHistory, parse_filter
+from services.region import parse_roi
+from models.encoding import ARRAYS_BINARY, ARRAYS_LIST, check_mode, dumps
 from werkzeug.utils import secure_filename
 import os
+import shutil
+import threading
 import uuid
 
+
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
 # Upload configuration
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Directory of a saved SimilarityIndex (services.similarity); /api/similares is disabled without it
+SIMILARITY_INDEX_DIR = os.environ.get("SIMILARITY_INDEX_DIR")
+# Near-duplicate uploads (re-encoded/resized copies) reuse the previous report when set (Hamming bits, e.g. 4)
+DUPLICATE_MAX_DISTANCE = os.environ.get("DUPLICATE_MAX_DISTANCE")
+DUPLICATES = DuplicateIndex(int(DUPLICATE_MAX_DISTANCE)) if DUPLICATE_MAX_DISTANCE else None
+# SQLite file of the analysis history (services.history); nothing is recorded without it
+HISTORY_DB = os.environ.get("HISTORY_DB")
+HISTORY = AnalysisHistory(HISTORY_DB) if HISTORY_DB else None
+# JSON responses cannot carry live arrays, so "raw" is only for in-process callers
+HTTP_ARRAY_MODES = (ARRAYS_LIST, ARRAYS_BINARY)
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "bmp", "tif", "tiff", "gif"}
 
+NO_FILE_ERROR = {"message": "Nenhum arquivo enviado.", "suggestion": "Selecione um arquivo de imagem para enviar.", "can_retry": "yes"}
+BAD_VIDEO_ERROR = {"message": "Tipo de arquivo não suportado.", "suggestion": f"Envie um vídeo ({', '.join(sorted(VIDEO_EXTENSIONS))}) ou várias imagens numeradas da mesma sequência.", "can_retry": "yes"}
+NO_HISTORY_ERROR = {"message": "Histórico não configurado.", "suggestion": "Defina HISTORY_DB com o arquivo SQLite do histórico e reinicie o servidor.", "can_retry": "no"}
+NOT_IN_HISTORY_ERROR = {"message": "Nenhuma análise registrada para este hash.", "suggestion": "Envie a imagem em /api/analyze para analisá-la.", "can_retry": "no"}
+NO_INDEX_ERROR = {"message": "Índice de similaridade não configurado.", "suggestion": "Defina SIMILARITY_INDEX_DIR com o diretório do índice (veja run_batch) e reinicie o servidor.", "can_retry": "no"}
+BAD_TYPE_ERROR = {"message": "Tipo de arquivo não suportado.", "suggestion": "Envie um arquivo de imagem (png, jpg, jpeg, bmp, tif, tiff, gif).", "can_retry": "yes"}
+
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def requested_modules():
+    """Collect the analyzer selection from form/query fields.
+
+    Accepts repeated or comma-separated `modulos` values plus an optional `perfil`.
+    Returns None (run everything) when nothing was requested.
+    """
+    selectors = []
+    for value in request.values.getlist("modulos"):
+        selectors.extend(v.strip() for v in value.split(",") if v.strip())
+    profile = request.values.get("perfil", "").strip()
+    if profile:
+        selectors.append(profile)
+    return selectors or None
+
+
+def requested_quality():
+    """Optional `qualidade` field (full, half, preview, thumbnail); empty means full resolution."""
+    return request.values.get("qualidade", "").strip() or None
+
+
+def requested_tile_size():
+    """Optional `tamanho_bloco` (pixels) enabling tiled processing; invalid values raise ValueError."""
+    value = request.values.get("tamanho_bloco", "").strip()
+    return int(value) if value else None
+
+
+def requested_options():
+    """Pipeline keyword arguments taken from the request (see `run_analysis`)."""
+    return {
+        "modulos": requested_modules(),
+        "qualidade": requested_quality(),
+        "tamanho_bloco": requested_tile_size(),
+    }
+
+
+def requested_limits():
+    """Optional `tempo_limite` (seconds per analyzer) and `prazo` (seconds for the whole request)."""
+    limits = {}
+    for field in ("tempo_limite", "prazo"):
+        value = request.values.get(field, "").strip()
+        limits[field] = float(value) if value else None
+    return limits
+
+
+def requested_workers():
+    """Optional `trabalhadores`: analyzers run in parallel on that many threads
+    (or worker processes with `modo_paralelo=processos`)."""
+    value = request.values.get("trabalhadores", "").strip()
+    workers = int(value) if value else None
+    if workers is not None and workers < 1:
+        raise ValueError("trabalhadores deve ser >= 1")
+    options = {"trabalhadores": workers}
+    mode = request.values.get("modo_paralelo", "").strip()
+    if mode:
+        options["modo_paralelo"] = mode
+    return options
+
+
+def requested_region():
+    """Optional `roi` ("x,y,largura,altura") and `mascara` upload (binary image the size of the original)."""
+    region = {}
+    roi = request.values.get("roi", "").strip()
+    if roi:
+        region["roi"] = parse_roi(roi)
+    mask = request.files.get("mascara")
+    if mask and mask.filename:
+        region["mascara"] = mask.read()
+    return region
+
+
+def _flag(field: str, header: str) -> bool:
+    value = request.values.get(field) or request.headers.get(header) or ""
+    return value.strip().lower() in ("1", "true", "yes", "sim")
+
+
+def requested_trace() -> bool:
+    """Per-request tracing: `trace=1` field/query or an `X-Trace: 1` header."""
+    return _flag("trace", "X-Trace")
+
+
+def requested_profiling() -> bool:
+    """Per-request cProfile/tracemalloc profiling: `perfilar=1` field/query or an `X-Profile: 1` header."""
+    return _flag("perfilar", "X-Profile")
+
+
+def requested_video_options():
+    """`requested_options` plus the video-only fields `limiar` (frame difference threshold) and `passo`."""
+    options = requested_options()
+    limiar = request.values.get("limiar", "").strip()
+    passo = request.values.get("passo", "").strip()
+    options["limiar_diferenca"] = float(limiar) if limiar else DEFAULT_DIFF_THRESHOLD
+    options["passo"] = int(passo) if passo else 1
+    return options
+
+
+def options_error(e: Exception):
+    return {"message": f"Parâmetro inválido: {e}", "suggestion": "Revise os campos do formulário/consulta e tente novamente.", "can_retry": "yes"}
+
+
+def save_upload(uploaded) -> str:
+    filename = secure_filename(uploaded.filename)
+    unique_name = f"{uuid.uuid4().hex}_{filename}"
+    saved_path = os.path.join(UPLOAD_FOLDER, unique_name)
+    uploaded.save(saved_path)
+    return saved_path
+
+
+def remove_upload(saved_path: str) -> None:
+    # Remove uploaded file to avoid accumulation
+    try:
+        if os.path.exists(saved_path):
+            os.remove(saved_path)
+    except Exception:
+        # Non-fatal; just continue
+        pass
+
+
+def save_video_upload(uploads) -> str:
+    """Save one video file, or several images as a numbered sequence directory; returns the source path."""
+    if len(uploads) == 1:
+        return save_upload(uploads[0])
+    directory = os.path.join(UPLOAD_FOLDER, uuid.uuid4().hex)
+    os.makedirs(directory)
+    for uploaded in uploads:
+        uploaded.save(os.path.join(directory, secure_filename(uploaded.filename)))
+    return directory
+
+
+def remove_video_upload(source: str) -> None:
+    if os.path.isdir(source):
+        shutil.rmtree(source, ignore_errors=True)
+    else:
+        remove_upload(source)
+
+
+_similarity_index = None
+_similarity_lock = threading.Lock()
+
+
+def similarity_index():
+    """The index under SIMILARITY_INDEX_DIR, opened once (None when not configured)."""
+    global _similarity_index
+    if not SIMILARITY_INDEX_DIR:
+        return None
+    with _similarity_lock:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex.open(SIMILARITY_INDEX_DIR)
+        return _similarity_index
+
+
+def render_index(result):
+    return render_template("index.html", result=result, perfis=sorted(PERFIS), qualidades=list(QUALITIES))
+
+
+@app.after_request
+def count_bytes(response):
+    endpoint = request.endpoint or "desconhecido"
+    if request.content_length:
+        REGISTRY.inc(HTTP_REQUEST_BYTES, request.content_length, endpoint=endpoint)
+    if not response.is_streamed and response.content_length is not None:
+        REGISTRY.inc(HTTP_RESPONSE_BYTES, response.content_length, endpoint=endpoint)
+    return response
+
+
 @app.route("/", methods=["GET"])
 def index():
-    return render_template("index.html", result=None)
+    return render_index(None)
 
 
 @app.route("/uploads/<path:filename>")
@@ -32,36 +226,193 @@ def analyze():
     # Expect a file upload named 'file'
     uploaded = request.files.get("file")
     if not uploaded or uploaded.filename == "":
-        return render_template("index.html", result={
-            "success": False,
-            "error": {"message": "Nenhum arquivo enviado.", "suggestion": "Selecione um arquivo de imagem para enviar.", "can_retry": "yes"}
-        })
+        return render_index({"success": False, "error": NO_FILE_ERROR})
 
     if not allowed_file(uploaded.filename):
-        return render_template("index.html", result={
-            "success": False,
-            "error": {"message": "Tipo de arquivo não suportado.", "suggestion": "Envie um arquivo de imagem (png, jpg, jpeg, bmp, tif, tiff, gif).", "can_retry": "yes"}
-        })
+        return render_index({"success": False, "error": BAD_TYPE_ERROR})
 
-    filename = secure_filename(uploaded.filename)
-    unique_name = f"{uuid.uuid4().hex}_{filename}"
-    saved_path = os.path.join(UPLOAD_FOLDER, unique_name)
-    uploaded.save(saved_path)
+    try:
+        options = dict(requested_options(), **requested_limits(), **requested_workers(), **requested_region())
+    except ValueError as e:
+        return render_index({"success": False, "error": options_error(e)})
 
+    saved_path = save_upload(uploaded)
     try:
-        result = run_analysis(saved_path)
+        result = run_analysis(saved_path, duplicatas=DUPLICATES, historico=HISTORY, **options)
         # Attach uploaded filename to result for UI
         if isinstance(result, dict):
-            result["_uploaded_filename"] = unique_name
-        return render_template("index.html", result=result)
+            result["_uploaded_filename"] = os.path.basename(saved_path)
+        return render_index(result)
+    finally:
+        remove_upload(saved_path)
+
+
+@app.route("/api/analyze", methods=["POST"])
+def api_analyze():
+    """JSON variant of /analyze for programmatic clients."""
+    uploaded = request.files.get("file")
+    if not uploaded or uploaded.filename == "":
+        return jsonify({"success": False, "error": NO_FILE_ERROR}), 400
+    if not allowed_file(uploaded.filename):
+        return jsonify({"success": False, "error": BAD_TYPE_ERROR}), 400
+
+    try:
+        options = dict(requested_options(), **requested_limits(), **requested_workers(), **requested_region())
+        arrays = request.values.get("formato_arrays", "").strip()
+        if arrays:
+            options["formato_arrays"] = check_mode(arrays, HTTP_ARRAY_MODES)
+    except ValueError as e:
+        return jsonify({"success": False, "error": options_error(e)}), 400
+
+    saved_path = save_upload(uploaded)
+    try:
+        result = run_analysis(saved_path, rastrear=requested_trace(), perfilar=requested_profiling(),
+                              duplicatas=DUPLICATES, historico=HISTORY, **options)
+        return jsonify(result), (200 if result.get("success") else 400)
+    finally:
+        remove_upload(saved_path)
+
+
+@app.route("/api/previsao", methods=["POST"])
+def api_predict():
+    """Predicted run time for the uploaded image and options, without running the analyzers."""
+    uploaded = request.files.get("file")
+    if not uploaded or uploaded.filename == "":
+        return jsonify({"success": False, "error": NO_FILE_ERROR}), 400
+    if not allowed_file(uploaded.filename):
+        return jsonify({"success": False, "error": BAD_TYPE_ERROR}), 400
+
+    try:
+        options = requested_options()
+        options.pop("tamanho_bloco")
+        options.update(requested_workers())
+        options.pop("modo_paralelo", None)  # a previsão não distingue threads de processos
+    except ValueError as e:
+        return jsonify({"success": False, "error": options_error(e)}), 400
+
+    saved_path = save_upload(uploaded)
+    try:
+        result = predict_analysis(saved_path, **options)
+        return jsonify(result), (200 if result.get("success") else 400)
+    finally:
+        remove_upload(saved_path)
+
+
+@app.route("/api/similares", methods=["POST"])
+def api_similar():
+    """Indexed images most similar to the uploaded one (`k`, `aproximado`; `indexar=1` also adds it under its filename)."""
+    uploaded = request.files.get("file")
+    if not uploaded or uploaded.filename == "":
+        return jsonify({"success": False, "error": NO_FILE_ERROR}), 400
+    if not allowed_file(uploaded.filename):
+        return jsonify({"success": False, "error": BAD_TYPE_ERROR}), 400
+    index = similarity_index()
+    if index is None:
+        return jsonify({"success": False, "error": NO_INDEX_ERROR}), 404
+
+    try:
+        value = request.values.get("k", "").strip()
+        k = int(value) if value else 5
+        if k < 1:
+            raise ValueError("k deve ser >= 1")
+    except ValueError as e:
+        return jsonify({"success": False, "error": options_error(e)}), 400
+
+    indexar = _flag("indexar", "X-Indexar")
+    saved_path = save_upload(uploaded)
+    try:
+        result = find_similar(saved_path, index, k, aproximado=_flag("aproximado", "X-Aproximado"),
+                              qualidade=requested_quality(),
+                              chave=secure_filename(uploaded.filename) if indexar else None)
+        if indexar and result.get("success"):
+            with _similarity_lock:
+                index.save(SIMILARITY_INDEX_DIR)
+        return jsonify(result), (200 if result.get("success") else 400)
     finally:
-        # Remove uploaded file to avoid accumulation
+        remove_upload(saved_path)
+
+
+@app.route("/api/historico/<hash_>", methods=["GET"])
+def api_history_get(hash_: str):
+    """Most recent stored report of the image with this SHA-256 (the `hash` returned by /api/analyze)."""
+    if HISTORY is None:
+        return jsonify({"success": False, "error": NO_HISTORY_ERROR}), 404
+    entry = HISTORY.get(hash_.lower())
+    if entry is None:
+        return jsonify({"success": False, "error": NOT_IN_HISTORY_ERROR}), 404
+    return jsonify(dict(entry, success=True))
+
+
+@app.route("/api/historico", methods=["GET"])
+def api_history_query():
+    """Past analyses matching every `filtro` ("[modulo/]metrica<op>valor", e.g. contraste>50), newest first.
+
+    `limite` caps the number of entries (default 100); `relatorios=1` includes the full reports.
+    """
+    if HISTORY is None:
+        return jsonify({"success": False, "error": NO_HISTORY_ERROR}), 404
+    try:
+        conditions = [parse_filter(f) for f in request.values.getlist("filtro")]
+        value = request.values.get("limite", "").strip()
+        limit = int(value) if value else DEFAULT_LIMIT
+        if limit < 1:
+            raise ValueError("limite deve ser >= 1")
+    except ValueError as e:
+        return jsonify({"success": False, "error": options_error(e)}), 400
+    entries = HISTORY.query(conditions, limit, with_report=_flag("relatorios", "X-Relatorios"))
+    return jsonify({"success": True, "analises": entries})
+
+
+@app.route("/api/video", methods=["POST"])
+def api_video():
+    """Stream per-frame metrics of a video (or of several uploaded sequence images) as NDJSON."""
+    uploads = [u for u in request.files.getlist("file") if u and u.filename]
+    if not uploads:
+        return jsonify({"success": False, "error": NO_FILE_ERROR}), 400
+    if len(uploads) == 1:
+        valid = uploads[0].filename.rsplit(".", 1)[-1].lower() in VIDEO_EXTENSIONS
+    else:
+        valid = all(u.filename.rsplit(".", 1)[-1].lower() in SEQUENCE_EXTENSIONS for u in uploads)
+    if not valid:
+        return jsonify({"success": False, "error": BAD_VIDEO_ERROR}), 400
+
+    try:
+        options = requested_video_options()
+    except ValueError as e:
+        return jsonify({"success": False, "error": options_error(e)}), 400
+
+    source = save_video_upload(uploads)
+
+    def generate():
         try:
-            if os.path.exists(saved_path):
-                os.remove(saved_path)
-        except Exception:
-            # Non-fatal; just continue
-            pass
+            for record in stream_video_analysis(source, **options):
+                yield dumps(record, ensure_ascii=False) + "\n"
+        finally:
+            remove_video_upload(source)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route("/api/perfis", methods=["GET"])
+def api_profiles():
+    return jsonify({nome: (list(tags) if tags is not None else None) for nome, tags in PERFIS.items()})
+
+
+@app.route("/api/analisadores", methods=["GET"])
+def api_analyzers():
+    return jsonify(list_analyzers())
+
+
+@app.route("/api/recursos", methods=["GET"])
+def api_resources():
+    """Core budget, active workers and the OpenCV/BLAS thread counts currently applied."""
+    return jsonify(RESOURCES.report())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Per-analyzer latency/throughput counters in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 
 def run(port: int = 5000):